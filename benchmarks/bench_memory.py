@@ -0,0 +1,138 @@
+"""
+Benchmark: hukommelse og allokeringer pr. målepunkt for 1, 100 og 1000 målepunkter.
+
+Opretter for hvert målepunkt det setup laver (HassEloverblik med timelager,
+rollup, scheduler og detektor, HassTariff, HistoryBackfill og alle sensorers
+coordinators), fylder --days dages timedata ind, bygger sensorerne og læser
+dem som Home Assistant gør (--reads gange). Netværket røres ikke.
+
+Kør fra repo-roden:
+
+  python -m benchmarks.bench_memory [--meters 1 100 1000] [--days 31] [--reads 10]
+
+Skriver én JSON-linje pr. antal målepunkter: KiB og antal levende blokke pr.
+målepunkt efter opbygning (tracemalloc), peak under opbygning, peak under
+--reads runder sensorlæsninger og tid pr. målepunkt for én runde (målt uden
+tracemalloc).
+"""
+import argparse
+from datetime import timedelta
+import gc
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.simple_elforbrug import HassEloverblik
+from custom_components.simple_elforbrug.const import SENSOR_DATA_SCHEMA
+from custom_components.simple_elforbrug.coordinator import (
+    ANALYTICS_SENSORS,
+    AnalyticsCoordinator,
+    CostCoordinator,
+    SensorCoordinator,
+    TariffCoordinator,
+)
+from custom_components.simple_elforbrug.history import HistoryBackfill
+from custom_components.simple_elforbrug.store import HOUR, day_bounds
+from custom_components.simple_elforbrug.tariffs import HassTariff
+
+from . import fixtures
+
+
+def _points(days, seed):
+    today = dt_util.now().date()
+    start, _ = day_bounds(today - timedelta(days=days))
+    end, _ = day_bounds(today)
+    hours = np.arange(start, end, HOUR)
+    rng = np.random.default_rng(seed)
+    return np.column_stack((hours, rng.uniform(0.1, 2.5, len(hours))))
+
+
+def _meter(metering_point, points, charges):
+    energy = HassEloverblik(None, metering_point, "kWh")
+    energy.store.merge(points)
+    energy.store.prune(dt_util.now().date())
+    energy._rebuild_from_store()  # pylint: disable=protected-access
+    energy.detector.ingest(energy.store)
+    energy._update_fingerprint()  # pylint: disable=protected-access
+    tariff = HassTariff(None, metering_point)
+    tariff.restore({"response": charges, "fetched": dt_util.utcnow().isoformat()})
+    sensors = [SensorCoordinator(sensor.key, energy) for sensor in SENSOR_DATA_SCHEMA]
+    sensors += [TariffCoordinator(tariff), CostCoordinator(energy, tariff)]
+    sensors += [AnalyticsCoordinator(kind, energy) for kind in ANALYTICS_SENSORS]
+    for sensor in sensors:
+        sensor.refresh()
+    return energy, tariff, HistoryBackfill(energy), sensors
+
+
+def _read(sensors):
+    """Det HA læser ved hver state-skrivning."""
+    for sensor in sensors:
+        _ = (sensor.name, sensor.state, sensor.extra_state_attributes, sensor.unit_of_measurement, sensor.icon)
+
+
+def _snapshot_blocks():
+    snapshot = tracemalloc.take_snapshot()
+    stats = snapshot.statistics("filename")
+    return sum(s.size for s in stats), sum(s.count for s in stats)
+
+
+def _run(meters, days, reads):
+    points = fixtures.metering_points(meters)
+    data = {mp: _points(days, int(mp[-6:])) for mp in points}
+    charges = {mp: json.loads(fixtures.charges(mp)) for mp in points}
+
+    gc.collect()
+    tracemalloc.start()
+    base_size, base_count = _snapshot_blocks()
+    tracemalloc.reset_peak()
+    built = [_meter(mp, data[mp], charges[mp]) for mp in points]
+    gc.collect()
+    size, count = _snapshot_blocks()
+    peak = tracemalloc.get_traced_memory()[1]
+
+    sensors = [sensor for *_, meter_sensors in built for sensor in meter_sensors]
+    tracemalloc.reset_peak()
+    current = tracemalloc.get_traced_memory()[0]
+    for _ in range(reads):
+        _read(sensors)
+    read_peak = tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(reads):
+        _read(sensors)
+    read_us = (time.perf_counter() - start) / reads / meters * 1e6
+
+    print(json.dumps({
+        "benchmark": "memory",
+        "meters": meters,
+        "days": days,
+        "kib_per_meter": round((size - base_size) / meters / 1024, 1),
+        "blocks_per_meter": round((count - base_count) / meters),
+        "peak_kib": round(peak / 1024, 1),
+        "reads": reads,
+        "read_peak_kib": round(read_peak / 1024, 1),
+        "read_us_per_meter": round(read_us, 2),
+    }), flush=True)
+    return built
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--meters", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--days", type=int, default=31)
+    parser.add_argument("--reads", type=int, default=10)
+    parser.add_argument("--timezone", default="Europe/Copenhagen")
+    args = parser.parse_args()
+
+    dt_util.set_default_time_zone(dt_util.get_time_zone(args.timezone))
+    for meters in args.meters:
+        _run(meters, args.days, args.reads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: fuld json.loads (dict-parse og TimeSeriesStreamParser.load) mod streaming-parseren.
+
+Kør fra repo-roden:  python -m benchmarks.bench_parse [--meters 1 10 100] [--days 8 31]
+Skriver én JSON-linje pr. måling (tid i ms, peak-hukommelse i KiB).
+"""
+import argparse
+from datetime import date, datetime, timedelta
+import json
+import time
+import tracemalloc
+
+from custom_components.simple_elforbrug.parser import TimeSeriesStreamParser
+from custom_components.simple_elforbrug.store import HOUR
+
+from . import fixtures
+
+CHUNK = 64 * 1024
+
+
+def parse_time_series(json_response):
+    """
+    Udpak timeværdier fra et GetTimeSeries-svar (den oprindelige dict-parser,
+    beholdt her som sammenligningsgrundlag).
+
+    Returnerer en liste af (epoch-sekund for timens start i UTC, kWh).
+    """
+    points = []
+    for result in json_response.get("result") or []:
+        document = result.get("MyEnergyData_MarketDocument") or {}
+        for time_series in document.get("TimeSeries") or []:
+            for period in time_series.get("Period") or []:
+                start = datetime.strptime(
+                    period["timeInterval"]["start"], "%Y-%m-%dT%H:%M:%S%z"
+                )
+                start_ts = int(start.timestamp())
+                for point in period.get("Point") or []:
+                    position = int(point["position"])
+                    quantity = float(point["out_Quantity.quantity"])
+                    points.append((start_ts + (position - 1) * HOUR, quantity))
+    return points
+
+
+def _tree(body: bytes):
+    return parse_time_series(json.loads(body))
+
+
+def _load(body: bytes):
+    parser = TimeSeriesStreamParser()
+    parser.load(json.loads(body))
+    return parser.points()
+
+
+def _stream(body: bytes):
+    parser = TimeSeriesStreamParser()
+    for i in range(0, len(body), CHUNK):
+        parser.feed(body[i:i + CHUNK])
+    parser.feed(b"", final=True)
+    return parser.points()
+
+
+def _measure(func, body, repeat):
+    tracemalloc.start()
+    func(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(body)
+    elapsed = (time.perf_counter() - start) / repeat
+    return elapsed * 1000, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--meters", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--days", type=int, nargs="+", default=[8, 31])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for meters in args.meters:
+        for days in args.days:
+            to_date = date(2025, 1, 1) + timedelta(days=days)
+            body = fixtures.time_series(
+                fixtures.metering_points(meters), date(2025, 1, 1), to_date
+            ).encode()
+            for name, func in (("json.loads+dict", _tree), ("json.loads+load", _load), ("stream", _stream)):
+                ms, kib = _measure(func, body, args.repeat)
+                print(json.dumps({
+                    "benchmark": "parse",
+                    "parser": name,
+                    "meters": meters,
+                    "days": days,
+                    "body_kib": round(len(body) / 1024, 1),
+                    "time_ms": round(ms, 2),
+                    "peak_kib": round(kib, 1),
+                }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Benchmark: hele opdateringen for 1, 10 og 100 målepunkter mod en lokal stub.
+
+Pr. cyklus måles fire trin:
+  update_energy   HassEloverblik.async_update_energy for alle målepunkter
+  energy_sensors  SensorCoordinator.refresh -> entitetens state og attributes
+  update_tariff   HassTariff.async_update_tariff for alle målepunkter
+  tariff_sensors  TariffCoordinator/CostCoordinator.refresh -> entitetens state
+
+Første cyklus starter med tomme lagre, de næste er varme (som hver time i
+drift). Kør fra repo-roden:
+
+  python -m benchmarks.bench_refresh [--meters 1 10 100] [--cycles 2] [--no-memory]
+
+Skriver én JSON-linje pr. trin: wall- og CPU-tid i ms, peak-hukommelse i KiB
+(tracemalloc; --no-memory for tider uden dens overhead) og antal kald og
+KiB pr. endpoint. Stubben kører i sin egen proces og tælles ikke med.
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import logging
+import time
+import tracemalloc
+
+import aiohttp
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.simple_elforbrug import HassEloverblik
+from custom_components.simple_elforbrug.api import EloverblikApiClient, TokenManager
+from custom_components.simple_elforbrug.batch import BatchingClient
+from custom_components.simple_elforbrug.const import SENSOR_DATA_SCHEMA
+from custom_components.simple_elforbrug.coordinator import (
+    CostCoordinator,
+    SensorCoordinator,
+    TariffCoordinator,
+)
+from custom_components.simple_elforbrug.sensor import Elforbrug, HelperSensor, TariffSensor
+from custom_components.simple_elforbrug.tariffs import HassTariff
+
+from . import fixtures, stub
+
+REFRESH_TOKEN = "benchmark-refresh-token"
+
+
+async def _stub_stats(session, base_url):
+    async with session.get(base_url + "/_stats") as response:
+        return await response.json()
+
+
+def _delta(after, before):
+    return {k: v - before.get(k, 0) for k, v in after.items() if v - before.get(k, 0)}
+
+
+def _read_entities(entities):
+    """Genberegn og læs det HA skriver som state (uden hass)."""
+    for entity in entities:
+        entity._sensor.refresh()  # pylint: disable=protected-access
+        _ = (entity.state, entity.extra_state_attributes, entity.unit_of_measurement)
+
+
+async def _measure(session, base_url, func, memory):
+    before = await _stub_stats(session, base_url)
+    if memory:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+    wall, cpu = time.perf_counter(), time.process_time()
+
+    result = func()
+    if inspect.isawaitable(result):
+        await result
+
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    peak = tracemalloc.get_traced_memory()[1] - baseline if memory else None
+    after = await _stub_stats(session, base_url)
+    return {
+        "wall_ms": round(wall * 1000, 2),
+        "cpu_ms": round(cpu * 1000, 2),
+        "peak_kib": round(peak / 1024, 1) if memory else None,
+        "requests": _delta(after["requests"], before["requests"]),
+        "response_kib": round(
+            sum(_delta(after["response_bytes"], before["response_bytes"]).values()) / 1024, 1
+        ),
+    }
+
+
+async def _run(base_url, meters, cycles, batch_window, memory):
+    async with aiohttp.ClientSession() as session:
+        api_url = base_url + stub.BASE_PATH
+        tokens = TokenManager(session, REFRESH_TOKEN, base_url=api_url)
+        client = BatchingClient(EloverblikApiClient(session, tokens, base_url=api_url), window=batch_window)
+        client.users = meters  # som get_batching_client med én entry pr. målepunkt
+
+        energies, tariffs, energy_entities, tariff_entities = [], [], [], []
+        for metering_point in fixtures.metering_points(meters):
+            energy = HassEloverblik(client, metering_point, "kWh")
+            tariff = HassTariff(client, metering_point)
+            energies.append(energy)
+            tariffs.append(tariff)
+            energy_entities += [
+                Elforbrug(None, SensorCoordinator(sensor.key, energy)) for sensor in SENSOR_DATA_SCHEMA
+            ]
+            tariff_entities += [
+                TariffSensor(None, TariffCoordinator(tariff)),
+                HelperSensor(None, CostCoordinator(energy, tariff)),
+            ]
+
+        stages = (
+            ("update_energy", lambda: asyncio.gather(*[e.async_update_energy() for e in energies])),
+            ("energy_sensors", lambda: _read_entities(energy_entities)),
+            ("update_tariff", lambda: asyncio.gather(*[t.async_update_tariff() for t in tariffs])),
+            ("tariff_sensors", lambda: _read_entities(tariff_entities)),
+        )
+        for cycle in range(1, cycles + 1):
+            for stage, func in stages:
+                result = await _measure(session, base_url, func, memory)
+                print(json.dumps({
+                    "benchmark": "refresh",
+                    "meters": meters,
+                    "cycle": cycle,
+                    "stage": stage,
+                    **result,
+                }), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--meters", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--cycles", type=int, default=2)
+    parser.add_argument(
+        "--batch-window", type=float, default=0.05,
+        help="sekunder BatchingClient samler kald (integrationen bruger BATCH_WINDOW)",
+    )
+    parser.add_argument("--no-memory", dest="memory", action="store_false")
+    parser.add_argument("--timezone", default="Europe/Copenhagen")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    dt_util.set_default_time_zone(dt_util.get_time_zone(args.timezone))
+
+    process, base_url = stub.start_in_process()
+    try:
+        asyncio.run(_wait_for(base_url))
+        if args.memory:
+            tracemalloc.start()
+        for meters in args.meters:
+            asyncio.run(_run(base_url, meters, args.cycles, args.batch_window, args.memory))
+    finally:
+        process.terminate()
+        process.join()
+
+
+async def _wait_for(base_url, timeout=10):
+    """Vent til stub-processen svarer."""
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                await _stub_stats(session, base_url)
+                return
+            except aiohttp.ClientError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.05)
+
+
+if __name__ == "__main__":
+    main()
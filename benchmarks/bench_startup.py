@@ -0,0 +1,142 @@
+"""
+Benchmark: hvad integrationen koster under Home Assistants opstart.
+
+To målinger med hvert sit mål:
+  import  tid for at importere integrationen og sensor-platformen i en frisk
+          proces, hvor det Home Assistant selv har indlæst før integrationer
+          (core, config entries, coordinator, storage, recorder, aiohttp)
+          allerede er importeret. Median af --runs processer.
+  setup   tid pr. målepunkt for den del af async_setup_entry der kører før
+          Home Assistant går videre: HassEloverblik, HassTariff og
+          HistoryBackfill oprettes og gendannes fra cache med --history-days
+          timedata. Netværket røres ikke; første hentning sker efter start.
+
+Kør fra repo-roden:
+
+  python -m benchmarks.bench_startup [--meters 1 10 100] [--history-days 1830] [--runs 5]
+
+Skriver én JSON-linje pr. måling med tid i ms, målet og om det er nået.
+"""
+import argparse
+from datetime import timedelta
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.simple_elforbrug import HassEloverblik
+from custom_components.simple_elforbrug.history import HistoryBackfill
+from custom_components.simple_elforbrug.store import HOUR, day_bounds
+from custom_components.simple_elforbrug.tariffs import HassTariff
+
+from . import fixtures
+
+IMPORT_TARGET_MS = 150  # integration + sensor-platform oven på Home Assistant (heraf numpy ~80 ms)
+SETUP_TARGET_MS = 20    # pr. målepunkt med fem års timehistorik i cachen
+
+PRELOADED = (
+    "homeassistant.core",
+    "homeassistant.config_entries",
+    "homeassistant.helpers.update_coordinator",
+    "homeassistant.helpers.storage",
+    "homeassistant.helpers.restore_state",
+    "homeassistant.helpers.aiohttp_client",
+    "homeassistant.components.recorder",
+    "aiohttp",
+)
+
+_IMPORT_SCRIPT = f"""
+import time
+{"; ".join(f"import {module}" for module in PRELOADED)}
+start = time.perf_counter()
+import custom_components.simple_elforbrug, custom_components.simple_elforbrug.sensor
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def _import_ms(runs):
+    """Median importtid (ms) over `runs` friske processer."""
+    times = [
+        float(subprocess.run(
+            [sys.executable, "-c", _IMPORT_SCRIPT], check=True, capture_output=True, text=True
+        ).stdout)
+        for _ in range(runs)
+    ]
+    return statistics.median(times)
+
+
+def _snapshots(metering_point, history_days):
+    """Cache-indhold (som EnergyCache/TariffCache/HistoryCache gemmer det) for ét målepunkt."""
+    today = dt_util.now().date()
+    start, _ = day_bounds(today - timedelta(days=history_days))
+    end, _ = day_bounds(today)
+    hours = np.arange(start, end, HOUR)
+    rng = np.random.default_rng(int(metering_point[-6:]))
+
+    energy = HassEloverblik(None, metering_point, "kWh")
+    energy.store.merge(np.column_stack((hours, rng.uniform(0.1, 2.5, len(hours)))))
+    tariff = HassTariff(None, metering_point)
+    tariff.restore({"response": json.loads(fixtures.charges(metering_point)), "fetched": dt_util.utcnow().isoformat()})
+    history = HistoryBackfill(energy)
+    history.restore({"next": (today - timedelta(days=history_days)).isoformat(), "empty": 0, "done": True})
+    # Arkivet (timer før grænsen) indlæses i baggrunden efter opsætningen,
+    # så EnergyCache holder kun timerne fra den
+    energy.archive.snapshot()
+    # Gennem JSON som på disk
+    return json.loads(json.dumps((energy.snapshot(), tariff.snapshot(), history.snapshot())))
+
+
+def _setup(metering_point, snapshots):
+    energy_data, tariff_data, history_data = snapshots
+    energy = HassEloverblik(None, metering_point, "kWh")
+    tariff = HassTariff(None, metering_point)
+    history = HistoryBackfill(energy)
+    energy.restore(energy_data)
+    tariff.restore(tariff_data)
+    history.restore(history_data)
+    return energy, tariff, history
+
+
+def _report(name, value_ms, target_ms, **extra):
+    print(json.dumps({
+        "benchmark": "startup",
+        "stage": name,
+        **extra,
+        "ms": round(value_ms, 2),
+        "target_ms": target_ms,
+        "ok": value_ms <= target_ms,
+    }), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--meters", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--history-days", type=int, default=5 * 366)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timezone", default="Europe/Copenhagen")
+    args = parser.parse_args()
+
+    dt_util.set_default_time_zone(dt_util.get_time_zone(args.timezone))
+
+    _report("import", _import_ms(args.runs), IMPORT_TARGET_MS, runs=args.runs)
+
+    for meters in args.meters:
+        points = fixtures.metering_points(meters)
+        snapshots = {mp: _snapshots(mp, args.history_days) for mp in points}
+        start = time.perf_counter()
+        for mp in points:
+            _setup(mp, snapshots[mp])
+        total_ms = (time.perf_counter() - start) * 1000
+        _report(
+            "setup", total_ms / meters, SETUP_TARGET_MS,
+            meters=meters, history_days=args.history_days, total_ms=round(total_ms, 1),
+        )
+
+
+if __name__ == "__main__":
+    main()
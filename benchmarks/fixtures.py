@@ -0,0 +1,127 @@
+"""Anonymiserede Eloverblik-svar til benchmarks."""
+from datetime import date, datetime, timedelta, timezone
+import json
+import random
+from zoneinfo import ZoneInfo
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+DANISH_TIME = ZoneInfo("Europe/Copenhagen")
+
+
+def metering_points(count):
+    """Falske, men gyldigt formede 18-cifrede målepunkter."""
+    return [f"571313{i:012d}" for i in range(1, count + 1)]
+
+
+def _period(start, resolution, quantities):
+    end = start + (timedelta(hours=len(quantities)) if resolution == "PT1H" else timedelta(days=31))
+    return {
+        "resolution": resolution,
+        "timeInterval": {"start": start.strftime(TIME_FORMAT), "end": end.strftime(TIME_FORMAT)},
+        "Point": [
+            {"position": str(i + 1), "out_Quantity.quantity": f"{q:.3f}", "out_Quantity.quality": "A04"}
+            for i, q in enumerate(quantities)
+        ],
+    }
+
+
+def _document(metering_point, periods):
+    return {
+        "MyEnergyData_MarketDocument": {
+            "mRID": "00000000-0000-0000-0000-000000000000",
+            "createdDateTime": "2000-01-01T00:00:00Z",
+            "sender_MarketParticipant.name": "",
+            "sender_MarketParticipant.mRID": {"codingScheme": None, "name": None},
+            "period.timeInterval": {
+                "start": periods[0]["timeInterval"]["start"] if periods else None,
+                "end": periods[-1]["timeInterval"]["end"] if periods else None,
+            },
+            "TimeSeries": [{
+                "mRID": metering_point,
+                "businessType": "A04",
+                "curveType": "A01",
+                "measurement_Unit.name": "KWH",
+                "MarketEvaluationPoint": {"mRID": {"codingScheme": "A10", "name": metering_point}},
+                "Period": periods,
+            }],
+        },
+        "success": True,
+        "errorCode": 10000,
+        "errorText": "No error",
+        "id": metering_point,
+        "stackTrace": None,
+    }
+
+
+def time_series(points, from_date: date, to_date: date, seed=0):
+    """GetTimeSeries-svar (Hour) for [from_date, to_date) som JSON-tekst."""
+    rng = random.Random(seed)
+    result = []
+    for metering_point in points:
+        periods = []
+        day = from_date
+        while day < to_date:
+            # Ét døgn pr. periode fra dansk midnat (23/25 timer ved sommertid)
+            start, end = (
+                datetime(d.year, d.month, d.day, tzinfo=DANISH_TIME).astimezone(timezone.utc)
+                for d in (day, day + timedelta(days=1))
+            )
+            hours = int((end - start).total_seconds()) // 3600
+            periods.append(_period(start, "PT1H", [rng.uniform(0.05, 2.5) for _ in range(hours)]))
+            day += timedelta(days=1)
+        result.append(_document(metering_point, periods))
+    return json.dumps({"result": result})
+
+
+def per_month(points, year, months, seed=0):
+    """GetTimeSeries-svar (Month) som JSON-tekst."""
+    rng = random.Random(seed)
+    result = []
+    for metering_point in points:
+        periods = [
+            _period(datetime(year, m, 1, tzinfo=timezone.utc) - timedelta(hours=1), "P1M", [rng.uniform(150, 600)])
+            for m in range(1, months + 1)
+        ]
+        result.append(_document(metering_point, periods))
+    return json.dumps({"result": result})
+
+
+def charges(metering_point, seed=0):
+    """getcharges-svar for et målepunkt som JSON-tekst (tariffer, gebyrer og abonnementer)."""
+    rng = random.Random(f"{metering_point}-{seed}")
+
+    def tariff(name, period_type, prices, valid_from="2024-01-01T00:00:00.000Z", valid_to=None):
+        return {
+            "name": name,
+            "description": name,
+            "owner": "0000000000000",
+            "validFromDate": valid_from,
+            "validToDate": valid_to,
+            "periodType": period_type,
+            "prices": [{"position": str(i + 1), "price": round(p, 6)} for i, p in enumerate(prices)],
+        }
+
+    peak = [0.15] * 6 + [0.45] * 11 + [1.35] * 4 + [0.45] * 3
+    return json.dumps({"result": [{
+        "result": {
+            "meteringPointId": metering_point,
+            "subscriptions": [{
+                "name": "Netabonnement C", "description": "", "owner": "0000000000000",
+                "validFromDate": "2024-01-01T00:00:00.000Z", "validToDate": None,
+                "price": 25.0, "quantity": 1,
+            }],
+            "fees": [],
+            "tariffs": [
+                tariff("Nettarif C time", "PT1H", [p * rng.uniform(0.9, 1.1) for p in peak]),
+                tariff("Transmissions nettarif", "P1D", [0.074]),
+                tariff("Systemtarif", "P1D", [0.051]),
+                tariff("Elafgift", "P1D", [0.761]),
+                tariff("Rabat på Cerius nettarif", "P1D", [-0.01], valid_to="2024-07-01T00:00:00.000Z"),
+            ],
+        },
+        "success": True,
+        "errorCode": 10000,
+        "errorText": "No error",
+        "id": metering_point,
+        "stackTrace": None,
+    }]})
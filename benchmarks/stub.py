@@ -0,0 +1,140 @@
+"""
+Lokal Eloverblik-stub der afspiller anonymiserede svar fra fixtures.
+
+Svarer på samme stier som Customer API'et (token, GetTimeSeries for Hour og
+Month, getcharges) for vilkårlige målepunkter og datointervaller. Svarene
+bygges deterministisk pr. målepunkt og genbruges, så stubben selv koster
+mindst muligt. GET /_stats giver antal kald og bytes pr. endpoint, og
+fail() lader de næste kald til et endpoint svare med en fejlstatus (tests).
+
+Kør selvstændigt:  python -m benchmarks.stub --port 8123
+"""
+import argparse
+from collections import Counter, deque
+from datetime import date
+import json
+import multiprocessing
+import socket
+
+from aiohttp import web
+
+from . import fixtures
+
+BASE_PATH = "/CustomerApi/"
+# Et gyldigt formet JWT uden udløb (TokenManager falder tilbage til 24 timer)
+ACCESS_TOKEN = "eyJhbGciOiJub25lIn0.eyJzdWIiOiJiZW5jaG1hcmsifQ."
+
+
+class EloverblikStub:
+    """aiohttp-app med tællere for kald og svarstørrelser."""
+
+    def __init__(self):
+        self.requests = Counter()
+        self.response_bytes = Counter()
+        self._documents = {}
+        self._faults = {}  # endpoint -> deque af (status, headers)
+
+    def fail(self, endpoint, status, times=1, headers=None):
+        """Lad de næste `times` kald til endpoint svare med `status`."""
+        self._faults.setdefault(endpoint, deque()).extend([(status, headers or {})] * times)
+
+    def _fault(self, endpoint):
+        faults = self._faults.get(endpoint)
+        if not faults:
+            return None
+        status, headers = faults.popleft()
+        self.requests[endpoint] += 1
+        return web.Response(status=status, text=f"stub {status}", headers=headers)
+
+    def _reply(self, endpoint, text):
+        self.requests[endpoint] += 1
+        self.response_bytes[endpoint] += len(text)
+        return web.Response(text=text, content_type="application/json")
+
+    def _document(self, metering_point, aggregation, from_date, to_date):
+        key = (metering_point, aggregation, from_date, to_date)
+        if key not in self._documents:
+            if aggregation == "Month":
+                body = fixtures.per_month([metering_point], from_date.year, to_date.month, seed=metering_point)
+            else:
+                body = fixtures.time_series([metering_point], from_date, to_date, seed=metering_point)
+            self._documents[key] = json.dumps(json.loads(body)["result"][0])
+        return self._documents[key]
+
+    async def token(self, request):
+        fault = self._fault("token")
+        if fault is not None:
+            return fault
+        return self._reply("token", json.dumps({"result": ACCESS_TOKEN}))
+
+    async def time_series(self, request):
+        aggregation = request.match_info["aggregation"]
+        endpoint = "per_month" if aggregation == "Month" else "time_series"
+        fault = self._fault(endpoint)
+        if fault is not None:
+            return fault
+        body = await request.json()
+        from_date = date.fromisoformat(request.match_info["from_date"])
+        to_date = date.fromisoformat(request.match_info["to_date"])
+        documents = [
+            self._document(mp, aggregation, from_date, to_date)
+            for mp in body["meteringPoints"]["meteringPoint"]
+        ]
+        return self._reply(endpoint, '{"result": [' + ", ".join(documents) + "]}")
+
+    async def charges(self, request):
+        fault = self._fault("charges")
+        if fault is not None:
+            return fault
+        body = await request.json()
+        (metering_point,) = body["meteringPoints"]["meteringPoint"]
+        return self._reply("charges", fixtures.charges(metering_point))
+
+    async def stats(self, request):
+        return web.json_response({
+            "requests": dict(self.requests),
+            "response_bytes": dict(self.response_bytes),
+        })
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get(BASE_PATH + "api/Token", self.token)
+        app.router.add_post(
+            BASE_PATH + "api/MeterData/GetTimeSeries/{from_date}/{to_date}/{aggregation}",
+            self.time_series,
+        )
+        app.router.add_post(BASE_PATH + "api/meteringpoints/meteringpoint/getcharges", self.charges)
+        app.router.add_get("/_stats", self.stats)
+        return app
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _serve(port):
+    web.run_app(EloverblikStub().app(), host="127.0.0.1", port=port, print=None)
+
+
+def start_in_process():
+    """
+    Start stubben i en separat proces, så dens CPU og hukommelse ikke tælles
+    med i målingerne. Returnerer (proces, base-url).
+    """
+    port = _free_port()
+    process = multiprocessing.Process(target=_serve, args=(port,), daemon=True)
+    process.start()
+    return process, f"http://127.0.0.1:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8123)
+    args = parser.parse_args()
+    _serve(args.port)
+
+
+if __name__ == "__main__":
+    main()
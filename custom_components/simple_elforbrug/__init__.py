@@ -1,17 +1,33 @@
 """Simple Elforbrug init-file."""
 import asyncio
 import logging
-import requests
-import json
-from datetime import datetime, timedelta
+from datetime import timedelta
+
+import numpy as np
 
 from homeassistant.const import UnitOfEnergy
-from homeassistant.util import Throttle
+from homeassistant.util import dt as dt_util
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, ServiceCall
-
-from pyeloverblik.eloverblik import Eloverblik
-from .const import DOMAIN, MIN_TIME_BETWEEN_UPDATES, PLATFORMS
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.start import async_at_started
+
+from .anomaly import ConsumptionDetector
+from .api import (
+    API_ERRORS,
+    EloverblikApiError,
+    EloverblikAuthError,
+    EloverblikThrottleError,
+)
+from .batch import get_batching_client, release_batching_client
+from .cache import ArchiveCache, EnergyCache, HistoryCache, TariffCache
+from .const import CLIENT_AIOHTTP, CONF_CLIENT, DATA_HISTORY_LOCKS, DOMAIN, PLATFORMS, WEEK_KEYS
+from .coordinator import ElforbrugDataUpdateCoordinator
+from .energy_statistics import StatisticsImporter
+from .history import HistoryBackfill
+from .metrics import Metrics
+from .scheduler import RefreshScheduler
+from .services import async_setup_services
+from .store import HourlyStore, day_bounds
 from .tariffs import HassTariff
 
 _LOGGER = logging.getLogger(__name__)
@@ -19,6 +35,7 @@ _LOGGER = logging.getLogger(__name__)
 async def async_setup(hass: HomeAssistant, config: dict):
     """Set up the Eloverblik component."""
     hass.data[DOMAIN] = {}
+    async_setup_services(hass)
     return True
 
 
@@ -28,51 +45,67 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     metering_point = entry.data["metering_point"]
     unit_of_measurement = entry.data.get("unit_of_measurement", UnitOfEnergy.KILO_WATT_HOUR)
 
+    # Én fælles klient pr. refresh token og klienttype, så målepunkter hentes i samlede kald
+    kind = entry.data.get(CONF_CLIENT, CLIENT_AIOHTTP)
+    client = get_batching_client(hass, refresh_token, kind)
+    entry.async_on_unload(lambda: release_batching_client(hass, refresh_token, kind))
+
     eloverblik_instance = HassEloverblik(
-        refresh_token=refresh_token,
+        client=client,
         metering_point=metering_point,
         unit_of_measurement=unit_of_measurement,
     )
-    hass.data[DOMAIN][entry.entry_id] = eloverblik_instance
-
-    tariff_instance = HassTariff(refresh_token, metering_point)
-    hass.data[DOMAIN][f"{entry.entry_id}_tariff"] = tariff_instance
-
-    #
-    # Service: Manuel opdatering
-    #
-    async def handle_manual_update(call: ServiceCall):
-        _LOGGER.info("🔄 Manuel opdatering af Eloverblik-data startet via servicecall")
-        await hass.async_add_executor_job(eloverblik_instance.update_energy)
-        _LOGGER.info("✅ Manuel opdatering af Eloverblik-data færdig")
-
-    hass.services.async_register(DOMAIN, "update_energy", handle_manual_update)
-
-    #
-    # Service: Skift enhed (kWh / MWh) og gem i config_entry
-    #
-    async def handle_set_unit(call: ServiceCall):
-        new_unit = call.data.get("unit")
-        if not new_unit or str(new_unit).lower() not in ["kwh", "mwh"]:
-            _LOGGER.error("Ugyldig enhed: %s (brug 'kWh' eller 'MWh')", new_unit)
-            return
-
-        # Ændr i hukommelsen
-        eloverblik_instance.unit_of_measurement = new_unit
-        _LOGGER.info("⚙️ Enhed ændret til %s i hukommelsen", new_unit)
+    tariff_instance = HassTariff(client, metering_point)
+    # Timehistorik hentes bagud i baggrunden, ét målepunkt ad gangen pr. token
+    history = HistoryBackfill(
+        eloverblik_instance, hass.data.setdefault(DATA_HISTORY_LOCKS, {}).setdefault(refresh_token, asyncio.Lock())
+    )
 
-        # Gem permanent i config entry
-        new_data = dict(entry.data)
-        new_data["unit_of_measurement"] = new_unit
-        hass.config_entries.async_update_entry(entry, data=new_data)
-        _LOGGER.info("💾 Enhed gemt permanent i config_entry: %s", new_unit)
+    # Indlæs de tre små caches samtidigt (ingen netværkskald under opstart);
+    # arkivet med ældre timer indlæses i baggrunden
+    eloverblik_instance.cache = EnergyCache(hass, metering_point)
+    eloverblik_instance.archive.cache = ArchiveCache(hass, metering_point)
+    tariff_instance.cache = TariffCache(hass, metering_point)
+    history.cache = HistoryCache(hass, metering_point)
+    cached, _, _ = await asyncio.gather(
+        eloverblik_instance.cache.async_load(eloverblik_instance),
+        tariff_instance.cache.async_load(tariff_instance),
+        history.cache.async_load(history),
+    )
+    if cached:
+        _LOGGER.debug("Cache indlæst for %s (seneste dag: %s)", metering_point, eloverblik_instance.get_data_date())
 
-        # Opdater sensorer direkte efter ændringen
-        await hass.async_add_executor_job(eloverblik_instance.update_energy)
+    coordinator = ElforbrugDataUpdateCoordinator(
+        hass, eloverblik_instance, tariff_instance, StatisticsImporter(hass, metering_point)
+    )
+    coordinator.history = history
+    history.statistics = coordinator.statistics
+    hass.data[DOMAIN][entry.entry_id] = coordinator
+    archive = entry.async_create_background_task(
+        hass,
+        eloverblik_instance.archive.cache.async_load(eloverblik_instance.archive),
+        f"{DOMAIN} archive {metering_point}",
+    )
 
-    hass.services.async_register(DOMAIN, "set_unit", handle_set_unit)
+    async def _async_after_archive(job):
+        # Hentning, statistik og historik skal se hele lageret
+        await archive
+        await job()
 
+    # Entiteterne viser cachede (eller gendannede) værdier med det samme;
+    # første hentning og historikken startes i baggrunden når Home Assistant er startet
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+
+    @callback
+    def _async_started(_hass):
+        entry.async_create_background_task(
+            hass, _async_after_archive(coordinator.async_refresh), f"{DOMAIN} first refresh {metering_point}"
+        )
+        entry.async_create_background_task(
+            hass, _async_after_archive(history.async_run), f"{DOMAIN} history {metering_point}"
+        )
+
+    entry.async_on_unload(async_at_started(hass, _async_started))
     return True
 
 
@@ -91,19 +124,89 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Slet den gemte cache når en config entry fjernes."""
+    await EnergyCache(hass, entry.data["metering_point"]).async_remove()
+    await TariffCache(hass, entry.data["metering_point"]).async_remove()
+    await HistoryCache(hass, entry.data["metering_point"]).async_remove()
+    await ArchiveCache(hass, entry.data["metering_point"]).async_remove()
+
+
+class HourArchive:
+    """
+    Et målepunkts timer før arkivgrænsen, gemt i en ArchiveCache.
+
+    Grænsen er første dag i den måned opdateringens vindue starter i, så
+    EnergyCache kun holder de seneste uger. saved_end er grænsen i den
+    gemte fil (None før første gemning); EnergyCache gemmer timerne fra den,
+    så de to filer tilsammen altid dækker alle timer.
+    """
+
+    __slots__ = ("_energy", "cache", "saved_end", "_saved")
+
+    def __init__(self, energy):
+        self._energy = energy
+        self.cache = None      # ArchiveCache, sættes i async_setup_entry
+        self.saved_end = None  # grænsen (epoch-sekund) i den gemte fil
+        self._saved = None     # (grænse, checksum) ved seneste gemning
+
+    def end(self):
+        """Arkivgrænsen (epoch-sekund) i dag."""
+        start, _ = day_bounds(self._energy.store.window_start(dt_util.now().date()).replace(day=1))
+        return start
+
+    def _key(self, end):
+        return end, self._energy.store.checksum(end_ts=end)
+
+    def save(self, end):
+        """Planlæg gemning hvis timerne før grænsen eller grænsen selv er ændret."""
+        key = self._key(end)
+        if key == self._saved or self.cache is None:
+            return
+        self._saved = key
+        self.cache.schedule_save()
+
+    def snapshot(self):
+        self.saved_end = self.end()
+        return {"end": self.saved_end, "hours": self._energy.store.dump(end_ts=self.saved_end)}
+
+    def restore(self, data):
+        self.saved_end = data.get("end")
+        self._energy.restore_hours(data.get("hours"))
+        self._saved = self._key(self.end())
+
+
 class HassEloverblik:
     """
     Holder altid rå data i kWh.
     Konvertering til MWh sker først ved udlæsning (get_week_data / koordinatoren).
     """
 
-    def __init__(self, refresh_token, metering_point, unit_of_measurement):
-        self._client = Eloverblik(refresh_token)
+    __slots__ = (
+        "_client", "_metering_point", "unit_of_measurement", "_store", "_data_date",
+        "_week_data", "_year_data", "_year", "cache", "scheduler", "_fingerprint", "metrics",
+        "detector", "_stale", "idle", "_saved", "archive",
+    )
+
+    def __init__(self, client, metering_point, unit_of_measurement):
+        self._client = client
         self._metering_point = metering_point
         self.unit_of_measurement = unit_of_measurement  # "kWh" eller "MWh"/UnitOfEnergy
-        self._day_data = None        # rå timeserier i kWh (sidste dag)
-        self._week_data = {}         # dict: "N days ago" -> dagssum i kWh (rå)
-        self._year_data = None       # objekt fra klienten (total i kWh)
+        self._store = HourlyStore()  # timeværdier i kWh (rå), nøglet på tidsstempel
+        self._data_date = None       # seneste dag med data i lageret
+        self._week_data = np.empty(0)  # dagssummer i kWh (rå) for 1-7 dage før seneste dag (NaN = mangler)
+        self._year_data = None       # månedstotaler i kWh for indeværende år
+        self._year = None            # året _year_data gælder for
+        self.cache = None            # EnergyCache, sættes i async_setup_entry
+        self.scheduler = RefreshScheduler()  # lærer hvornår nye data kommer
+        self._fingerprint = None     # se fingerprint()
+        self.metrics = Metrics()     # tid pr. trin og seneste succes for målepunktet
+        self.detector = ConsumptionDetector()  # grundlast og afvigelser, opdateres af koordinatoren
+        self._stale = True           # seneste hentning fejlede helt eller delvist (eller er ikke sket)
+        self.idle = asyncio.Event()  # sat når ingen opdatering kører (HistoryBackfill venter på den)
+        self.idle.set()
+        self._saved = None           # tilstanden ved seneste gemning, se save_cache()
+        self.archive = HourArchive(self)  # ældre timer i deres egen cache
 
     # ---------- Hjælpere ----------
 
@@ -114,121 +217,240 @@ class HassEloverblik:
         """Konverter til valgt enhed først ved præsentation; rund til 3 dec."""
         if value is None:
             return None
+        if isinstance(value, np.ndarray):
+            return np.round(value / 1000.0 if self._is_mwh() else value, 3)
         if self._is_mwh():
             return round(value / 1000.0, 3)
         return round(value, 3)
 
     # ---------- Offentlige “getter” metoder ----------
 
-    def get_usage_hour(self, hour):
-        """Rå timeværdi i kWh (3 dec). Ingen konvertering her."""
-        if self._day_data:
-            try:
-                return round(self._day_data.get_metering_data(hour), 3)
-            except IndexError:
-                return 0.0
-            except Exception as e:
-                _LOGGER.debug("Fejl i get_usage_hour: %s", e)
-                return None
-        _LOGGER.warning("No day data available.")
-        return None
+    def get_usage_day(self, hours=None):
+        """Rå dagssum i kWh for seneste dag (evt. kun de første `hours` timer)."""
+        if self._data_date is None:
+            return None
+        return self._store.day_sum(self._data_date, hours)
 
-    def get_usage_day(self, day, hour):
-        """Samme som get_usage_hour; 'day' bruges ikke i API-data."""
-        return self.get_usage_hour(hour)
+    def get_month_to_date(self):
+        """Forbrug i kWh (rå) for indeværende måned til og med seneste time."""
+        today = dt_util.now().date()
+        return round(self._store.month_sum(today.year, today.month), 3)
 
     def get_total_year(self):
-        """Total for året i kWh (rå)."""
+        """
+        Total for året i kWh (rå).
+
+        Fra timelagerets dagstotaler når historikken dækker hele året, ellers
+        fra Eloverbliks månedstotaler.
+        """
+        today = dt_util.now().date()
+        new_year = today.replace(month=1, day=1)
+        if self._store.rollup.hours(new_year):
+            return round(self._store.rollup.total(new_year, today + timedelta(days=1)), 3)
         if self._year_data:
-            return round(self._year_data.get_total_metering_data(), 3)
+            return round(sum(self._year_data), 3)
         return None
 
     def get_data_date(self):
-        if self._day_data and hasattr(self._day_data, "data_date"):
-            try:
-                return self._day_data.data_date.date().strftime("%Y-%m-%d")
-            except Exception:
-                return None
+        if self._data_date:
+            return self._data_date.strftime("%Y-%m-%d")
         _LOGGER.debug("No day data available for get_data_date.")
         return None
 
     def get_metering_point(self):
         return self._metering_point
 
+    @property
+    def store(self):
+        """Timelageret (kWh) for målepunktet."""
+        return self._store
+
+    @property
+    def client(self):
+        """Klienten (BatchingClient) der deles med andre målepunkter på samme token."""
+        return self._client
+
     def get_week_data(self):
         """Returnér uge-opsummering i VALGT enhed."""
-        return {k: self._convert(v) if isinstance(v, (int, float)) else v for k, v in self._week_data.items()}
+        if not len(self._week_data):
+            return {}
+        values = self._convert(self._week_data).tolist()
+        return {k: None if v != v else v for k, v in zip(WEEK_KEYS, values)}  # NaN -> None
+
+    def fingerprint(self):
+        """
+        Fingeraftryk af de hentede data (timelager og månedstotaler).
+
+        Beregnes én gang pr. opdatering; uændret fingeraftryk betyder at
+        sensorerne ikke behøver at regne eller skrive state igen.
+        """
+        return self._fingerprint
+
+    def _update_fingerprint(self):
+        self._fingerprint = (
+            self._store.fingerprint(),
+            self._year,
+            tuple(self._year_data or ()),
+        )
+
+    def is_stale(self) -> bool:
+        """True hvis data ikke er bekræftet af en vellykket hentning siden start/sidste fejl."""
+        return self._stale
+
+    def has_data(self) -> bool:
+        return self._data_date is not None or bool(self._year_data)
+
+    # ---------- Cache ----------
+
+    def _cache_key(self, end):
+        return (
+            self._store.checksum(start_ts=end),
+            self._year,
+            tuple(self._year_data or ()),
+            self.scheduler.dump(),
+            self.detector.revision,
+        )
+
+    def save_cache(self):
+        """
+        Planlæg gemning af cachen, men kun hvis timer, månedstotaler,
+        scheduler eller detektor er ændret siden sidst. Timerne før
+        arkivgrænsen gemmes for sig af HourArchive, så en opdatering kun
+        skriver de seneste uger.
+        """
+        end = self.archive.end()
+        self.archive.save(end)
+        key = self._cache_key(end)
+        if key == self._saved or self.cache is None:
+            return
+        self._saved = key
+        self.cache.schedule_save()
+
+    def snapshot(self):
+        """Data til EnergyCache: timerne fra arkivgrænsen og månedstotaler (kWh)."""
+        return {
+            "hours": self._store.dump(start_ts=self.archive.saved_end),
+            "year": self._year,
+            "months": self._year_data,
+            "schedule": self.scheduler.dump(),
+            "analytics": self.detector.snapshot(),
+        }
+
+    def restore(self, data):
+        """Genskab tilstand fra en snapshot() uden netværkskald."""
+        self._store.load(data.get("hours"))
+        self.scheduler.load(data.get("schedule"), self._store.last_day())
+        self.detector.restore(data.get("analytics"))
+        if data.get("year") == dt_util.now().year:
+            self._year = data["year"]
+            self._year_data = data.get("months")
+        self._rebuild_from_store()
+        self._update_fingerprint()
+        self._saved = self._cache_key(self.archive.end())
+
+    def restore_hours(self, data):
+        """Flet cachede timer ind efter restore() (ArchiveCache indlæses i baggrunden)."""
+        self._store.load(data)
+        self._rebuild_from_store()
+        self._update_fingerprint()
 
     # ---------- Hent/byg data (kører i kWh) ----------
 
-    @Throttle(MIN_TIME_BETWEEN_UPDATES)
-    def update_energy(self):
-        try:
-            _LOGGER.debug("Starter update_energy for metering point %s", self._metering_point)
-
-            # Hent sidste 8 dages time-data (rå i kWh)
-            raw = self._client.get_time_series(
-                self._metering_point,
-                from_date=datetime.now() - timedelta(days=8),
-                to_date=datetime.now(),
-                aggregation="Hour",
-            )
+    def _rebuild_from_store(self):
+        """Find seneste dag og byg ugedata ud fra timelageret."""
+        last_date = self._store.last_day()
+        if last_date is None:
+            _LOGGER.debug("Ingen daglige time-serier fundet i lageret.")
+            self._week_data = np.empty(0)
+            return
 
-            if raw.status == 200:
-                try:
-                    json_response = json.loads(raw.body)
-                    parsed = self._client._parse_result(json_response)
-                except Exception as e:
-                    _LOGGER.exception("Kunne ikke parse time-series JSON: %s", e)
-                    parsed = {}
-
-                date_map = {k.date(): ts for k, ts in parsed.items() if isinstance(k, datetime)}
-
-                if not date_map:
-                    _LOGGER.debug("Ingen daglige time-serier fundet i API-respons.")
-                    self._week_data = {}
-                else:
-                    last_date = max(date_map.keys())
-                    self._day_data = date_map.get(last_date)
-
-                    wd = {}
-                    for i in range(1, 8):
-                        target = last_date - timedelta(days=i)
-                        ts = date_map.get(target)
-                        if ts is None:
-                            wd[f"{i} days ago"] = None
-                            continue
-
-                        day_sum = sum(float(ts.get_metering_data(h) or 0) for h in range(24))
-                        wd[f"{i} days ago"] = round(day_sum, 3)
-
-                    self._week_data = wd
-
-            else:
-                _LOGGER.warning(
-                    "Error from Eloverblik when getting time series: %s - %s",
-                    raw.status,
-                    getattr(raw, "body", None),
-                )
-                self._week_data = {}
-
-            # Årsdata
-            year_data = self._client.get_per_month(self._metering_point)
-            if year_data.status == 200:
-                self._year_data = year_data
-            else:
-                _LOGGER.warning(
-                    "Error from Eloverblik when getting year data: %s - %s",
-                    year_data.status,
-                    getattr(year_data, "detailed_status", year_data),
-                )
-
-        except requests.exceptions.HTTPError as he:
-            message = (
+        self._data_date = last_date
+
+        # Dagssummer for de 7 foregående dage fra rollup'en, nyeste først (indeks 0 = "1 days ago")
+        self._week_data = np.round(self._store.day_sums(last_date - timedelta(days=7), 7)[::-1], 3)
+
+    async def _async_update_hours(self):
+        """Hent de dage der mangler eller stadig kan blive efterudfyldt, og flet dem ind."""
+        today = dt_util.now().date()
+        from_date = self._store.fetch_from(today)
+        with self.metrics.timer("fetch_hours"):
+            points = await self._client.async_get_time_series_points(
+                [self._metering_point], from_date, today, aggregation="Hour"
+            )
+        points = points.get(self._metering_point, [])
+
+        with self.metrics.timer("aggregate"):
+            changed = self._store.merge(points)
+            self._store.prune(today)
+            self._rebuild_from_store()
+        _LOGGER.debug(
+            "Hentede %s timer fra %s, %s ændret", len(points), from_date, changed
+        )
+        return changed
+
+    async def _async_update_months(self):
+        """Hent årets månedstotaler."""
+        with self.metrics.timer("fetch_months"):
+            year_data = await self._client.async_get_per_month(self._metering_point)
+        self._year_data = year_data
+        self._year = dt_util.now().year
+        return len(year_data)
+
+    async def _async_guarded(self, func):
+        """
+        Kør ét hentetrin. Fejl logges og giver None, så de seneste gode data
+        beholdes; EloverblikThrottleError sendes videre.
+        """
+        try:
+            return await func()
+        except EloverblikThrottleError as err:
+            self.metrics.throttled += 1
+            self.metrics.record_error(err)
+            raise
+        except EloverblikAuthError as err:
+            self.metrics.record_error(err)
+            _LOGGER.warning(
                 "Unauthorized error while accessing Eloverblik.dk. Wrong or expired refresh token?"
-                if he.response.status_code == 401
-                else f"Exception: {he}"
             )
-            _LOGGER.warning(message)
+        except EloverblikApiError as err:
+            self.metrics.record_error(err)
+            _LOGGER.warning("Error from Eloverblik: %s - %s", err.status, err.body)
+        except API_ERRORS as err:
+            self.metrics.record_error(err)
+            _LOGGER.warning("Kunne ikke kontakte Eloverblik: %s", err)
         except Exception as e:
-            _LOGGER.exception("Exception in update_energy(): %s", e)
\ No newline at end of file
+            self.metrics.record_error(e)
+            _LOGGER.exception("Exception in update_energy(): %s", e)
+        return None
+
+    async def async_update_energy(self):
+        """
+        Hent nye timer og årsdata. Returnerer antal ændrede timer (None ved fejl).
+
+        Timer og månedstotaler hentes hver for sig: fejler det ene, flettes
+        det andet stadig ind, og de cachede data beholdes for resten. Data
+        markeres som forældede (`is_stale`) til en opdatering lykkes helt.
+        EloverblikThrottleError sendes videre, så koordinatoren kan vente.
+        """
+        _LOGGER.debug("Starter update_energy for metering point %s", self._metering_point)
+        changed = months = None
+        self.idle.clear()
+        try:
+            # Samtidigt, så begge kald venter det samme BatchingClient-vindue
+            results = await asyncio.gather(
+                self._async_guarded(self._async_update_hours),
+                self._async_guarded(self._async_update_months),
+                return_exceptions=True,
+            )
+            changed, months = (None if isinstance(r, BaseException) else r for r in results)
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+        finally:
+            self._stale = changed is None or months is None
+            if not self._stale:
+                self.metrics.record_success()
+            self._update_fingerprint()
+            self.save_cache()
+            self.idle.set()
+        return changed
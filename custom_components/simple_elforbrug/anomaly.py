@@ -0,0 +1,177 @@
+"""Simple Elforbrug løbende grundlast og afvigelser i timeforbruget."""
+from array import array
+from collections import deque
+import math
+
+import numpy as np
+
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    ANOMALY_ALPHA,
+    ANOMALY_EVENT_HOURS,
+    ANOMALY_MIN_SAMPLES,
+    ANOMALY_MIN_STD,
+    ANOMALY_THRESHOLD,
+    BASELOAD_HOURS,
+)
+
+HOUR = 3600
+HOURS_PER_WEEK = 7 * 24
+
+
+def hour_of_week(ts):
+    """0-167 for en time (epoch-sekund) i lokal tid, mandag kl. 0 = 0."""
+    local = dt_util.as_local(dt_util.utc_from_timestamp(ts))
+    return local.weekday() * 24 + local.hour
+
+
+class ConsumptionDetector:
+    """
+    Streaming-statistik over et målepunkts timeforbrug.
+
+    For hver time på ugen (168) holdes et eksponentielt vægtet gennemsnit og
+    varians. En ny time får en score: afvigelsen fra det forventede for
+    ugetimen i standardafvigelser, beregnet før timen lægges ind. Grundlasten
+    er mindste timeforbrug de seneste BASELOAD_HOURS timer, holdt i en
+    monoton kø.
+
+    ingest() læser kun timer nyere end sidst indlæste fra timelageret; hver
+    time koster O(1), og historikken regnes aldrig igennem igen (undtagen
+    efter reset(), når historikken er hentet, og da i bidder). Timer der
+    mangler ved indlæsningen og kommer senere, springes over.
+
+    Tilstanden pr. ugetime ligger i kompakte array'er (8 bytes pr. værdi).
+    """
+
+    __slots__ = ("_mean", "_var", "_count", "_last", "_window", "_alerting", "latest", "last_anomaly", "revision")
+
+    def __init__(self):
+        self._mean = array("d", bytes(8 * HOURS_PER_WEEK))
+        self._var = array("d", bytes(8 * HOURS_PER_WEEK))
+        self._count = array("q", bytes(8 * HOURS_PER_WEEK))
+        self._last = None        # seneste indlæste time (epoch-sekund)
+        self._window = deque()   # (epoch-sekund, kWh) med stigende kWh: rullende minimum
+        self._alerting = False   # seneste time lå over tærsklen
+        self.latest = None       # seneste time: start, kWh, forventet, std, score
+        self.last_anomaly = None # seneste afvigelse (som i eventet)
+        self.revision = 0        # øges når der er indlæst nye timer
+
+    @property
+    def baseload(self):
+        """Grundlast i kWh/h (mindste timeforbrug i vinduet), None uden data."""
+        return self._window[0][1] if self._window else None
+
+    @property
+    def baseload_since(self):
+        """Timen (epoch-sekund) grundlasten blev målt."""
+        return self._window[0][0] if self._window else None
+
+    @property
+    def alerting(self) -> bool:
+        return self._alerting
+
+    def reset(self):
+        """Glem alt, så næste ingest() lærer forfra fra lagerets ældste time."""
+        revision = self.revision
+        self.__init__()
+        self.revision = revision + 1
+
+    # ---------- Indlæsning ----------
+
+    def _observe(self, ts, value):
+        """Læg én time ind og returnér dens score (None under indlæring)."""
+        window = self._window
+        while window and window[-1][1] >= value:
+            window.pop()
+        window.append((ts, value))
+        while window[0][0] <= ts - BASELOAD_HOURS * HOUR:
+            window.popleft()
+
+        slot = hour_of_week(ts)
+        count, mean, var = self._count[slot], self._mean[slot], self._var[slot]
+        std = max(math.sqrt(var), ANOMALY_MIN_STD)
+        score = (value - mean) / std if count >= ANOMALY_MIN_SAMPLES else None
+        if count:
+            diff = value - mean
+            increment = ANOMALY_ALPHA * diff
+            self._mean[slot] = mean + increment
+            self._var[slot] = (1 - ANOMALY_ALPHA) * (var + diff * increment)
+        else:
+            self._mean[slot] = value
+        self._count[slot] = count + 1
+        self.latest = {"start": ts, "value": value, "expected": mean, "std": std, "score": score}
+        return score
+
+    def _start(self, store):
+        return store.first_hour() if self._last is None else self._last + HOUR
+
+    def pending(self, store):
+        """Antal timer i lageret der ikke er indlæst endnu (inkl. manglende)."""
+        start = self._start(store)
+        if start is None or store.high_water is None or start > store.high_water:
+            return 0
+        return (store.high_water - start) // HOUR + 1
+
+    def ingest(self, store, max_hours=None):
+        """
+        Indlæs nye timer fra et HourlyStore, højst `max_hours` ad gangen.
+
+        Returnerer en liste af afvigelser (dicts) hvor scoren krydsede
+        ANOMALY_THRESHOLD. Kun timer inden for ANOMALY_EVENT_HOURS af den
+        seneste time giver afvigelser, så indlæring på historik er stille.
+        """
+        pending = self.pending(store)
+        if not pending:
+            return []
+        start = self._start(store)
+        count = pending if max_hours is None else min(pending, max_hours)
+        values = store.hours_from(start)[:count]
+        present = np.flatnonzero(~np.isnan(values))
+        report_from = store.high_water - ANOMALY_EVENT_HOURS * HOUR
+
+        anomalies = []
+        for i in present.tolist():
+            ts = start + i * HOUR
+            value = float(values[i])
+            score = self._observe(ts, value)
+            alerting = score is not None and abs(score) >= ANOMALY_THRESHOLD
+            if alerting and not self._alerting and ts >= report_from:
+                self.last_anomaly = {
+                    **self.latest,
+                    "start": dt_util.as_local(dt_util.utc_from_timestamp(ts)).isoformat(),
+                    "kind": "high" if score > 0 else "low",
+                }
+                anomalies.append(self.last_anomaly)
+            self._alerting = alerting
+        self._last = start + (count - 1) * HOUR
+        if len(present):
+            self.revision += 1
+        return anomalies
+
+    # ---------- Persistens ----------
+
+    def snapshot(self):
+        return {
+            "mean": self._mean.tolist(),
+            "var": self._var.tolist(),
+            "count": self._count.tolist(),
+            "last": self._last,
+            "window": list(self._window),
+            "alerting": self._alerting,
+            "latest": self.latest,
+            "last_anomaly": self.last_anomaly,
+        }
+
+    def restore(self, data):
+        if not data or len(data.get("count") or ()) != HOURS_PER_WEEK:
+            return
+        self._mean = array("d", data["mean"])
+        self._var = array("d", data["var"])
+        self._count = array("q", data["count"])
+        self._last = data.get("last")
+        self._window = deque((int(ts), float(v)) for ts, v in data.get("window") or ())
+        self._alerting = bool(data.get("alerting"))
+        self.latest = data.get("latest")
+        self.last_anomaly = data.get("last_anomaly")
+        self.revision += 1
@@ -0,0 +1,485 @@
+"""Simple Elforbrug klienter til Eloverblik Customer API."""
+import asyncio
+import base64
+from datetime import date, timedelta
+import json
+import logging
+import time
+
+import aiohttp
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    API_BASE_URL,
+    API_TIMEOUT,
+    CLIENT_PYELOVERBLIK,
+    DATA_TOKENS,
+    STREAM_CHUNK_SIZE,
+    STREAM_MIN_SIZE,
+)
+from .metrics import Metrics
+from .parser import TimeSeriesStreamParser, monthly_values, parse_time_series_stream
+from .resilience import CircuitBreaker, async_retry
+
+_LOGGER = logging.getLogger(__name__)
+
+DATE_FORMAT = "%Y-%m-%d"
+TOKEN_LIFETIME = timedelta(hours=24)       # hvis tokenet ikke selv angiver udløb
+TOKEN_REFRESH_MARGIN = timedelta(hours=1)  # forny så længe før udløb
+NOT_MODIFIED = object()  # svar 304: det gemte svar gælder stadig
+
+
+class EloverblikApiError(Exception):
+    """Fejlsvar fra Eloverblik."""
+
+    def __init__(self, status, body=None):
+        super().__init__(f"{status} - {body}")
+        self.status = status
+        self.body = body
+
+
+class EloverblikAuthError(EloverblikApiError):
+    """Refresh token afvist (forkert eller udløbet)."""
+
+
+class EloverblikThrottleError(EloverblikApiError):
+    """Eloverblik beder os vente (429/503); `retry_after` i sekunder hvis angivet."""
+
+    def __init__(self, status, body=None, retry_after=None):
+        super().__init__(status, body)
+        self.retry_after = retry_after
+
+
+class EloverblikUnavailableError(EloverblikThrottleError):
+    """Endpointet er pauset af sin circuit breaker; kaldet blev ikke sendt."""
+
+    def __init__(self, endpoint, retry_after):
+        super().__init__("unavailable", f"{endpoint} pauset i {retry_after} s", retry_after)
+
+
+API_ERRORS = (EloverblikApiError, aiohttp.ClientError, asyncio.TimeoutError)
+THROTTLE_STATUSES = (429, 503)
+
+
+def _transient(err):
+    """Fejl hos Eloverblik eller på nettet (ikke i selve kaldet); tæller mod breakeren."""
+    if isinstance(err, EloverblikUnavailableError):
+        return False
+    if isinstance(err, EloverblikApiError):
+        return isinstance(err, EloverblikThrottleError) or (
+            isinstance(err.status, int) and err.status >= 500
+        )
+    # OSError dækker også requests' forbindelsesfejl fra pyeloverblik
+    return isinstance(err, (aiohttp.ClientError, asyncio.TimeoutError, OSError))
+
+
+def _retryable(err):
+    # 429/503 beder os vente længere end et retry: det klarer schedulereren
+    return _transient(err) and not isinstance(err, EloverblikThrottleError)
+
+
+def _api_error(status, body, headers=None):
+    """Den rette fejltype for et ikke-200 svar."""
+    if status == 401:
+        return EloverblikAuthError(status, body)
+    if status in THROTTLE_STATUSES:
+        retry_after = (headers or {}).get("Retry-After")
+        return EloverblikThrottleError(
+            status, body, int(retry_after) if retry_after and retry_after.isdigit() else None
+        )
+    return EloverblikApiError(status, body)
+
+
+def _metering_points_body(metering_points):
+    return {"meteringPoints": {"meteringPoint": list(metering_points)}}
+
+
+def year_range(year=None):
+    today = dt_util.now().date()
+    year = year or today.year
+    return date(year, 1, 1), date(year, 12, 31) if year < today.year else today
+
+
+def _time_series_path(from_date, to_date, aggregation):
+    return (
+        f"api/MeterData/GetTimeSeries/"
+        f"{from_date.strftime(DATE_FORMAT)}/{to_date.strftime(DATE_FORMAT)}/{aggregation}"
+    )
+
+
+async def async_get_per_month(client, metering_point, year=None):
+    """Månedsværdier i kWh for året via en klients async_get_time_series_points."""
+    from_date, to_date = year_range(year)
+    points = await client.async_get_time_series_points([metering_point], from_date, to_date, "Month")
+    return monthly_values(points.get(metering_point))
+
+
+def _token_expiry(token):
+    """Udløbstidspunkt fra JWT'ens exp-claim, eller None."""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return dt_util.utc_from_timestamp(int(claims["exp"]))
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def _endpoint_for(aggregation):
+    return "per_month" if aggregation == "Month" else "time_series"
+
+
+def _endpoint(url):
+    """Kort navn for et endpoint til målinger."""
+    if url.endswith("/Token"):
+        return "token"
+    if "/GetTimeSeries/" in url:
+        return _endpoint_for(url.rsplit("/", 1)[-1])
+    if url.endswith("/getcharges"):
+        return "charges"
+    return "other"
+
+
+async def _async_request(session, method, url, token, payload=None, parser=None, validators=None, metrics=None):
+    """
+    Udfør et kald og returnér JSON-svaret.
+
+    Med en `parser` streames et 200-svar i bidder ind i den i stedet for at
+    blive læst og decodet i ét stykke; så returneres None. Svar med en kendt
+    længde (Content-Length) under STREAM_MIN_SIZE decodes dog med json.loads og gives til
+    `parser.load()`, da det er hurtigere for små svar.
+
+    Med `validators` ({"etag", "last_modified"}) bliver kaldet betinget: svarer
+    serveren 304 returneres NOT_MODIFIED, og ellers opdateres dict'en med
+    svarets ETag/Last-Modified.
+
+    Med `metrics` registreres latens, parsetid, statuskode og svarstørrelse.
+    """
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/json",
+    }
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    start = time.perf_counter()
+    status, size, parse = "error", 0, 0.0
+    try:
+        async with session.request(
+            method,
+            url,
+            json=payload,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=API_TIMEOUT),
+        ) as response:
+            status = response.status
+            if status == 304 and validators is not None:
+                return NOT_MODIFIED
+            if status == 200 and validators is not None:
+                validators["etag"] = response.headers.get("ETag")
+                validators["last_modified"] = response.headers.get("Last-Modified")
+            length = response.content_length
+            if status == 200 and parser is not None and (length is None or length >= STREAM_MIN_SIZE):
+                async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                    size += len(chunk)
+                    parsed = time.perf_counter()
+                    parser.feed(chunk)
+                    parse += time.perf_counter() - parsed
+                parser.feed(b"", final=True)
+                return None
+            body = await response.text()
+            size = len(body)
+            if status != 200:
+                raise _api_error(status, body, response.headers)
+            parsed = time.perf_counter()
+            result = json.loads(body)
+            if parser is not None:
+                parser.load(result)
+                result = None
+            parse = time.perf_counter() - parsed
+            return result
+    finally:
+        if metrics is not None:
+            endpoint = _endpoint(url)
+            metrics.latency[f"api_{endpoint}"].observe(time.perf_counter() - start)
+            if parse:
+                metrics.latency["parse"].observe(parse)
+            metrics.record_response(endpoint, status, size)
+            if status in THROTTLE_STATUSES:
+                metrics.throttled += 1
+
+
+class TokenManager:
+    """
+    Fælles data access token for ét refresh token.
+
+    Deles af alle klienter og config entries med samme refresh token.
+    Tokenet fornys inden det udløber, og samtidige kald venter på den samme
+    udveksling i stedet for at starte hver deres.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, refresh_token: str, base_url=API_BASE_URL):
+        self._session = session
+        self._refresh_token = refresh_token
+        self._url = base_url.rstrip("/") + "/api/Token"
+        self._token = None
+        self._expires = None
+        self._lock = asyncio.Lock()
+        self.exchanges = 0
+        self.metrics = Metrics()  # token og API-kald for alle klienter på dette token
+        self.breakers = {}        # endpoint -> CircuitBreaker
+
+    @property
+    def refresh_token(self):
+        return self._refresh_token
+
+    def breaker(self, endpoint):
+        if endpoint not in self.breakers:
+            self.breakers[endpoint] = CircuitBreaker(endpoint)
+        return self.breakers[endpoint]
+
+    async def async_call(self, endpoint, call):
+        """
+        Kør et kald til `endpoint` gennem dets circuit breaker med retries.
+
+        Mens breakeren er åben fejler kaldet med det samme med
+        EloverblikUnavailableError uden at ramme Eloverblik.
+        """
+        breaker = self.breaker(endpoint)
+        if not breaker.allow():
+            raise EloverblikUnavailableError(endpoint, breaker.retry_in())
+        try:
+            result = await async_retry(call, _retryable)
+        except asyncio.CancelledError:
+            # Fx ved unload: breakeren overlever i hass.data, så et prøvekald
+            # må ikke blive hængende (også for token-kaldet inde i kaldet)
+            breaker.release()
+            raise
+        except Exception as err:
+            if _transient(err):
+                breaker.failure()
+            else:
+                breaker.success()  # Eloverblik svarede; fejlen ligger i kaldet
+            raise
+        breaker.success()
+        return result
+
+    def _valid(self):
+        return self._token is not None and dt_util.utcnow() < self._expires - TOKEN_REFRESH_MARGIN
+
+    async def async_get_token(self):
+        """Gyldigt data access token; udveksler kun når det er nødvendigt."""
+        if self._valid():
+            return self._token
+        async with self._lock:
+            if self._valid():
+                return self._token
+            result = await self.async_call("token", lambda: _async_request(
+                self._session, "GET", self._url, self._refresh_token, metrics=self.metrics
+            ))
+            self._token = result["result"]
+            self._expires = _token_expiry(self._token) or dt_util.utcnow() + TOKEN_LIFETIME
+            self.exchanges += 1
+            _LOGGER.debug("Nyt data access token, udløber %s", self._expires)
+            return self._token
+
+    def invalidate(self, token):
+        """Glem tokenet hvis det blev afvist (kun hvis ingen har fornyet det)."""
+        if self._token == token:
+            self._token = None
+
+
+def get_token_manager(hass: HomeAssistant, refresh_token: str) -> TokenManager:
+    """Den fælles TokenManager for et refresh token."""
+    managers = hass.data.setdefault(DATA_TOKENS, {})
+    if refresh_token not in managers:
+        managers[refresh_token] = TokenManager(async_get_clientsession(hass), refresh_token)
+    return managers[refresh_token]
+
+
+class EloverblikApiClient:
+    """
+    Asynkron klient mod Eloverblik.
+
+    Bruger Home Assistants fælles aiohttp-session, så forbindelser genbruges
+    (keep-alive) og ingen executor-tråde bindes under et kald.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, tokens: TokenManager, base_url=API_BASE_URL):
+        self._session = session
+        self._tokens = tokens
+        self._base_url = base_url.rstrip("/") + "/"
+
+    @property
+    def metrics(self):
+        return self._tokens.metrics
+
+    @property
+    def breakers(self):
+        return self._tokens.breakers
+
+    async def _async_request(self, method, path, payload=None, parser_factory=None, validators=None):
+        return await self._tokens.async_call(
+            _endpoint(path),
+            lambda: self._async_request_once(method, path, payload, parser_factory, validators),
+        )
+
+    async def _async_request_once(self, method, path, payload, parser_factory, validators):
+        token = await self._tokens.async_get_token()
+        parser = parser_factory() if parser_factory else None
+        try:
+            result = await _async_request(
+                self._session, method, self._base_url + path, token, payload, parser, validators,
+                self._tokens.metrics,
+            )
+        except EloverblikAuthError:
+            # Tokenet kan være tilbagekaldt før tid: forny én gang og prøv igen
+            self._tokens.invalidate(token)
+            token = await self._tokens.async_get_token()
+            parser = parser_factory() if parser_factory else None
+            result = await _async_request(
+                self._session, method, self._base_url + path, token, payload, parser, validators,
+                self._tokens.metrics,
+            )
+        return parser if parser is not None else result
+
+    async def async_get_time_series_points(self, metering_points, from_date, to_date, aggregation="Hour"):
+        """GetTimeSeries parset mens svaret streames: {målepunkt: punkter}."""
+        parser = await self._async_request(
+            "POST",
+            _time_series_path(from_date, to_date, aggregation),
+            _metering_points_body(metering_points),
+            TimeSeriesStreamParser,
+        )
+        return parser.points()
+
+    async def async_get_per_month(self, metering_point, year=None):
+        """Månedsværdier i kWh for året."""
+        return await async_get_per_month(self, metering_point, year)
+
+    async def async_get_charges(self, metering_point, validators=None):
+        """
+        Rå getcharges-svar (dict) for et målepunkt.
+
+        Med `validators` sendes kaldet betinget og kan give NOT_MODIFIED.
+        """
+        return await self._async_request(
+            "POST",
+            "api/meteringpoints/meteringpoint/getcharges",
+            _metering_points_body([metering_point]),
+            validators=validators,
+        )
+
+
+class PyEloverblikClient:
+    """
+    Den oprindelige blokerende pyeloverblik-klient bag samme interface.
+
+    Kaldene køres i Home Assistants executor. Tokenet hentes fra den fælles
+    TokenManager i stedet for pyeloverbliks egen (globale) token-cache.
+    """
+
+    def __init__(self, hass: HomeAssistant, tokens: TokenManager):
+        from pyeloverblik.eloverblik import Eloverblik  # pylint: disable=import-outside-toplevel
+
+        self._hass = hass
+        self._client = Eloverblik(tokens.refresh_token)
+        self._client._get_access_token = self._get_access_token  # pylint: disable=protected-access
+        self._tokens = tokens
+
+    def _get_access_token(self):
+        """Kaldes fra executor-tråden af pyeloverblik."""
+        return asyncio.run_coroutine_threadsafe(
+            self._tokens.async_get_token(), self._hass.loop
+        ).result()
+
+    @property
+    def metrics(self):
+        return self._tokens.metrics
+
+    @property
+    def breakers(self):
+        return self._tokens.breakers
+
+    async def _async_run(self, endpoint, func, *args):
+        return await self._tokens.async_call(endpoint, lambda: self._async_run_once(endpoint, func, *args))
+
+    async def _async_run_once(self, endpoint, func, *args):
+        import requests  # pylint: disable=import-outside-toplevel
+
+        metrics = self._tokens.metrics
+        status = 200
+        try:
+            with metrics.timer(f"api_{endpoint}"):
+                return await self._hass.async_add_executor_job(func, *args)
+        except EloverblikApiError as err:
+            status = err.status
+            raise
+        except requests.exceptions.HTTPError as he:
+            response = he.response
+            status = response.status_code
+            raise _api_error(response.status_code, response.text, response.headers) from he
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            metrics.record_response(endpoint, status)
+            if status in THROTTLE_STATUSES:
+                metrics.throttled += 1
+
+    def _get_raw_time_series(self, metering_points, from_date, to_date, aggregation):
+        for metering_point in metering_points:
+            raw = self._client.get_time_series(
+                metering_point, from_date=from_date, to_date=to_date, aggregation=aggregation
+            )
+            if raw.status != 200:
+                raise _api_error(raw.status, raw.body)
+            yield raw.body
+
+    def _get_time_series_points(self, metering_points, from_date, to_date, aggregation):
+        points = {}
+        for body in self._get_raw_time_series(metering_points, from_date, to_date, aggregation):
+            points.update(parse_time_series_stream(body, STREAM_MIN_SIZE))
+        return points
+
+    def _get_charges(self, metering_point):
+        from pyeloverblik.eloverblik import http  # pylint: disable=import-outside-toplevel
+
+        client = self._client
+        headers = client._create_headers(client._get_access_token())  # pylint: disable=protected-access
+        response = http.post(
+            client._base_url + "api/meteringpoints/meteringpoint/getcharges",  # pylint: disable=protected-access
+            json=_metering_points_body([metering_point]),
+            headers=headers,
+            timeout=API_TIMEOUT,
+        )
+        if response.status_code != 200:
+            raise _api_error(response.status_code, response.text, response.headers)
+        return response.json()
+
+    async def async_get_time_series_points(self, metering_points, from_date, to_date, aggregation="Hour"):
+        return await self._async_run(
+            _endpoint_for(aggregation), self._get_time_series_points, metering_points, from_date, to_date, aggregation
+        )
+
+    async def async_get_per_month(self, metering_point, year=None):
+        return await async_get_per_month(self, metering_point, year)
+
+    async def async_get_charges(self, metering_point, validators=None):
+        # pyeloverblik sender ikke betingede kald; svaret er altid fuldt
+        if validators is not None:
+            validators.clear()
+        return await self._async_run("charges", self._get_charges, metering_point)
+
+
+def create_client(hass: HomeAssistant, refresh_token: str, kind=None):
+    """Opret den valgte klient (standard: asynkron aiohttp-klient)."""
+    tokens = get_token_manager(hass, refresh_token)
+    if kind == CLIENT_PYELOVERBLIK:
+        return PyEloverblikClient(hass, tokens)
+    return EloverblikApiClient(async_get_clientsession(hass), tokens)
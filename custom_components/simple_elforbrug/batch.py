@@ -0,0 +1,144 @@
+"""Simple Elforbrug samlede time-series kald for flere målepunkter."""
+import asyncio
+import logging
+
+from homeassistant.core import HomeAssistant, callback
+
+from .api import async_get_per_month, create_client
+from .const import BATCH_MAX_METERING_POINTS, BATCH_WINDOW, DATA_BATCHERS
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class BatchingClient:
+    """
+    Samler time-series kald fra flere målepunkter med samme refresh token.
+
+    Første kald i et vindue venter BATCH_WINDOW sekunder på de andre entries
+    og sender så ét kald med alle målepunkter (og det samlede datointerval).
+    Det streamede svar er allerede delt op pr. målepunkt, så hver entry får
+    sine egne punkter. Øvrige kald går direkte videre til den underliggende
+    klient.
+
+    Vinduet og kaldet kører i deres egen opgave, som alle kaldere venter på
+    (skærmet), så en afbrudt kalder (fx ved unload) ikke afbryder de andres.
+    Med kun én entry på klienten (`users`) er der ingen at vente på, og
+    kaldet går direkte videre.
+    """
+
+    def __init__(self, client, window=BATCH_WINDOW, max_size=BATCH_MAX_METERING_POINTS):
+        self._client = client
+        self._window = window
+        self._max_size = max_size
+        self._pending = {}  # aggregation -> ([(målepunkter, fra, til)], opgave)
+        self._tasks = set()
+        self.users = 0  # entries der deler klienten, se get_batching_client
+
+    @property
+    def metrics(self):
+        return self._client.metrics
+
+    @property
+    def breakers(self):
+        return self._client.breakers
+
+    async def _async_fetch(self, batch, aggregation):
+        metering_points = sorted({mp for mps, _, _ in batch for mp in mps})
+        from_date = min(f for _, f, _ in batch)
+        to_date = max(t for _, _, t in batch)
+        chunks = [
+            metering_points[i:i + self._max_size]
+            for i in range(0, len(metering_points), self._max_size)
+        ]
+        _LOGGER.debug(
+            "Samlet GetTimeSeries (%s) for %s målepunkter i %s kald: %s - %s",
+            aggregation, len(metering_points), len(chunks), from_date, to_date,
+        )
+        responses = await asyncio.gather(*[
+            self._client.async_get_time_series_points(chunk, from_date, to_date, aggregation)
+            for chunk in chunks
+        ])
+        split = {}
+        for response in responses:
+            split.update(response)
+        return split
+
+    async def async_get_history(self, metering_point, from_date, to_date):
+        """
+        Timeværdier for ét målepunkt uden om samlingen.
+
+        Historik hentes i lange intervaller, som ellers ville udvide de andre
+        målepunkters kald i samme vindue.
+        """
+        points = await self._client.async_get_time_series_points([metering_point], from_date, to_date, "Hour")
+        return points.get(metering_point, [])
+
+    async def _async_collect(self, batch, aggregation):
+        """Vent vinduet ud og hent for alle kald i batchen."""
+        try:
+            await asyncio.sleep(self._window)
+        finally:
+            if self._pending.get(aggregation, (None,))[0] is batch:
+                del self._pending[aggregation]
+        return await self._async_fetch(batch, aggregation)
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled():
+            task.exception()  # hentet, også hvis alle kaldere er afbrudt
+
+    def close(self):
+        """Afbryd igangværende samlede hentninger (sidste entry er fjernet)."""
+        for task in list(self._tasks):
+            task.cancel()
+        self._pending.clear()
+
+    async def async_get_time_series_points(self, metering_points, from_date, to_date, aggregation="Hour"):
+        if self.users <= 1:
+            return await self._client.async_get_time_series_points(metering_points, from_date, to_date, aggregation)
+        pending = self._pending.get(aggregation)
+        if pending is None:
+            # Første kald i vinduet starter den fælles hentning
+            batch = []
+            task = asyncio.get_running_loop().create_task(self._async_collect(batch, aggregation))
+            self._tasks.add(task)
+            task.add_done_callback(self._task_done)
+            pending = self._pending[aggregation] = (batch, task)
+        batch, task = pending
+        batch.append((metering_points, from_date, to_date))
+        split = await asyncio.shield(task)
+        return {mp: split[mp] for mp in metering_points if mp in split}
+
+    async def async_get_per_month(self, metering_point, year=None):
+        return await async_get_per_month(self, metering_point, year)
+
+    async def async_get_charges(self, metering_point, validators=None):
+        return await self._client.async_get_charges(metering_point, validators)
+
+
+def get_batching_client(hass: HomeAssistant, refresh_token: str, kind: str):
+    """
+    Den fælles BatchingClient for et refresh token og en klienttype.
+
+    Hvert kald tæller en entry mere; kald release_batching_client() ved unload.
+    """
+    batchers = hass.data.setdefault(DATA_BATCHERS, {})
+    key = (refresh_token, kind)
+    if key not in batchers:
+        batchers[key] = BatchingClient(create_client(hass, refresh_token, kind))
+    batcher = batchers[key]
+    batcher.users += 1
+    return batcher
+
+
+@callback
+def release_batching_client(hass: HomeAssistant, refresh_token: str, kind: str):
+    """Tæl en entry ned; den sidste fjerner og lukker klienten."""
+    batchers = hass.data.get(DATA_BATCHERS, {})
+    batcher = batchers.get((refresh_token, kind))
+    if batcher is None:
+        return
+    batcher.users -= 1
+    if batcher.users <= 0:
+        del batchers[(refresh_token, kind)]
+        batcher.close()
@@ -0,0 +1,83 @@
+"""Simple Elforbrug vedvarende cache af timeværdier, månedstotaler, tariffer og historik."""
+import logging
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import CACHE_SAVE_DELAY, DOMAIN, STORAGE_VERSION
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class EnergyCache:
+    """
+    Gemmer et målepunkts timelager og månedstotaler på disk.
+
+    Timerne gemmes som én pakket float64-kolonne (se HourlyStore.dump), så
+    filen forbliver lille selv med mange dages historik.
+    """
+
+    def __init__(self, hass: HomeAssistant, metering_point: str, key=None):
+        self._hass = hass
+        self._store = Store(hass, STORAGE_VERSION, key or f"{DOMAIN}.{metering_point}")
+        self._instance = None
+
+    async def async_load(self, instance) -> bool:
+        """Indlæs cachen i en instans med restore/snapshot. Returnerer True ved data."""
+        self._instance = instance
+        data = await self._store.async_load()
+        if not data:
+            return False
+        try:
+            instance.restore(data)
+        except Exception as e:
+            _LOGGER.warning("Kunne ikke indlæse cache %s: %s", self._store.key, e)
+            return False
+        return True
+
+    @callback
+    def schedule_save(self):
+        """Planlæg en forsinket gemning."""
+        if self._instance is None:
+            return
+        self._store.async_delay_save(self._instance.snapshot, CACHE_SAVE_DELAY)
+
+    async def async_remove(self):
+        await self._store.async_remove()
+
+
+class ArchiveCache(EnergyCache):
+    """
+    Gemmer et målepunkts ældre timer (før HourArchive.end) for sig.
+
+    De ændres kun når historik hentes, når grænsen flytter en måned, og når
+    den ældste dag beskæres, så den store fil skrives sjældent, mens
+    EnergyCache med de seneste uger gemmes ved hver ændring.
+    """
+
+    def __init__(self, hass: HomeAssistant, metering_point: str):
+        super().__init__(hass, metering_point, f"{DOMAIN}.{metering_point}.archive")
+
+
+class TariffCache(EnergyCache):
+    """
+    Gemmer et målepunkts seneste getcharges-svar med hvornår det blev hentet.
+
+    Så kendes tarifferne og deres gyldighedsperioder straks efter en genstart,
+    uden et nyt kald til Eloverblik.
+    """
+
+    def __init__(self, hass: HomeAssistant, metering_point: str):
+        super().__init__(hass, metering_point, f"{DOMAIN}.{metering_point}.tariffs")
+
+
+class HistoryCache(EnergyCache):
+    """
+    Gemmer hvor langt HistoryBackfill er nået bagud.
+
+    Selve timerne ligger i målepunktets EnergyCache; her gemmes kun
+    checkpointet, så en genstart fortsætter hvor hentningen slap.
+    """
+
+    def __init__(self, hass: HomeAssistant, metering_point: str):
+        super().__init__(hass, metering_point, f"{DOMAIN}.{metering_point}.history")
@@ -12,18 +12,75 @@ _LOGGER = logging.getLogger(__name__)
 
 DEFAULT_NAME = "Simple Elforrug"
 DOMAIN = "simple_elforbrug"
+DATA_TOKENS = f"{DOMAIN}_tokens"  # hass.data: refresh token -> TokenManager
+DATA_BATCHERS = f"{DOMAIN}_batchers"  # hass.data: (refresh token, klienttype) -> BatchingClient
+DATA_HISTORY_LOCKS = f"{DOMAIN}_history_locks"  # hass.data: refresh token -> asyncio.Lock
 PLATFORMS = ["sensor"]
-MIN_TIME_BETWEEN_UPDATES = timedelta(minutes=60)
+MIN_TIME_BETWEEN_UPDATES = timedelta(minutes=60)  # basisinterval (og interval før ankomsttider er lært)
+SCHEDULE_PEAK_INTERVAL = timedelta(minutes=15)     # interval når nye data ventes
+SCHEDULE_MAX_INTERVAL = timedelta(hours=6)         # loft for backoff
+SCHEDULE_THROTTLE_INTERVAL = timedelta(minutes=15) # første backoff efter 429/503
+SCHEDULE_JITTER = 0.1  # +/- andel tilfældig spredning af intervallet
+ARRIVAL_DECAY = 0.8    # henfald af gamle ankomster for hver ny dag
+ARRIVAL_SHARE = 0.5    # timer med mindst denne andel af topvægten hører til ankomstvinduet
+TARIFF_REFRESH_INTERVAL = timedelta(days=1)  # tariffer hentes højst så ofte (ud over periodeskift)
+LOOKBACK_DAYS = 8   # dage med timedata der holdes lokalt
+BACKFILL_DAYS = 2   # seneste dage hentes altid igen (Eloverblik efterudfylder)
+HISTORY_DAYS = 5 * 366       # dage med timehistorik der hentes bagud og beholdes
+HISTORY_CHUNK_DAYS = 90      # dage pr. historik-kald (Eloverblik tillader højst 730)
+HISTORY_EMPTY_CHUNKS = 2     # tomme historik-kald i træk før ældre data anses for ikke at findes
+HISTORY_START_DELAY = 300    # sekunder efter opstart før historikken hentes
+HISTORY_PAUSE = 30           # sekunder mellem historik-kald
+HISTORY_RETRY = 900          # sekunder før et fejlet historik-kald prøves igen
+IMPORT_CHUNK_HOURS = 31 * 24  # timer pr. statistik-import og detektor-indlæsning (historik tages i bidder)
+ANOMALY_ALPHA = 0.1          # vægt af ny uge i gennemsnit/varians pr. time på ugen
+ANOMALY_MIN_SAMPLES = 4      # uger pr. time på ugen før der gives en score
+ANOMALY_MIN_STD = 0.05       # kWh; nedre grænse for standardafvigelsen i scoren
+ANOMALY_THRESHOLD = 3.0      # |score| der udløser en afvigelse (standardafvigelser)
+ANOMALY_EVENT_HOURS = 48     # kun timer så tæt på seneste time giver events
+BASELOAD_HOURS = 7 * 24      # timer grundlasten (mindste timeforbrug) findes over
+STORAGE_VERSION = 1
+API_BASE_URL = "https://api.eloverblik.dk/CustomerApi/"
+API_TIMEOUT = 30  # sekunder
+STREAM_CHUNK_SIZE = 64 * 1024  # bytes pr. bid når time-series streames
+STREAM_MIN_SIZE = 1024 * 1024  # mindre time-series-svar decodes med json.loads i stedet
+RETRY_ATTEMPTS = 3       # forsøg pr. kald ved netværksfejl og 5xx
+RETRY_BACKOFF = 1        # sekunder før andet forsøg (fordobles)
+RETRY_MAX_BACKOFF = 10   # loft for ventetid mellem forsøg
+BREAKER_THRESHOLD = 3    # mislykkede kald i træk før et endpoint pauses
+BREAKER_RESET = 300      # sekunder et endpoint pauses første gang
+BREAKER_MAX_RESET = 3600 # loft for pausen (fordobles for hvert mislykket prøvekald)
+BATCH_WINDOW = 2  # sekunder der ventes på andre målepunkter før et samlet kald
+BATCH_MAX_METERING_POINTS = 10  # målepunkter pr. GetTimeSeries-kald
+CONF_CLIENT = "client"
+CLIENT_AIOHTTP = "aiohttp"            # asynkron klient (standard)
+CLIENT_PYELOVERBLIK = "pyeloverblik"  # blokerende klient i executoren
+CACHE_SAVE_DELAY = 30  # sekunder
+EVENT_ANOMALY = f"{DOMAIN}_anomaly"
+SERVICE_UPDATE_ENERGY = "update_energy"
+SERVICE_SET_UNIT = "set_unit"
+SERVICE_GET_CONSUMPTION = "get_consumption"
+ATTR_METERING_POINT = "metering_point"
+ATTR_ENTRY_ID = "entry_id"
+ATTR_MAX_PARALLEL = "max_parallel"
+ATTR_UNIT = "unit"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_RESOLUTION = "resolution"
+DEFAULT_MAX_PARALLEL = 4  # målepunkter der opdateres samtidigt fra update_energy
+RESOLUTIONS = ("hour", "day", "month")
+QUERY_MAX_HOURS = 93 * 24  # højst så mange timer i ét get_consumption-svar med resolution hour
 CONFIG_SCHEMA = vol.Schema({DOMAIN: vol.Schema({})}, extra=vol.ALLOW_EXTRA)
 DATA_SCHEMA = vol.Schema({
     vol.Required("refresh_token", description="Token"): str,
     vol.Required("metering_point", description="Metering Point"): str,
-    vol.Required("unit_of_measurement", description="Unit of Measurement"): vol.In(["kWh", "MWh"])
+    vol.Required("unit_of_measurement", description="Unit of Measurement"): vol.In(["kWh", "MWh"]),
+    vol.Optional(CONF_CLIENT, default=CLIENT_AIOHTTP, description="Client"): vol.In([CLIENT_AIOHTTP, CLIENT_PYELOVERBLIK]),
 })
 
 ###############################################################################
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SensorType:
     key: str
     name: str
@@ -56,4 +113,6 @@ SENSOR_DATA_SCHEMA = (
         native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
         icon="mdi:chart-bar",
     )
-)
\ No newline at end of file
+)
+SENSOR_TYPES = {sensor.key: sensor for sensor in SENSOR_DATA_SCHEMA}  # key -> SensorType
+WEEK_KEYS = tuple(f"{i} days ago" for i in range(1, 8))  # attributnavne for ugens dagssummer
\ No newline at end of file
@@ -1,32 +1,135 @@
 """Simple Elforbrug coordinator."""
-from datetime import datetime
 import logging
-from .const import SENSOR_DATA_SCHEMA
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.util import dt as dt_util
+
+from .api import EloverblikThrottleError
+from .const import (
+    ANOMALY_THRESHOLD,
+    BASELOAD_HOURS,
+    DOMAIN,
+    EVENT_ANOMALY,
+    IMPORT_CHUNK_HOURS,
+    MIN_TIME_BETWEEN_UPDATES,
+    SENSOR_TYPES,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
 
 def get_sensor_by_type(sensor_type):
     """Return the sensor object from SENSOR_DATA_SCHEMA based on the key."""
-    return next((sensor for sensor in SENSOR_DATA_SCHEMA if sensor.key == sensor_type), None)
+    return SENSOR_TYPES.get(sensor_type)
+
+
+class ElforbrugDataUpdateCoordinator(DataUpdateCoordinator):
+    """
+    Én fælles opdatering pr. config entry.
+
+    Henter energi og tariffer én gang pr. cyklus og giver resultatet
+    videre til alle entiteter via listener-callbacks. Intervallet til næste
+    cyklus vælges af målepunktets RefreshScheduler.
+
+    Data fingeraftrykkes efter hver cyklus; `updates_applied` og
+    `updates_skipped` tæller cyklusser med og uden nye data. Tiden for hvert
+    trin registreres i målepunktets Metrics.
+    """
+
+    def __init__(self, hass: HomeAssistant, energy, tariff, statistics=None):
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"{DOMAIN} {energy.get_metering_point()}",
+            update_interval=MIN_TIME_BETWEEN_UPDATES,
+        )
+        self.energy = energy
+        self.tariff = tariff
+        self.statistics = statistics
+        self.history = None  # HistoryBackfill, sættes i async_setup_entry
+        self.updates_applied = 0
+        self.updates_skipped = 0
+        self._fingerprint = None
+
+    async def _async_update_data(self):
+        with self.energy.metrics.timer("update"):
+            return await self._async_update()
+
+    @callback
+    def async_update_listeners(self):
+        with self.energy.metrics.timer("entities"):
+            super().async_update_listeners()
+
+    async def _async_update(self):
+        scheduler = self.energy.scheduler
+        try:
+            changed = await self.energy.async_update_energy()
+        except EloverblikThrottleError as err:
+            scheduler.record_throttled(err.retry_after)
+            self.update_interval = scheduler.next_interval()
+            _LOGGER.warning(
+                "Eloverblik begrænser kald (%s); prøver igen om %s", err.status, self.update_interval
+            )
+            return self.energy
+        scheduler.record(changed, self.energy.store.last_day())
+        self.update_interval = scheduler.next_interval()
+        _LOGGER.debug("Næste opdatering af %s om %s", self.energy.get_metering_point(), self.update_interval)
+
+        with self.energy.metrics.timer("analytics"):
+            self._async_analyse()
+        self.energy.save_cache()  # scheduler og detektor er opdateret
+        with self.energy.metrics.timer("update_tariff"):
+            await self.tariff.async_update_tariff()
+        if self.statistics is not None:
+            try:
+                with self.energy.metrics.timer("statistics"):
+                    await self.statistics.async_import(self.energy.store)
+            except Exception as e:
+                _LOGGER.exception("Kunne ikke importere statistik: %s", e)
+
+        fingerprint = (self.energy.fingerprint(), self.tariff.fingerprint())
+        if fingerprint == self._fingerprint:
+            self.updates_skipped += 1
+        else:
+            self.updates_applied += 1
+            self._fingerprint = fingerprint
+        return self.energy
+
+    @callback
+    def _async_analyse(self):
+        """Læg nye timer ind i afvigelsesdetektoren og fyr et event pr. afvigelse."""
+        metering_point = self.energy.get_metering_point()
+        for anomaly in self.energy.detector.ingest(self.energy.store, IMPORT_CHUNK_HOURS):
+            _LOGGER.info(
+                "Usædvanligt forbrug på %s kl. %s: %.3f kWh (forventet %.3f, score %.1f)",
+                metering_point, anomaly["start"], anomaly["value"], anomaly["expected"], anomaly["score"],
+            )
+            self.hass.bus.async_fire(EVENT_ANOMALY, {"metering_point": metering_point, **anomaly})
 
 
 class SensorCoordinator:
     """Coordinator class to handle sensor logic."""
 
+    __slots__ = (
+        "_sensor_type", "_description", "_data", "_state", "_extra_state_attributes",
+        "_data_date", "_unique_id", "_key",
+    )
+
     def __init__(self, sensor_type, client):
         """Initialize the coordinator with sensor type and data client."""
         self._sensor_type = sensor_type
+        self._description = get_sensor_by_type(sensor_type)  # SensorType, slås op én gang
         self._data = client
         self._state = 0.000
         self._extra_state_attributes = {}
         self._data_date = None
         self._unique_id = f"{self._data.get_metering_point()}-{sensor_type}"
+        self._key = None  # input til seneste beregning, se _inputs()
 
     @property
     def name(self):
-        sensor = get_sensor_by_type(self._sensor_type)
-        return sensor.name if sensor else None
+        return self._description.name if self._description else None
 
     @property
     def unique_id(self):
@@ -42,16 +145,17 @@ class SensorCoordinator:
 
     @property
     def unit_of_measurement(self):
-        sensor = get_sensor_by_type(self._sensor_type)
-        if not sensor:
+        if not self._description:
             return None
         # Brug den enhed, som er valgt i config-flow
-        return getattr(self._data, "unit_of_measurement", sensor.native_unit_of_measurement)
+        return getattr(self._data, "unit_of_measurement", self._description.native_unit_of_measurement)
 
     @property
     def icon(self):
-        sensor = get_sensor_by_type(self._sensor_type)
-        return sensor.icon if sensor else None
+        return self._description.icon if self._description else None
+
+    def has_data(self) -> bool:
+        return self._data.has_data()
 
     # --- Hjælpere ---
 
@@ -68,7 +172,7 @@ class SensorCoordinator:
         """Rund alle numeriske værdier i attributes til 3 decimaler."""
         rounded = {}
         for k, v in attrs.items():
-            if isinstance(v, (int, float)):
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
                 rounded[k] = round(v, 3)
             else:
                 rounded[k] = v
@@ -76,20 +180,46 @@ class SensorCoordinator:
 
     # --- Opdatering ---
 
-    def update(self):
-        """Update the sensor's state and attributes."""
-        self._data.update_energy()
+    def _inputs(self):
+        """Alt hvad state og attributes afhænger af: data, enhed og evt. tid."""
+        if self._sensor_type == "daily":
+            clock = dt_util.now().hour
+        elif self._sensor_type == "monthly":
+            clock = dt_util.now().strftime("%Y-%m")
+        else:
+            clock = None
+        return self._data.fingerprint(), str(self.unit_of_measurement), clock, self._data.is_stale()
+
+    def _staleness(self):
+        """Attributter der viser om data er forældede (seneste hentning fejlede)."""
+        if not self._data.is_stale():
+            return {"Stale": False}
+        last_success = self._data.metrics.last_success
+        return {
+            "Stale": True,
+            "Last Success": last_success.isoformat() if last_success else None,
+        }
+
+    def refresh(self):
+        """
+        Beregn state og attributes ud fra klientens data uden netværkskald.
+
+        Returnerer False (og beregner intet) hvis input er uændret siden sidst.
+        """
+        key = self._inputs()
+        if key == self._key:
+            return False
+        self._key = key
         self._data_date = self._data.get_data_date()
 
         # DAILY SENSOR
         if self._sensor_type == "daily":
-            current_hour = datetime.now().hour
-            hourly_data = [self._data.get_usage_hour(h) for h in range(24)]  # rå kWh
-            valid = [d for d in hourly_data if d is not None]
-            day_sum_kwh = sum(valid[: current_hour + 1]) if valid else 0.0
+            current_hour = dt_util.now().hour
+            day_sum_kwh = self._data.get_usage_day(current_hour + 1)  # rå kWh
 
-            # Konverter sum til valgt enhed og rund til 3 dec.
-            self._state = self._convert(day_sum_kwh)
+            # Konverter sum til valgt enhed og rund til 3 dec. (uden data: behold sidste værdi)
+            if day_sum_kwh is not None:
+                self._state = self._convert(day_sum_kwh)
 
             attrs = {
                 "Daily Usage": self._state,  # allerede konverteret
@@ -99,57 +229,56 @@ class SensorCoordinator:
 
             # Tilføj uge-historik (allerede konverteret i get_week_data)
             attrs.update(self._data.get_week_data())
+            attrs.update(self._staleness())
 
             self._extra_state_attributes = self._round_attributes(attrs)
             _LOGGER.debug("Updated daily state: %.3f, attributes: %s", self._state, self._extra_state_attributes)
 
         # MONTHLY SENSOR
         elif self._sensor_type == "monthly":
-            current_day = datetime.now().day
-            total_kwh = 0.0
-            for day in range(1, current_day + 1):
-                daily_sum_kwh = 0.0
-                for h in range(24):
-                    val = self._data.get_usage_day(day, h)  # rå kWh
-                    if val is not None:
-                        daily_sum_kwh += val
-                total_kwh += daily_sum_kwh
-
+            total_kwh = self._data.get_month_to_date()  # rå kWh
             self._state = self._convert(total_kwh)
 
             attrs = {
                 "Monthly Usage": self._state,
                 "Metering Point": self._data.get_metering_point(),
-                "Metering Month": datetime.now().strftime("%B %Y"),
+                "Metering Month": dt_util.now().strftime("%B %Y"),
+                **self._staleness(),
             }
             self._extra_state_attributes = self._round_attributes(attrs)
             _LOGGER.debug("Updated monthly total state: %.3f, attributes: %s", self._state, self._extra_state_attributes)
 
         # YEAR/TOTAL SENSOR
         elif self._sensor_type == "total":
-            total_year_kwh = self._data.get_total_year() or 0.0  # rå kWh
-            self._state = self._convert(total_year_kwh)
+            total_year_kwh = self._data.get_total_year()  # rå kWh
+            if total_year_kwh is not None:
+                self._state = self._convert(total_year_kwh)
 
             attrs = {
                 "Yearly Consumption": self._state,
                 "Metering Point": self._data.get_metering_point(),
                 "Metering date": self._data_date,
+                **self._staleness(),
             }
             self._extra_state_attributes = self._round_attributes(attrs)
             _LOGGER.debug("Updated total state: %.3f, attributes: %s", self._state, self._extra_state_attributes)
 
         else:
             raise ValueError(f"Unexpected sensor_type: {self._sensor_type}.")
+        return True
         
         
         
 class TariffCoordinator:
     """Coordinator for tariff-sensoren."""
 
+    __slots__ = ("_client", "_state", "_attributes", "_key")
+
     def __init__(self, tariff_client):
         self._client = tariff_client
         self._state = None
         self._attributes = {}
+        self._key = None
 
     @property
     def name(self):
@@ -175,7 +304,236 @@ class TariffCoordinator:
     def icon(self):
         return "mdi:cash"
 
-    def update(self):
-        self._client.update_tariff()
+    def refresh(self):
+        """Beregn state og attributes ud fra de hentede tariffer (False hvis uændret)."""
+        key = (self._client.fingerprint(), dt_util.now().date())
+        if key == self._key:
+            return False
+        self._key = key
         self._state = self._client.get_today_tariff()
-        self._attributes = self._client.get_all_tariffs()
\ No newline at end of file
+        self._attributes = self._client.get_all_tariffs()
+        prices = self._client.get_today_prices()
+        if prices is not None:
+            self._attributes["Pris pr. time i dag"] = prices
+        return True
+
+
+class CostCoordinator:
+    """Coordinator for pris-sensoren: forbrug gange tariffer."""
+
+    __slots__ = ("_energy", "_tariff", "_state", "_attributes", "_key")
+
+    def __init__(self, energy_client, tariff_client):
+        self._energy = energy_client
+        self._tariff = tariff_client
+        self._state = None
+        self._attributes = {}
+        self._key = None
+
+    @property
+    def name(self):
+        return "Simple Elforbrug Cost"
+
+    @property
+    def unique_id(self):
+        return f"cost-{self._energy.get_metering_point()}"
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def extra_state_attributes(self):
+        return self._attributes
+
+    @property
+    def unit_of_measurement(self):
+        return "kr"
+
+    @property
+    def icon(self):
+        return "mdi:cash-multiple"
+
+    def refresh(self):
+        """Beregn tarifomkostning for måneden og seneste dag fra de cachede data (False hvis uændret)."""
+        key = (self._energy.fingerprint(), self._tariff.fingerprint())
+        if key == self._key:
+            return False
+        costs = self._tariff.get_costs(self._energy.store, self._energy.store.last_day())
+        if costs is None:
+            return False
+        self._key = key
+        self._state = costs["month"]
+        self._attributes = {
+            "Cost Last Day": costs["day"],
+            "Hourly Cost": costs["hourly"],
+            "Metering Point": self._energy.get_metering_point(),
+            "Metering date": self._energy.get_data_date(),
+        }
+        return True
+
+DIAGNOSTIC_SENSORS = {
+    "last_success": ("Simple Elforbrug Last Success", None, "mdi:clock-check-outline"),
+    "update_duration": ("Simple Elforbrug Update Duration", "ms", "mdi:timer-outline"),
+    "api_requests": ("Simple Elforbrug API Requests", "requests", "mdi:api"),
+}
+
+
+class DiagnosticCoordinator:
+    """Coordinator for diagnostiske sensorer ud fra koordinatorens målinger."""
+
+    __slots__ = ("_kind", "_coordinator", "_state", "_attributes")
+
+    def __init__(self, kind, coordinator):
+        self._kind = kind
+        self._coordinator = coordinator
+        self._state = None
+        self._attributes = {}
+
+    @property
+    def name(self):
+        return DIAGNOSTIC_SENSORS[self._kind][0]
+
+    @property
+    def unique_id(self):
+        return f"{self._kind}-{self._coordinator.energy.get_metering_point()}"
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def extra_state_attributes(self):
+        return self._attributes
+
+    @property
+    def unit_of_measurement(self):
+        return DIAGNOSTIC_SENSORS[self._kind][1]
+
+    @property
+    def icon(self):
+        return DIAGNOSTIC_SENSORS[self._kind][2]
+
+    @property
+    def device_class(self):
+        return "timestamp" if self._kind == "last_success" else None
+
+    def refresh(self):
+        """Læs de seneste målinger (ændres ved hver cyklus)."""
+        coordinator = self._coordinator
+        metrics = coordinator.energy.metrics
+        if self._kind == "last_success":
+            self._state = metrics.last_success
+            self._attributes = {
+                "Last Error": metrics.last_error,
+                "Next Update In": str(coordinator.update_interval),
+                "Updates Applied": coordinator.updates_applied,
+                "Updates Skipped": coordinator.updates_skipped,
+                "Throttled": metrics.throttled,
+            }
+        elif self._kind == "update_duration":
+            update = metrics.latency.get("update")
+            self._state = round(update.last, 1) if update and update.last is not None else None
+            self._attributes = {
+                name: {k: v for k, v in h.as_dict().items() if k != "buckets"}
+                for name, h in sorted(metrics.latency.items())
+            }
+        else:
+            client = getattr(coordinator.energy.client, "metrics", None)
+            if client is None:
+                return False
+            self._state = client.requests()
+            self._attributes = {
+                "Status": {endpoint: dict(c) for endpoint, c in client.status.items()},
+                "Response Bytes": dict(client.response_bytes),
+                "Throttled": client.throttled,
+                "Circuit Breakers": {
+                    name: breaker.state for name, breaker in getattr(coordinator.energy.client, "breakers", {}).items()
+                },
+                "Latency": {
+                    name: {k: v for k, v in h.as_dict().items() if k != "buckets"}
+                    for name, h in sorted(client.latency.items())
+                },
+            }
+        return True
+
+
+ANALYTICS_SENSORS = {
+    "baseload": ("Simple Elforbrug Baseload", "W", "mdi:power-sleep"),
+    "anomaly_score": ("Simple Elforbrug Anomaly Score", None, "mdi:chart-bell-curve"),
+}
+
+
+class AnalyticsCoordinator:
+    """Coordinator for grundlast- og afvigelsessensorerne ud fra målepunktets ConsumptionDetector."""
+
+    __slots__ = ("_kind", "_energy", "_state", "_attributes", "_key")
+
+    def __init__(self, kind, energy_client):
+        self._kind = kind
+        self._energy = energy_client
+        self._state = None
+        self._attributes = {}
+        self._key = None
+
+    @property
+    def name(self):
+        return ANALYTICS_SENSORS[self._kind][0]
+
+    @property
+    def unique_id(self):
+        return f"{self._kind}-{self._energy.get_metering_point()}"
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def extra_state_attributes(self):
+        return self._attributes
+
+    @property
+    def unit_of_measurement(self):
+        return ANALYTICS_SENSORS[self._kind][1]
+
+    @property
+    def icon(self):
+        return ANALYTICS_SENSORS[self._kind][2]
+
+    @staticmethod
+    def _local(ts):
+        return dt_util.as_local(dt_util.utc_from_timestamp(ts)).isoformat() if ts is not None else None
+
+    def refresh(self):
+        """Læs detektorens seneste tal (False hvis intet nyt er indlæst)."""
+        detector = self._energy.detector
+        if detector.revision == self._key:
+            return False
+        self._key = detector.revision
+        if self._kind == "baseload":
+            baseload = detector.baseload
+            self._state = round(baseload * 1000) if baseload is not None else None
+            self._attributes = {
+                "Measured Hour": self._local(detector.baseload_since),
+                "Window Hours": BASELOAD_HOURS,
+                "Metering Point": self._energy.get_metering_point(),
+            }
+            return True
+
+        latest = detector.latest or {}
+        score = latest.get("score")
+        self._state = round(score, 2) if score is not None else None
+        self._attributes = {
+            "Hour": self._local(latest.get("start")),
+            "Consumption": latest.get("value"),
+            "Expected": latest.get("expected") if score is not None else None,
+            "Std": latest.get("std") if score is not None else None,
+            "Anomaly": detector.alerting,
+            "Last Anomaly": (detector.last_anomaly or {}).get("start"),
+            "Threshold": ANOMALY_THRESHOLD,
+            "Metering Point": self._energy.get_metering_point(),
+        }
+        self._attributes = {
+            k: round(v, 3) if isinstance(v, float) else v for k, v in self._attributes.items()
+        }
+        return True
@@ -0,0 +1,46 @@
+"""Simple Elforbrug diagnostik til download fra Home Assistant."""
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+TO_REDACT = {"refresh_token", "token", "access_token", "Authorization"}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry):
+    """Målinger, planlægning og lagerstatus for en config entry (uden tokens)."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    energy = coordinator.energy
+    client = getattr(energy.client, "metrics", None)
+    next_tariffs = coordinator.tariff.next_refresh()
+    first_day = energy.store.first_day()
+    last_day = energy.store.last_day()
+
+    return async_redact_data({
+        "entry": entry.as_dict(),
+        "coordinator": {
+            "last_update_success": coordinator.last_update_success,
+            "update_interval": str(coordinator.update_interval),
+            "updates_applied": coordinator.updates_applied,
+            "updates_skipped": coordinator.updates_skipped,
+        },
+        "metering_point": energy.metrics.as_dict(),
+        "client": client.as_dict() if client is not None else None,
+        "circuit_breakers": {
+            name: breaker.as_dict() for name, breaker in getattr(energy.client, "breakers", {}).items()
+        },
+        "stale": energy.is_stale(),
+        "scheduler": energy.scheduler.dump(),
+        "store": {
+            "hours": len(energy.store),
+            "days": len(energy.store.rollup),
+            "high_water": energy.store.high_water,
+            "first_day": first_day.isoformat() if first_day else None,
+            "last_day": last_day.isoformat() if last_day else None,
+        },
+        "history": coordinator.history.as_dict() if coordinator.history else None,
+        "tariffs": {
+            "next_refresh": next_tariffs.isoformat() if next_tariffs else None,
+        },
+    }, TO_REDACT)
@@ -0,0 +1,141 @@
+"""Simple Elforbrug import af timeforbrug som langtidsstatistik."""
+import asyncio
+from datetime import timedelta
+import logging
+
+import numpy as np
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    get_last_statistics,
+    statistics_during_period,
+)
+from homeassistant.const import UnitOfEnergy
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN, IMPORT_CHUNK_HOURS
+
+_LOGGER = logging.getLogger(__name__)
+
+HOUR = 3600
+
+
+def statistic_id(metering_point):
+    return f"{DOMAIN}:consumption_{metering_point}"
+
+
+class StatisticsImporter:
+    """
+    Skriver timeværdier fra timelageret som eksterne statistikker.
+
+    Hver time får sin rigtige (historiske) start, så data der kommer sent
+    fra Eloverblik havner på den korrekte time. Importen fortsætter fra sidst
+    importerede time, og timer Eloverblik har rettet bagud importeres igen
+    med en korrekt løbende sum. Der sendes højst IMPORT_CHUNK_HOURS timer pr.
+    kald; resten markeres som ændrede og tages ved næste import, så den
+    hentede historik ikke importeres i ét stort kald.
+    """
+
+    def __init__(self, hass: HomeAssistant, metering_point: str):
+        self._hass = hass
+        self._metering_point = metering_point
+        self._statistic_id = statistic_id(metering_point)
+        self._last = None  # (epoch-sekund for sidst importerede time, sum)
+        self._lock = asyncio.Lock()  # koordinatoren og HistoryBackfill importerer begge
+
+    @property
+    def metadata(self) -> StatisticMetaData:
+        return StatisticMetaData(
+            has_mean=False,
+            has_sum=True,
+            name=f"Simple Elforbrug {self._metering_point}",
+            source=DOMAIN,
+            statistic_id=self._statistic_id,
+            unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        )
+
+    async def _async_sum_before(self, start_ts):
+        """(epoch-sekund, sum) for seneste importerede time før start_ts."""
+        recorder = get_instance(self._hass)
+        if start_ts is None:
+            rows = await recorder.async_add_executor_job(
+                get_last_statistics, self._hass, 1, self._statistic_id, True, {"sum"}
+            )
+        else:
+            start = dt_util.utc_from_timestamp(start_ts)
+            rows = await recorder.async_add_executor_job(
+                statistics_during_period,
+                self._hass,
+                start - timedelta(days=1),
+                start,
+                {self._statistic_id},
+                "hour",
+                None,
+                {"sum"},
+            )
+        rows = rows.get(self._statistic_id) or []
+        if not rows:
+            return None
+        row = rows[-1]
+        return int(row["start"]), row.get("sum") or 0.0
+
+    async def async_import(self, store):
+        """
+        Importér nye og rettede timer fra HourlyStore.
+
+        Fejler importen, markeres timerne som ændrede igen, så næste
+        opdatering prøver dem igen.
+        """
+        async with self._lock:
+            dirty = store.take_dirty()
+            try:
+                return await self._async_import(store, dirty)
+            except BaseException:
+                if dirty is not None:
+                    store.mark_dirty(dirty)
+                raise
+
+    async def _async_import(self, store, dirty):
+        if self._last is None:
+            self._last = await self._async_sum_before(None)
+
+        if self._last is None:
+            # Første import: start fra lagerets ældste time
+            start_ts, base = store.first_hour(), 0.0
+        elif dirty is not None and dirty <= self._last[0]:
+            # Eloverblik har rettet timer vi allerede har importeret
+            before = await self._async_sum_before(dirty)
+            start_ts, base = dirty, before[1] if before else 0.0
+        else:
+            start_ts, base = self._last[0] + HOUR, self._last[1]
+
+        if start_ts is None:
+            return 0
+        values = store.hours_from(start_ts)
+        rest = start_ts + IMPORT_CHUNK_HOURS * HOUR if len(values) > IMPORT_CHUNK_HOURS else None
+        values = values[:IMPORT_CHUNK_HOURS]
+        present = np.flatnonzero(~np.isnan(values))
+        if not len(present):
+            if rest is not None:
+                # Et hul i historikken: fortsæt efter det med samme sum
+                self._last = (rest - HOUR, base)
+                store.mark_dirty(rest)
+            return 0
+
+        sums = base + np.cumsum(values[present])
+        starts = start_ts + present * HOUR
+        statistics = [
+            StatisticData(start=dt_util.utc_from_timestamp(int(ts)), state=float(v), sum=float(total))
+            for ts, v, total in zip(starts, values[present], sums)
+        ]
+        async_add_external_statistics(self._hass, self.metadata, statistics)
+        self._last = (int(starts[-1]), float(sums[-1]))
+        if rest is not None:
+            store.mark_dirty(rest)
+        _LOGGER.debug(
+            "Importerede %s timer til %s fra %s", len(statistics), self._statistic_id, statistics[0]["start"]
+        )
+        return len(statistics)
@@ -0,0 +1,187 @@
+"""Simple Elforbrug hentning af timehistorik bagud i tid."""
+import asyncio
+from datetime import date, timedelta
+import logging
+
+from homeassistant.util import dt as dt_util
+
+from .api import API_ERRORS, EloverblikAuthError
+from .const import (
+    HISTORY_CHUNK_DAYS,
+    HISTORY_EMPTY_CHUNKS,
+    HISTORY_PAUSE,
+    HISTORY_RETRY,
+    HISTORY_START_DELAY,
+    IMPORT_CHUNK_HOURS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class HistoryBackfill:
+    """
+    Henter et målepunkts timehistorik bagud i bidder af HISTORY_CHUNK_DAYS.
+
+    Starter ved lagerets ældste dag og går tilbage til HourlyStore.retain_from
+    (eller til Eloverblik ikke har ældre data). Hver bid flettes direkte ind
+    i timelageret, og checkpointet gemmes i en HistoryCache, så en genstart
+    eller fejl fortsætter hvor hentningen slap.
+
+    Når historikken er hentet, importeres den i langtidsstatistikken og
+    læres af afvigelsesdetektoren forfra, IMPORT_CHUNK_HOURS timer pr. bid.
+    Hvor importen er nået (første time der mangler) gemmes også i
+    checkpointet; detektoren gemmer sin egen tilstand i EnergyCache.
+
+    Kører med lav prioritet: venter på målepunktets igangværende opdatering,
+    holder en lås der deles af målepunkter på samme refresh token (én
+    historik-hentning ad gangen), og holder pause mellem bidderne. Fejl giver
+    en længere pause og et nyt forsøg fra checkpointet.
+    """
+
+    def __init__(self, energy, lock=None):
+        self._energy = energy
+        self._lock = lock or asyncio.Lock()
+        self.cache = None       # HistoryCache, sættes i async_setup_entry
+        self.statistics = None  # StatisticsImporter, sættes i async_setup_entry
+        self._next = None       # eksklusiv slutdag for næste bid (går bagud)
+        self._empty = 0         # tomme bidder i træk
+        self._done = False      # historikken er hentet
+        self._caught_up = True  # ... og importeret og lært af detektoren
+        self._import = None     # første time (epoch-sekund) der mangler at blive importeret
+        self.chunks = 0       # hentede bidder siden start
+        self.hours = 0        # hentede timer siden start
+
+    # ---------- Checkpoint ----------
+
+    def snapshot(self):
+        return {
+            "next": self._next.isoformat() if self._next else None,
+            "empty": self._empty,
+            "done": self._done,
+            "caught_up": self._caught_up,
+            "import": self._import,
+        }
+
+    def restore(self, data):
+        self._next = date.fromisoformat(data["next"]) if data.get("next") else None
+        self._empty = data.get("empty", 0)
+        self._done = data.get("done", False)
+        self._caught_up = data.get("caught_up", True)
+        self._import = data.get("import")
+        if self._import is not None:
+            # Markeringen i lageret gemmes ikke; fortsæt importen fra checkpointet
+            self._energy.store.mark_dirty(self._import)
+
+    def as_dict(self):
+        return {**self.snapshot(), "chunks": self.chunks, "hours": self.hours}
+
+    def _resume(self, today):
+        """
+        Slutdag for næste bid.
+
+        Lageret er facit: mangler timer der blev hentet før en genstart (fx
+        fordi cachen ikke nåede at blive gemt), hentes de igen. Kun tomme
+        bidder (ingen data hos Eloverblik) springes over ud fra checkpointet.
+        """
+        store = self._energy.store
+        first = store.first_day() or store.window_start(today)
+        if self._next is None or self._next > first or not self._empty:
+            self._next = first
+        return self._next
+
+    # ---------- Hentning ----------
+
+    async def _async_chunk(self):
+        """Hent og flet én bid. Returnerer True når historikken er komplet."""
+        store = self._energy.store
+        today = dt_util.now().date()
+        target = store.retain_from(today)
+        to_date = self._resume(today)
+        if to_date <= target:
+            return True
+
+        from_date = max(target, to_date - timedelta(days=HISTORY_CHUNK_DAYS))
+        with self._energy.metrics.timer("fetch_history"):
+            points = await self._energy.client.async_get_history(
+                self._energy.get_metering_point(), from_date, to_date
+            )
+        store.merge(points, track=False)
+        self._next = from_date
+        self._empty = 0 if len(points) else self._empty + 1
+        self.chunks += 1
+        self.hours += len(points)
+        _LOGGER.debug(
+            "Historik for %s: %s timer fra %s - %s", self._energy.get_metering_point(), len(points), from_date, to_date
+        )
+        return from_date <= target or self._empty >= HISTORY_EMPTY_CHUNKS
+
+    def _save(self):
+        self._energy.save_cache()
+        if self.cache is not None:
+            self.cache.schedule_save()
+
+    def _finish(self):
+        """Historikken er hentet: importér og analysér den forfra i bidder (_async_catch_up)."""
+        self._done = True
+        self._caught_up = False
+        self._import = self._energy.store.first_hour()
+        if self._import is not None:
+            self._energy.store.mark_dirty(self._import)
+        # Lær grundlast og afvigelser forfra på hele historikken
+        self._energy.detector.reset()
+        _LOGGER.info(
+            "Historik for %s hentet fra %s", self._energy.get_metering_point(), self._energy.store.first_day()
+        )
+
+    async def _async_catch_up(self):
+        """
+        Importér og lær én bid af historikken.
+
+        Detektorens sidste bid overlades til koordinatoren, som fyrer events
+        for afvigelser i de seneste timer.
+        """
+        store, detector = self._energy.store, self._energy.detector
+        if detector.pending(store) > IMPORT_CHUNK_HOURS:
+            detector.ingest(store, IMPORT_CHUNK_HOURS)
+        if self.statistics is not None:
+            await self.statistics.async_import(store)
+            self._import = store.dirty
+        else:
+            self._import = None
+        self._caught_up = self._import is None and detector.pending(store) <= IMPORT_CHUNK_HOURS
+        if self._caught_up:
+            _LOGGER.debug("Historik for %s importeret", self._energy.get_metering_point())
+
+    async def async_run(self):
+        """Hent og importér historikken færdig. Køres som baggrundsopgave for config entry'en."""
+        if self._done and self._caught_up:
+            return
+        await asyncio.sleep(HISTORY_START_DELAY)
+        while not (self._done and self._caught_up):
+            delay = HISTORY_PAUSE
+            try:
+                async with self._lock:
+                    await self._energy.idle.wait()
+                    if self._done:
+                        await self._async_catch_up()
+                    elif await self._async_chunk():
+                        self._finish()
+                self._save()
+            except EloverblikAuthError:
+                _LOGGER.warning(
+                    "Historik for %s stoppet: Eloverblik afviser refresh token",
+                    self._energy.get_metering_point(),
+                )
+                return
+            except API_ERRORS as err:
+                delay = max(HISTORY_RETRY, getattr(err, "retry_after", None) or 0)
+                _LOGGER.debug(
+                    "Historik for %s fejlede (%s); prøver igen om %s s",
+                    self._energy.get_metering_point(), err, delay,
+                )
+            except Exception as e:
+                # Fx recorderen under import; checkpointet er bevaret
+                delay = HISTORY_RETRY
+                _LOGGER.exception("Historik for %s fejlede: %s", self._energy.get_metering_point(), e)
+            if not (self._done and self._caught_up):
+                await asyncio.sleep(delay)
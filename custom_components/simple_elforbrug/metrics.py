@@ -0,0 +1,106 @@
+"""Simple Elforbrug målinger af opdateringens trin og API-kald."""
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+import time
+
+from homeassistant.util import dt as dt_util
+
+# Øvre grænser (ms) for histogrammernes spande; sidste spand er alt derover
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class LatencyHistogram:
+    """Fast spandinddelt histogram: O(1) hukommelse uanset antal målinger."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0   # ms
+        self.max = 0.0     # ms
+        self.last = None   # ms
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        self.last = ms
+
+    def percentile(self, q):
+        """Øvre grænse for spanden der indeholder q-fraktilen (ms)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS + (self.max,), self.counts):
+            seen += count
+            if seen >= rank:
+                return round(min(bound, self.max), 1)
+        return round(self.max, 1)
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "last_ms": round(self.last, 1) if self.last is not None else None,
+            "mean_ms": round(self.total / self.count, 1) if self.count else None,
+            "p95_ms": self.percentile(0.95),
+            "max_ms": round(self.max, 1),
+            "buckets": {
+                f"<={bound}" if bound else f">{BUCKETS_MS[-1]}": count
+                for bound, count in zip(BUCKETS_MS + (None,), self.counts)
+                if count
+            },
+        }
+
+
+class Metrics:
+    """
+    Latens pr. trin eller endpoint, statuskoder, svarstørrelser og throttling.
+
+    Der findes én pr. målepunkt (opdateringens trin) og én pr. refresh token
+    (token og API-kald, som deles af målepunkterne via BatchingClient).
+    """
+
+    def __init__(self):
+        self.latency = defaultdict(LatencyHistogram)  # trin/endpoint -> histogram
+        self.status = defaultdict(Counter)            # endpoint -> {statuskode: antal}
+        self.response_bytes = Counter()               # endpoint -> bytes i alt
+        self.throttled = 0
+        self.last_success = None
+        self.last_error = None
+
+    @contextmanager
+    def timer(self, name):
+        """Mål varigheden af en blok som trinnet `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.latency[name].observe(time.perf_counter() - start)
+
+    def record_response(self, endpoint, status, size=None):
+        self.status[endpoint][status] += 1
+        if size:
+            self.response_bytes[endpoint] += size
+
+    def record_success(self):
+        self.last_success = dt_util.utcnow()
+
+    def record_error(self, error):
+        self.last_error = {"time": dt_util.utcnow().isoformat(), "error": str(error)[:200]}
+
+    def requests(self):
+        return sum(sum(c.values()) for c in self.status.values())
+
+    def as_dict(self):
+        return {
+            "latency": {name: h.as_dict() for name, h in sorted(self.latency.items())},
+            "status": {endpoint: dict(c) for endpoint, c in self.status.items()},
+            "response_bytes": dict(self.response_bytes),
+            "requests": self.requests(),
+            "throttled": self.throttled,
+            "last_success": self.last_success.isoformat() if self.last_success else None,
+            "last_error": self.last_error,
+        }
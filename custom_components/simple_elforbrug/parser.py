@@ -0,0 +1,179 @@
+"""Simple Elforbrug inkrementel parser af GetTimeSeries-svar."""
+from array import array
+import codecs
+from datetime import datetime
+import json
+import re
+
+import numpy as np
+
+HOUR = 3600
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
+
+# Ét JSON-token efter evt. whitespace/separatorer: struktur, streng eller literal
+_TOKEN = re.compile(
+    r'[\s,:]*(?:([{}\[\]])|"([^"\\]*(?:\\.[^"\\]*)*)"|([^\s,:\[\]{}"]+))'
+)
+
+
+class JsonEventParser:
+    """
+    Minimal pull-parser der kan fodres med bidder af et JSON-dokument.
+
+    For hver skalar kaldes `handler(path, value)`, hvor `path` er den aktuelle
+    sti af nøgler ("item" for array-elementer). Listen genbruges mellem kald
+    og må ikke gemmes. Der bygges aldrig et dict-træ af dokumentet.
+    """
+
+    def __init__(self, handler):
+        self._handler = handler
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._path = []
+        self._in_map = []       # True for objekter, False for arrays
+        self._expect_key = False
+
+    def feed(self, chunk, final=False):
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk, final)
+        text = self._buffer + chunk
+        pos, end = 0, len(text)
+        path, in_map, handler = self._path, self._in_map, self._handler
+
+        while True:
+            match = _TOKEN.match(text, pos)
+            if match is None or match.end() == pos:
+                break
+            if match.group(3) is not None and match.end() == end and not final:
+                break  # literal kan fortsætte i næste bid
+            pos = match.end()
+
+            struct = match.group(1)
+            if struct is not None:
+                if struct in "{[":
+                    if in_map and not in_map[-1]:
+                        path.append("item")
+                    in_map.append(struct == "{")
+                    self._expect_key = struct == "{"
+                else:
+                    in_map.pop()
+                    if in_map:
+                        path.pop()
+                    self._expect_key = bool(in_map) and in_map[-1]
+                continue
+
+            string = match.group(2)
+            if string is not None:
+                if "\\" in string:
+                    string = json.loads(f'"{string}"')
+                if self._expect_key:
+                    path.append(string)
+                    self._expect_key = False
+                    continue
+                value = string
+            else:
+                value = match.group(3)
+
+            if in_map and not in_map[-1]:
+                path.append("item")
+                handler(path, value)
+                path.pop()
+            else:
+                handler(path, value)
+                if in_map:
+                    path.pop()
+                    self._expect_key = True
+
+        self._buffer = text[pos:]
+
+
+class TimeSeriesStreamParser:
+    """
+    Streamer MyEnergyData_MarketDocument -> TimeSeries -> Period -> Point.
+
+    Punkter skrives direkte i en kompakt float64-buffer pr. målepunkt som
+    (epoch-sekund for timens start, kWh); resultatet fra `points()` kan gives
+    direkte til HourlyStore.merge. Små svar er hurtigere at decode med
+    json.loads og give til `load()`, som fylder de samme buffere.
+    """
+
+    def __init__(self):
+        self._events = JsonEventParser(self._handle)
+        self._points = {}           # målepunkt -> array("d") [ts, kWh, ts, kWh, ...]
+        self._current = None
+        self._period_start = None
+        self._position = None
+        self._quantity = None
+
+    def feed(self, chunk, final=False):
+        self._events.feed(chunk, final)
+
+    def load(self, document):
+        """Læs punkterne fra et allerede decodet svar."""
+        for result in document.get("result") or []:
+            market_document = result.get("MyEnergyData_MarketDocument") or {}
+            for time_series in market_document.get("TimeSeries") or []:
+                values = self._points.setdefault(time_series.get("mRID"), array("d"))
+                for period in time_series.get("Period") or []:
+                    start = int(datetime.strptime(period["timeInterval"]["start"], TIME_FORMAT).timestamp())
+                    for point in period.get("Point") or []:
+                        values.append(start + (int(point["position"]) - 1) * HOUR)
+                        values.append(float(point["out_Quantity.quantity"]))
+
+    def points(self):
+        """{målepunkt: ndarray med form (n, 2)}."""
+        return {
+            metering_point: np.frombuffer(values, dtype=np.float64).reshape(-1, 2)
+            for metering_point, values in self._points.items()
+        }
+
+    def _emit(self):
+        if self._current is None:
+            # Punkter før et mRID (bør ikke ske hos Eloverblik)
+            self._current = self._points.setdefault(None, array("d"))
+        self._current.append(self._period_start + (self._position - 1) * HOUR)
+        self._current.append(self._quantity)
+        self._position = self._quantity = None
+
+    def _handle(self, path, value):
+        key = path[-1]
+        if key == "out_Quantity.quantity":
+            self._quantity = float(value)
+            if self._position is not None:
+                self._emit()
+        elif key == "position":
+            self._position = int(value)
+            if self._quantity is not None:
+                self._emit()
+        elif key == "start" and len(path) > 1 and path[-2] == "timeInterval":
+            self._period_start = int(
+                datetime.strptime(value, TIME_FORMAT).timestamp()
+            )
+            self._position = self._quantity = None
+        elif key == "mRID" and len(path) > 2 and path[-3] == "TimeSeries":
+            self._current = self._points.setdefault(value, array("d"))
+
+
+def parse_time_series_stream(chunks, stream_min_size=0):
+    """
+    Parse et helt svar (tekst eller bytes, evt. i bidder) til {målepunkt: punkter}.
+
+    Et helt svar under `stream_min_size` tegn/bytes decodes med json.loads.
+    """
+    parser = TimeSeriesStreamParser()
+    if isinstance(chunks, (str, bytes)):
+        if len(chunks) < stream_min_size:
+            parser.load(json.loads(chunks))
+            return parser.points()
+        chunks = [chunks]
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.feed(b"", final=True)
+    return parser.points()
+
+
+def monthly_values(points):
+    """Månedsværdier (kWh) i tidsorden fra punkter med aggregation "Month"."""
+    if points is None or not len(points):
+        return []
+    return points[np.argsort(points[:, 0]), 1].tolist()
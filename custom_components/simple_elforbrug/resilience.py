@@ -0,0 +1,110 @@
+"""Simple Elforbrug retries og circuit breaker for kald til Eloverblik."""
+import asyncio
+import logging
+import random
+import time
+
+from .const import (
+    BREAKER_MAX_RESET,
+    BREAKER_RESET,
+    BREAKER_THRESHOLD,
+    RETRY_ATTEMPTS,
+    RETRY_BACKOFF,
+    RETRY_MAX_BACKOFF,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Stopper kald til et endpoint mens det er nede.
+
+    Efter BREAKER_THRESHOLD fejl i træk åbnes breakeren, og kald afvises med
+    det samme i BREAKER_RESET sekunder. Derefter slippes ét prøvekald
+    igennem (half-open): lykkes det lukkes breakeren, ellers åbnes den igen
+    med dobbelt så lang pause, op til BREAKER_MAX_RESET.
+    """
+
+    def __init__(self, name, threshold=BREAKER_THRESHOLD, reset=BREAKER_RESET, max_reset=BREAKER_MAX_RESET):
+        self.name = name
+        self._threshold = threshold
+        self._base_reset = reset
+        self._max_reset = max_reset
+        self._reset = reset
+        self._failures = 0
+        self._opened = None   # time.monotonic() da breakeren åbnede
+        self._trial = False   # et prøvekald er i gang
+        self.trips = 0
+
+    @property
+    def state(self):
+        if self._opened is None:
+            return "closed"
+        return "half_open" if self.retry_in() == 0 else "open"
+
+    def retry_in(self):
+        """Sekunder til næste prøvekald (0 hvis lukket eller klar)."""
+        if self._opened is None:
+            return 0
+        return max(0, round(self._opened + self._reset - time.monotonic()))
+
+    def allow(self):
+        if self._opened is None:
+            return True
+        if self.retry_in() > 0 or self._trial:
+            return False
+        self._trial = True
+        return True
+
+    def release(self):
+        """Kaldet blev afbrudt uden svar: frigiv prøvekaldet uden at tælle det."""
+        self._trial = False
+
+    def success(self):
+        if self._opened is not None:
+            _LOGGER.info("Eloverblik %s svarer igen", self.name)
+        self._failures = 0
+        self._opened = None
+        self._trial = False
+        self._reset = self._base_reset
+
+    def failure(self):
+        self._failures += 1
+        if self._trial:
+            # Prøvekaldet fejlede: længere pause
+            self._reset = min(self._reset * 2, self._max_reset)
+        elif self._failures < self._threshold or self._opened is not None:
+            return
+        self._trial = False
+        self._opened = time.monotonic()
+        self.trips += 1
+        _LOGGER.warning(
+            "Eloverblik %s fejler (%s i træk); pauser kald i %s s", self.name, self._failures, self._reset
+        )
+
+    def as_dict(self):
+        return {
+            "state": self.state,
+            "failures": self._failures,
+            "retry_in": self.retry_in(),
+            "trips": self.trips,
+        }
+
+
+async def async_retry(call, retryable, attempts=RETRY_ATTEMPTS, backoff=RETRY_BACKOFF, max_backoff=RETRY_MAX_BACKOFF):
+    """
+    Kør `call()` og prøv igen ved fejl hvor `retryable(err)` er sand.
+
+    Ventetiden fordobles for hvert forsøg (højst max_backoff sekunder) og
+    spredes tilfældigt, så samtidige klienter ikke rammer på samme tid.
+    """
+    for attempt in range(attempts):
+        try:
+            return await call()
+        except Exception as err:  # pylint: disable=broad-except
+            if attempt + 1 >= attempts or not retryable(err):
+                raise
+            delay = min(max_backoff, backoff * 2 ** attempt) * random.uniform(0.5, 1)
+            _LOGGER.debug("Forsøg %s fejlede (%s); prøver igen om %.1f s", attempt + 1, err, delay)
+            await asyncio.sleep(delay)
@@ -0,0 +1,113 @@
+"""Simple Elforbrug dagstotaler og prefix-summer over timelageret."""
+from datetime import date, timedelta
+
+import numpy as np
+
+
+class DayRollup:
+    """
+    Forbrug pr. lokalt døgn med prefix-summer, vedligeholdt af HourlyStore.
+
+    Indeks 0 svarer til dagen med ordinal _first. Ved siden af dagstotalerne
+    holdes antal timer med data pr. dag (så "ingen data" kan skelnes fra 0
+    kWh) og prefix-summer af begge. Totalen for ethvert interval af hele dage
+    (uge, måned, år, "de sidste 30 dage") er derfor to opslag, uanset hvor
+    meget historik lageret har.
+
+    Når timer flettes ind, genberegnes kun de berørte dage, og prefix-summerne
+    fra den første af dem; nye timer ligger sidst, så det er få elementer.
+    """
+
+    __slots__ = ("_first", "_totals", "_hours", "_prefix", "_hour_prefix")
+
+    def __init__(self):
+        self._first = None                        # ordinal for indeks 0
+        self._totals = np.empty(0)                # kWh pr. dag (0 uden data)
+        self._hours = np.empty(0, dtype=np.int64) # timer med data pr. dag
+        self._prefix = np.zeros(1)                # _prefix[i] = sum(_totals[:i])
+        self._hour_prefix = np.zeros(1, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._totals)
+
+    # ---------- Vedligeholdelse ----------
+
+    def update(self, first_day: date, totals, hours):
+        """Erstat dagene fra first_day med nye totaler (NaN = 0) og timeantal."""
+        first = first_day.toordinal()
+        count = len(totals)
+        if self._first is None:
+            self._first = first
+        before = max(self._first - first, 0)
+        after = max(first + count - (self._first + len(self._totals)), 0)
+        if before or after:
+            self._totals = np.concatenate((np.zeros(before), self._totals, np.zeros(after)))
+            self._hours = np.concatenate((
+                np.zeros(before, dtype=np.int64), self._hours, np.zeros(after, dtype=np.int64)
+            ))
+            self._first -= before
+        start = first - self._first
+        self._totals[start:start + count] = np.nan_to_num(totals)
+        self._hours[start:start + count] = hours
+        if before:
+            start = 0  # alle prefix-summer er forskudt
+        self._prefix = _extend_prefix(self._prefix, self._totals, start)
+        self._hour_prefix = _extend_prefix(self._hour_prefix, self._hours, start)
+
+    def prune(self, first_day: date):
+        """Smid dage før first_day væk."""
+        if self._first is None:
+            return
+        drop = min(first_day.toordinal() - self._first, len(self._totals))
+        if drop <= 0:
+            return
+        self._totals = self._totals[drop:].copy()
+        self._hours = self._hours[drop:].copy()
+        self._prefix = self._prefix[drop:] - self._prefix[drop]
+        self._hour_prefix = self._hour_prefix[drop:] - self._hour_prefix[drop]
+        self._first += drop
+
+    # ---------- Opslag ----------
+
+    def _index(self, days):
+        """Indeks i prefix-summerne for dage (ordinals), klippet til det dækkede."""
+        return np.clip(np.asarray(days) - self._first, 0, len(self._totals))
+
+    def range_totals(self, boundaries):
+        """
+        Totaler for de på hinanden følgende intervaller mellem `boundaries`.
+
+        boundaries er stigende datoer; interval i er [boundaries[i],
+        boundaries[i+1]). Giver en array med NaN for intervaller uden data.
+        """
+        if self._first is None or len(boundaries) < 2:
+            return np.full(max(len(boundaries) - 1, 0), np.nan)
+        idx = self._index([day.toordinal() for day in boundaries])
+        totals = np.diff(self._prefix[idx])
+        hours = np.diff(self._hour_prefix[idx])
+        return np.where(hours > 0, totals, np.nan)
+
+    def total(self, first_day: date, end_day: date):
+        """Total i kWh for dagene [first_day, end_day), None uden data."""
+        value = self.range_totals((first_day, end_day))[0]
+        return None if np.isnan(value) else float(value)
+
+    def day_totals(self, first_day: date, days: int):
+        """Dagstotaler for `days` dage fra first_day (NaN uden data)."""
+        return self.range_totals([first_day + timedelta(days=i) for i in range(days + 1)])
+
+    def hours(self, day: date) -> int:
+        """Antal timer med data på en dag."""
+        if self._first is None:
+            return 0
+        i = day.toordinal() - self._first
+        return int(self._hours[i]) if 0 <= i < len(self._hours) else 0
+
+
+def _extend_prefix(prefix, values, start):
+    """Prefix-summer for values, genberegnet fra indeks start."""
+    start = min(start, len(prefix) - 1)  # nye dage efter et hul er også ændret
+    if len(prefix) != len(values) + 1:
+        prefix = np.resize(prefix, len(values) + 1)
+    prefix[start + 1:] = prefix[start] + np.cumsum(values[start:])
+    return prefix
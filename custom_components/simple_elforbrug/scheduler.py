@@ -0,0 +1,143 @@
+"""Simple Elforbrug adaptiv planlægning af opdateringer."""
+from datetime import date, timedelta
+import logging
+import math
+import random
+
+import numpy as np
+
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    ARRIVAL_DECAY,
+    ARRIVAL_SHARE,
+    MIN_TIME_BETWEEN_UPDATES,
+    SCHEDULE_JITTER,
+    SCHEDULE_MAX_INTERVAL,
+    SCHEDULE_PEAK_INTERVAL,
+    SCHEDULE_THROTTLE_INTERVAL,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _max_steps(base):
+    """Antal fordoblinger før base når SCHEDULE_MAX_INTERVAL."""
+    return max(math.ceil(math.log2(SCHEDULE_MAX_INTERVAL / base)), 0)
+
+
+def _backoff(base, steps):
+    """base fordoblet `steps` gange, højst SCHEDULE_MAX_INTERVAL."""
+    # Begræns eksponenten: efter dage uden data bliver 2 ** steps for stor til timedelta
+    return min(SCHEDULE_MAX_INTERVAL, base * 2 ** min(steps, _max_steps(base)))
+
+
+class RefreshScheduler:
+    """
+    Vælger tiden til næste opdatering for ét målepunkt.
+
+    Eloverblik udgiver gårsdagens timer samlet, så scheduleren lærer hvilke
+    timer på døgnet en ny dag typisk dukker op (vægte der henfalder for hver
+    ny observation) og poller tæt omkring dem. Uden for det vindue fordobles
+    intervallet for hver opdatering uden nye data, op til
+    SCHEDULE_MAX_INTERVAL, men der vågnes altid til næste forventede ankomst.
+    429/503 giver eksponentiel backoff med jitter.
+    """
+
+    def __init__(self):
+        self._weights = np.zeros(24)  # ankomster pr. lokal time på døgnet (henfaldende)
+        self._arrived = None          # lokal dato hvor seneste nye dag kom
+        self._seen_day = None         # seneste dag med data ved sidste opdatering
+        self._idle = 0                # opdateringer i træk uden ændringer
+        self._throttled = 0           # 429/503 i træk
+        self._retry_after = None      # sekunder fra Retry-After
+
+    def _peak_hours(self):
+        top = self._weights.max()
+        if top <= 0:
+            return set()
+        hours = np.flatnonzero(self._weights >= top * ARRIVAL_SHARE)
+        # Start en time før, så data fanges kort efter de udgives
+        return {int(h) for h in hours} | {int(h - 1) % 24 for h in hours}
+
+    def record(self, changed, last_day, now=None):
+        """Registrér en opdatering: antal ændrede timer og seneste dag med data."""
+        now = dt_util.as_local(now or dt_util.utcnow())
+        self._throttled = 0
+        self._retry_after = None
+        self._idle = 0 if changed else self._idle + 1
+
+        if last_day is not None and self._seen_day is not None and last_day > self._seen_day:
+            self._weights *= ARRIVAL_DECAY
+            self._weights[now.hour] += 1
+            self._arrived = now.date()
+            _LOGGER.debug("Ny dag (%s) ankom kl. %s", last_day, now.hour)
+        if last_day is not None:
+            self._seen_day = last_day
+
+    def record_throttled(self, retry_after=None):
+        self._throttled += 1
+        self._retry_after = retry_after
+
+    def _until_window(self, now, peaks):
+        """Tid til næste time i ankomstvinduet (ikke i dag hvis dagen er kommet)."""
+        hour = now.replace(minute=0, second=0, microsecond=0)
+        for k in range(1, 49):
+            start = hour + timedelta(hours=k)
+            if start.hour in peaks and start.date() != self._arrived:
+                return start - now
+        return None
+
+    def next_interval(self, now=None):
+        """Interval til næste opdatering."""
+        now = dt_util.as_local(now or dt_util.utcnow())
+        if self._throttled:
+            interval = _backoff(SCHEDULE_THROTTLE_INTERVAL, self._throttled - 1)
+            if self._retry_after:
+                interval = max(interval, timedelta(seconds=self._retry_after))
+            # Kun opad, så vi aldrig kommer før serveren bad om det
+            return interval * random.uniform(1, 1 + SCHEDULE_JITTER)
+
+        jitter = random.uniform(1 - SCHEDULE_JITTER, 1 + SCHEDULE_JITTER)
+        peaks = self._peak_hours()
+        if not peaks:
+            # Intet lært endnu: som før, fast interval
+            return MIN_TIME_BETWEEN_UPDATES * jitter
+        if now.hour in peaks and now.date() != self._arrived:
+            return SCHEDULE_PEAK_INTERVAL * jitter
+
+        interval = _backoff(MIN_TIME_BETWEEN_UPDATES, self._idle) * jitter
+        until = self._until_window(now, peaks)
+        if until is not None:
+            interval = min(interval, max(until, SCHEDULE_PEAK_INTERVAL))
+        return interval
+
+    # ---------- Cache ----------
+
+    def dump(self):
+        return {
+            "weights": [round(float(w), 4) for w in self._weights],
+            "arrived": self._arrived.isoformat() if self._arrived else None,
+            "seen": self._seen_day.isoformat() if self._seen_day else None,
+            # Ud over loftet ændrer flere tomme opdateringer intet (og cachen gemmes ikke)
+            "idle": min(self._idle, _max_steps(MIN_TIME_BETWEEN_UPDATES)),
+        }
+
+    def load(self, data, last_day=None):
+        """
+        Indlæs fra dump(). Uden gemt dag (ældre cache) bruges `last_day`,
+        lagerets seneste dag, så første nye dag efter en genstart tæller som
+        en ankomst.
+        """
+        data = data or {}
+        weights = data.get("weights") or []
+        if len(weights) == 24:
+            self._weights = np.asarray(weights, dtype=np.float64)
+        if data.get("arrived"):
+            self._arrived = date.fromisoformat(data["arrived"])
+        if data.get("seen"):
+            self._seen_day = date.fromisoformat(data["seen"])
+        elif self._seen_day is None:
+            self._seen_day = last_day
+        if "idle" in data:
+            self._idle = int(data["idle"])
@@ -1,11 +1,21 @@
 """Simpelt Elforbrug sensorer"""
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EntityCategory
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.restore_state import RestoreEntity
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import DOMAIN, SENSOR_DATA_SCHEMA
-from .coordinator import SensorCoordinator, TariffCoordinator
+from .coordinator import (
+    ANALYTICS_SENSORS,
+    DIAGNOSTIC_SENSORS,
+    AnalyticsCoordinator,
+    CostCoordinator,
+    DiagnosticCoordinator,
+    SensorCoordinator,
+    TariffCoordinator,
+)
 
 import logging
 _LOGGER = logging.getLogger(__name__)
@@ -13,24 +23,41 @@ _LOGGER = logging.getLogger(__name__)
 
 async def async_setup_entry(hass: HomeAssistant, config: ConfigEntry, async_add_entities):
     """Set up the sensor platform."""
-    eloverblik = hass.data[DOMAIN][config.entry_id]
-    tariff_instance = hass.data[DOMAIN][f"{config.entry_id}_tariff"]
-    sensors = [Elforbrug(sensor.key, eloverblik) for sensor in SENSOR_DATA_SCHEMA]
+    coordinator = hass.data[DOMAIN][config.entry_id]
+    sensors = [
+        Elforbrug(coordinator, SensorCoordinator(sensor.key, coordinator.energy))
+        for sensor in SENSOR_DATA_SCHEMA
+    ]
+    sensors.append(TariffSensor(coordinator, TariffCoordinator(coordinator.tariff)))
+    sensors.append(HelperSensor(coordinator, CostCoordinator(coordinator.energy, coordinator.tariff)))
+    sensors += [
+        HelperSensor(coordinator, AnalyticsCoordinator(kind, coordinator.energy))
+        for kind in ANALYTICS_SENSORS
+    ]
+    sensors += [
+        DiagnosticSensor(coordinator, DiagnosticCoordinator(kind, coordinator))
+        for kind in DIAGNOSTIC_SENSORS
+    ]
     async_add_entities(sensors)
 
-    sensors.append(TariffSensor(TariffCoordinator(tariff_instance)))
-    async_add_entities(sensors)
-
-class Elforbrug(RestoreEntity):
+class Elforbrug(CoordinatorEntity, RestoreEntity):
     """Representation of an energy sensor."""
 
-    def __init__(self, sensor_type, client):
+    def __init__(self, coordinator, sensor):
         """Initialize the sensor."""
-        self.coordinator = SensorCoordinator(sensor_type, client)
+        super().__init__(coordinator)
+        self._sensor = sensor
         self._state = None
 
     async def async_added_to_hass(self):
         """Restore last state on startup."""
+        await super().async_added_to_hass()
+        if self._sensor.has_data():
+            # Cachede data: fuld state og attributes med det samme
+            self._sensor.refresh()
+            self._state = self._sensor.state
+            return
+
         last_state = await self.async_get_last_state()
         if last_state and last_state.state not in (None, "unknown", "unavailable"):
             try:
@@ -38,72 +65,202 @@ class Elforbrug(RestoreEntity):
             except ValueError:
                 self._state = None
 
+    @callback
+    def _handle_coordinator_update(self):
+        """Læs de nye data fra den fælles koordinator (ingen I/O)."""
+        if not self._sensor.refresh():
+            return  # uændrede data: ingen ny state
+        self._state = self._sensor.state
+        self.async_write_ha_state()
+
     @property
     def name(self):
-        return self.coordinator.name
+        return self._sensor.name
 
     @property
     def unique_id(self):
-        return self.coordinator.unique_id
+        return self._sensor.unique_id
 
     @property
     def state(self):
-        return round(self._state or self.coordinator.state, 3)
+        return round(self._state or self._sensor.state, 3)
 
     @property
     def extra_state_attributes(self):
-        return self.coordinator.extra_state_attributes
+        return self._sensor.extra_state_attributes
 
     @property
     def unit_of_measurement(self):
-        return self.coordinator.unit_of_measurement
+        return self._sensor.unit_of_measurement
 
     @property
     def icon(self):
-        return self.coordinator.icon
-
-    def update(self):
-        self.coordinator.update()
-        self._state = self.coordinator.state
-        
-        
-        
-class TariffSensor(RestoreEntity):
+        return self._sensor.icon
+
+
+
+class TariffSensor(CoordinatorEntity, RestoreEntity):
     """Sensor for el-tariffer."""
 
-    def __init__(self, coordinator):
-        self.coordinator = coordinator
+    # Døgnets 24 timepriser skifter hver dag; recorderen skal ikke gemme dem
+    _unrecorded_attributes = frozenset({"Pris pr. time i dag"})
+
+    def __init__(self, coordinator, sensor):
+        super().__init__(coordinator)
+        self._sensor = sensor
         self._state = None
 
     async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self._sensor.refresh()
+        if self._sensor.state is not None:
+            # Cachede tariffer: beregnet state i stedet for den gemte
+            self._state = self._sensor.state
+            return
+
         last_state = await self.async_get_last_state()
-        if last_state:
+        if last_state and last_state.state not in (None, "unknown", "unavailable"):
             self._state = last_state.state
 
+    @callback
+    def _handle_coordinator_update(self):
+        """Læs de nye tariffer fra den fælles koordinator (ingen I/O)."""
+        if not self._sensor.refresh():
+            return  # uændrede data: ingen ny state
+        self._state = self._sensor.state
+        self.async_write_ha_state()
+
     @property
     def name(self):
-        return self.coordinator.name
+        return self._sensor.name
 
     @property
     def unique_id(self):
-        return self.coordinator.unique_id
+        return self._sensor.unique_id
 
     @property
     def state(self):
-        return self._state or self.coordinator.state
+        return self._state or self._sensor.state
 
     @property
     def extra_state_attributes(self):
-        return self.coordinator.extra_state_attributes
+        return self._sensor.extra_state_attributes
 
     @property
     def unit_of_measurement(self):
-        return self.coordinator.unit_of_measurement
+        return self._sensor.unit_of_measurement
 
     @property
     def icon(self):
-        return self.coordinator.icon
+        return self._sensor.icon
+
+
+class HelperSensor(CoordinatorEntity, RestoreEntity):
+    """Sensor for et tal beregnet af en coordinator-hjælper (pris, grundlast, afvigelser)."""
+
+    # Pris-sensorens 24 timepriser for seneste dag gemmes ikke af recorderen
+    _unrecorded_attributes = frozenset({"Hourly Cost"})
+
+    def __init__(self, coordinator, sensor):
+        super().__init__(coordinator)
+        self._sensor = sensor
+        self._state = None
+
+    async def async_added_to_hass(self):
+        """Beregn fra de cachede data; ellers gendan sidste tal."""
+        await super().async_added_to_hass()
+        self._sensor.refresh()
+        if self._sensor.state is not None:
+            self._state = self._sensor.state
+            return
 
-    def update(self):
-        self.coordinator.update()
-        self._state = self.coordinator.state
\ No newline at end of file
+        last_state = await self.async_get_last_state()
+        if last_state and last_state.state not in (None, "unknown", "unavailable"):
+            try:
+                self._state = float(last_state.state)
+            except ValueError:
+                self._state = None
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Læs de nye tal fra hjælperen (ingen I/O)."""
+        if not self._sensor.refresh():
+            return  # uændrede data: ingen ny state
+        self._state = self._sensor.state
+        self.async_write_ha_state()
+
+    @property
+    def name(self):
+        return self._sensor.name
+
+    @property
+    def unique_id(self):
+        return self._sensor.unique_id
+
+    @property
+    def state(self):
+        # 0 (fx 0 W grundlast) er en gyldig værdi
+        return self._state if self._state is not None else self._sensor.state
+
+    @property
+    def extra_state_attributes(self):
+        return self._sensor.extra_state_attributes
+
+    @property
+    def unit_of_measurement(self):
+        return self._sensor.unit_of_measurement
+
+    @property
+    def icon(self):
+        return self._sensor.icon
+
+
+class DiagnosticSensor(CoordinatorEntity):
+    """Diagnostisk sensor for opdateringens målinger (slået fra som standard)."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self, coordinator, sensor):
+        super().__init__(coordinator)
+        self._sensor = sensor
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self._sensor.refresh()
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Læs de nye målinger fra koordinatoren (ingen I/O)."""
+        if not self._sensor.refresh():
+            return
+        self.async_write_ha_state()
+
+    @property
+    def name(self):
+        return self._sensor.name
+
+    @property
+    def unique_id(self):
+        return self._sensor.unique_id
+
+    @property
+    def state(self):
+        value = self._sensor.state
+        return value.isoformat() if hasattr(value, "isoformat") else value
+
+    @property
+    def device_class(self):
+        return self._sensor.device_class
+
+    @property
+    def extra_state_attributes(self):
+        return self._sensor.extra_state_attributes
+
+    @property
+    def unit_of_measurement(self):
+        return self._sensor.unit_of_measurement
+
+    @property
+    def icon(self):
+        return self._sensor.icon
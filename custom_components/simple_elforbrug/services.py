@@ -0,0 +1,232 @@
+"""Simple Elforbrug services for alle config entries."""
+import asyncio
+from datetime import timedelta
+import logging
+import time
+
+import numpy as np
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    ATTR_END,
+    ATTR_ENTRY_ID,
+    ATTR_MAX_PARALLEL,
+    ATTR_METERING_POINT,
+    ATTR_RESOLUTION,
+    ATTR_START,
+    ATTR_UNIT,
+    DEFAULT_MAX_PARALLEL,
+    DOMAIN,
+    QUERY_MAX_HOURS,
+    RESOLUTIONS,
+    SERVICE_GET_CONSUMPTION,
+    SERVICE_SET_UNIT,
+    SERVICE_UPDATE_ENERGY,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+TARGET_SCHEMA = {
+    vol.Optional(ATTR_METERING_POINT): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional(ATTR_ENTRY_ID): vol.All(cv.ensure_list, [cv.string]),
+}
+
+UPDATE_ENERGY_SCHEMA = vol.Schema({
+    **TARGET_SCHEMA,
+    vol.Optional(ATTR_MAX_PARALLEL, default=DEFAULT_MAX_PARALLEL): vol.All(
+        vol.Coerce(int), vol.Range(min=1)
+    ),
+})
+
+SET_UNIT_SCHEMA = vol.Schema({
+    **TARGET_SCHEMA,
+    vol.Required(ATTR_UNIT): vol.All(cv.string, vol.In(["kWh", "MWh", "kwh", "mwh"])),
+})
+
+GET_CONSUMPTION_SCHEMA = vol.Schema({
+    **TARGET_SCHEMA,
+    vol.Required(ATTR_START): cv.date,
+    vol.Optional(ATTR_END): cv.date,
+    vol.Optional(ATTR_RESOLUTION, default="day"): vol.In(RESOLUTIONS),
+    vol.Optional(ATTR_UNIT): vol.All(cv.string, vol.In(["kWh", "MWh", "kwh", "mwh"])),
+})
+
+
+def _target_coordinators(hass: HomeAssistant, call: ServiceCall):
+    """{entry_id: koordinator} for de valgte målepunkter/entries (standard: alle)."""
+    coordinators = hass.data.get(DOMAIN, {})
+    entry_ids = call.data.get(ATTR_ENTRY_ID)
+    metering_points = call.data.get(ATTR_METERING_POINT)
+
+    unknown = [e for e in entry_ids or () if e not in coordinators]
+    known_points = {c.energy.get_metering_point() for c in coordinators.values()}
+    unknown += [mp for mp in metering_points or () if mp not in known_points]
+    if unknown:
+        raise HomeAssistantError(f"Ukendte målepunkter eller entries: {', '.join(unknown)}")
+
+    return {
+        entry_id: coordinator
+        for entry_id, coordinator in coordinators.items()
+        if (entry_ids is None or entry_id in entry_ids)
+        and (metering_points is None or coordinator.energy.get_metering_point() in metering_points)
+    }
+
+
+async def _async_refresh(coordinator, semaphore):
+    """Opdatér én koordinator og returnér resultat med tidsforbrug."""
+    async with semaphore:
+        applied = coordinator.updates_applied
+        start = time.monotonic()
+        await coordinator.async_refresh()
+        duration = time.monotonic() - start
+    return {
+        "success": coordinator.last_update_success,
+        "changed": coordinator.updates_applied > applied,
+        "data_date": coordinator.energy.get_data_date(),
+        "duration": round(duration, 3),
+    }
+
+
+async def async_handle_update_energy(hass: HomeAssistant, call: ServiceCall):
+    """
+    Opdatér de valgte målepunkter samtidigt (højst max_parallel ad gangen).
+
+    Målepunkter med samme refresh token deler token og samlede kald via
+    BatchingClient. Returnerer et resultat pr. målepunkt.
+    """
+    coordinators = _target_coordinators(hass, call)
+    semaphore = asyncio.Semaphore(call.data[ATTR_MAX_PARALLEL])
+    _LOGGER.debug("Manuel opdatering af %s målepunkter startet via servicecall", len(coordinators))
+
+    start = time.monotonic()
+    results = await asyncio.gather(*[
+        _async_refresh(coordinator, semaphore) for coordinator in coordinators.values()
+    ])
+    response = {
+        coordinator.energy.get_metering_point(): {"entry_id": entry_id, **result}
+        for (entry_id, coordinator), result in zip(coordinators.items(), results)
+    }
+    _LOGGER.info(
+        "Manuel opdatering færdig på %.1f s (%s af %s med nye data)",
+        time.monotonic() - start,
+        sum(r["changed"] for r in results),
+        len(results),
+    )
+    return {"results": response}
+
+
+async def async_handle_set_unit(hass: HomeAssistant, call: ServiceCall):
+    """
+    Skift enhed (kWh / MWh) for de valgte målepunkter og gem i config entry.
+
+    Data ligger altid i kWh, så skiftet er ren præsentation: sensorerne
+    regner state og attributes om fra de cachede værdier og skriver dem med
+    det samme, uden netværkskald. Entry'en har ingen update listener, så
+    opdateringen af entry.data genstarter ikke integrationen.
+    """
+    new_unit = "MWh" if call.data[ATTR_UNIT].lower() == "mwh" else "kWh"
+    for entry_id, coordinator in _target_coordinators(hass, call).items():
+        # Ændr i hukommelsen
+        coordinator.energy.unit_of_measurement = new_unit
+
+        # Gem permanent i config entry
+        entry = hass.config_entries.async_get_entry(entry_id)
+        hass.config_entries.async_update_entry(
+            entry, data={**entry.data, "unit_of_measurement": new_unit}
+        )
+        _LOGGER.info("Enhed for %s gemt: %s", coordinator.energy.get_metering_point(), new_unit)
+
+        # Genberegn sensorerne fra de cachede kWh (ingen I/O)
+        coordinator.async_update_listeners()
+
+
+def _consumption(energy, first_day, end_day, resolution, unit):
+    """Forbrug for ét målepunkt fra timelageret og rollup'en (ingen netværkskald)."""
+    starts, values = energy.store.series(first_day, end_day, resolution)
+    if unit == "MWh":
+        values = values / 1000.0
+    total = None if np.isnan(values).all() else round(float(np.nansum(values)), 3)
+    values = np.round(values, 3)
+    if resolution == "hour":
+        starts = [dt_util.as_local(dt_util.utc_from_timestamp(ts)).isoformat() for ts in starts]
+    else:
+        starts = [day.isoformat() for day in starts]
+    return {
+        "unit": unit,
+        "total": total,
+        "values": [
+            {"start": start, "value": None if np.isnan(value) else float(value)}
+            for start, value in zip(starts, values)
+        ],
+    }
+
+
+async def async_handle_get_consumption(hass: HomeAssistant, call: ServiceCall):
+    """
+    Forbrug for de valgte målepunkter i et datointerval (start til og med end).
+
+    Svaret bygges fra det lokale timelager: dage og måneder er opslag i
+    rollup'en, timer et udsnit af arrayet. Serier kan dermed hentes efter
+    behov i stedet for at ligge i sensorernes attributes. Uden unit bruges
+    målepunktets valgte enhed.
+    """
+    first_day = call.data[ATTR_START]
+    last_day = call.data.get(ATTR_END) or dt_util.now().date()
+    resolution = call.data[ATTR_RESOLUTION]
+    if last_day < first_day:
+        raise HomeAssistantError("end skal være samme dag som eller efter start")
+    end_day = last_day + timedelta(days=1)
+    if resolution == "hour" and (end_day - first_day).days * 24 > QUERY_MAX_HOURS:
+        raise HomeAssistantError(
+            f"Højst {QUERY_MAX_HOURS // 24} dage med resolution hour; brug day eller month"
+        )
+
+    results = {}
+    for entry_id, coordinator in _target_coordinators(hass, call).items():
+        energy = coordinator.energy
+        unit = call.data.get(ATTR_UNIT) or str(energy.unit_of_measurement)
+        unit = "MWh" if unit.lower() == "mwh" else "kWh"
+        results[energy.get_metering_point()] = {
+            "entry_id": entry_id,
+            **_consumption(energy, first_day, end_day, resolution, unit),
+        }
+    return {
+        "start": first_day.isoformat(),
+        "end": last_day.isoformat(),
+        "resolution": resolution,
+        "results": results,
+    }
+
+
+def async_setup_services(hass: HomeAssistant):
+    """Registrér services én gang for hele integrationen."""
+
+    async def handle_update_energy(call: ServiceCall):
+        return await async_handle_update_energy(hass, call)
+
+    async def handle_set_unit(call: ServiceCall):
+        await async_handle_set_unit(hass, call)
+
+    async def handle_get_consumption(call: ServiceCall):
+        return await async_handle_get_consumption(hass, call)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_UPDATE_ENERGY,
+        handle_update_energy,
+        schema=UPDATE_ENERGY_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(DOMAIN, SERVICE_SET_UNIT, handle_set_unit, schema=SET_UNIT_SCHEMA)
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_CONSUMPTION,
+        handle_get_consumption,
+        schema=GET_CONSUMPTION_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
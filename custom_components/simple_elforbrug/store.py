@@ -0,0 +1,336 @@
+"""Simple Elforbrug lokalt timelager."""
+import base64
+from datetime import date, timedelta
+import logging
+import zlib
+
+import numpy as np
+
+from homeassistant.util import dt as dt_util
+
+from .const import BACKFILL_DAYS, HISTORY_DAYS, LOOKBACK_DAYS
+from .rollup import DayRollup
+
+_LOGGER = logging.getLogger(__name__)
+
+HOUR = 3600
+
+
+def local_date(ts):
+    """Lokal dato for et epoch-sekund."""
+    return dt_util.as_local(dt_util.utc_from_timestamp(ts)).date()
+
+
+def day_bounds(day: date):
+    """Returnér (start, slut) i epoch-sekunder for et lokalt døgn."""
+    start = dt_util.start_of_local_day(day)
+    end = dt_util.start_of_local_day(day + timedelta(days=1))
+    return int(start.timestamp()), int(end.timestamp())
+
+
+class HourlyStore:
+    """
+    Timeværdier i kWh for ét målepunkt som én sammenhængende float64-array.
+
+    Indeks 0 svarer til epoch-timen i _base; manglende timer er NaN.
+    Dagstotaler og prefix-summer holdes i en DayRollup, som opdateres for de
+    berørte dage når timer flettes ind, så dag-, uge-, måneds- og
+    årssummer er opslag uanset hvor meget historik der holdes.
+
+    Holder styr på et high-water mark (seneste time med data), så en
+    opdatering kun behøver at hente de dage der mangler eller stadig kan
+    blive efterudfyldt af Eloverblik. Opdateringen dækker lookback-vinduet
+    og hele indeværende måned; ældre timer hentet af HistoryBackfill
+    beholdes i op til history_days dage.
+    """
+
+    __slots__ = (
+        "_base", "_values", "_high_water", "_dirty_from", "_lookback_days", "_backfill_days",
+        "_history_days", "_rollup",
+    )
+
+    def __init__(self, lookback_days=LOOKBACK_DAYS, backfill_days=BACKFILL_DAYS, history_days=HISTORY_DAYS):
+        self._base = None                          # epoch-time (ts // 3600) for indeks 0
+        self._values = np.empty(0, dtype=np.float64)
+        self._high_water = None                    # seneste time med data (epoch-sekund)
+        self._dirty_from = None                    # ældste ændrede time siden take_dirty()
+        self._lookback_days = lookback_days
+        self._backfill_days = backfill_days
+        self._history_days = history_days
+        self._rollup = DayRollup()
+
+    @property
+    def high_water(self):
+        return self._high_water
+
+    @property
+    def rollup(self):
+        """Dagstotaler og prefix-summer (kWh) for lageret."""
+        return self._rollup
+
+    def fingerprint(self):
+        """(seneste time, crc32 af alle værdier): ændres når lageret ændres."""
+        return self._base, self._high_water, zlib.crc32(self._values.tobytes())
+
+    def checksum(self, start_ts=None, end_ts=None):
+        """crc32 af timerne i [start_ts, end_ts) (hele lageret uden grænser)."""
+        return zlib.crc32(self._range(start_ts, end_ts)[1].tobytes())
+
+    def __len__(self):
+        return int(np.count_nonzero(~np.isnan(self._values)))
+
+    # ---------- Indeks ----------
+
+    def _slice(self, start_ts, end_ts):
+        """Array-udsnit for [start_ts, end_ts); tomt hvis uden for lageret."""
+        if self._base is None:
+            return self._values[:0]
+        start = max(start_ts // HOUR - self._base, 0)
+        end = max(end_ts // HOUR - self._base, 0)
+        return self._values[start:end]
+
+    def _range(self, start_ts, end_ts):
+        """(første time, array-udsnit) for [start_ts, end_ts) begrænset til lageret; None = ingen grænse."""
+        if self._base is None:
+            return None, self._values[:0]
+        start = 0 if start_ts is None else min(max(start_ts // HOUR - self._base, 0), len(self._values))
+        end = len(self._values) if end_ts is None else min(max(end_ts // HOUR - self._base, start), len(self._values))
+        return self._base + start, self._values[start:end]
+
+    def _ensure(self, first_hour, last_hour):
+        """Udvid arrayet (med NaN) så det dækker [first_hour, last_hour]."""
+        if self._base is None:
+            self._base = first_hour
+            self._values = np.full(last_hour - first_hour + 1, np.nan)
+            return
+        before = self._base - first_hour
+        after = last_hour - (self._base + len(self._values) - 1)
+        if before > 0 or after > 0:
+            self._values = np.concatenate((
+                np.full(max(before, 0), np.nan),
+                self._values,
+                np.full(max(after, 0), np.nan),
+            ))
+            self._base -= max(before, 0)
+
+    # ---------- Læsning ----------
+
+    def first_hour(self):
+        """Ældste time med data (epoch-sekund), eller None."""
+        present = np.flatnonzero(~np.isnan(self._values))
+        if not len(present):
+            return None
+        return (self._base + int(present[0])) * HOUR
+
+    def first_day(self):
+        """Ældste lokale dag med data."""
+        first = self.first_hour()
+        return local_date(first) if first is not None else None
+
+    def last_day(self):
+        """Seneste lokale dag med data."""
+        if self._high_water is None:
+            return None
+        return local_date(self._high_water)
+
+    def window(self, start_ts, end_ts):
+        """Som _slice, men udfyldt med NaN så hele intervallet er dækket."""
+        length = (end_ts - start_ts) // HOUR
+        window = np.full(length, np.nan)
+        if self._base is None:
+            return window
+        first = start_ts // HOUR - self._base
+        lo, hi = max(first, 0), min(first + length, len(self._values))
+        if lo < hi:
+            window[lo - first:hi - first] = self._values[lo:hi]
+        return window
+
+    def hours_from(self, start_ts):
+        """Timeværdier fra start_ts til og med high-water mark (NaN = mangler)."""
+        if self._high_water is None or start_ts > self._high_water:
+            return np.empty(0)
+        return self.window(start_ts, self._high_water + HOUR)
+
+    @property
+    def dirty(self):
+        """Ældste time ændret siden take_dirty() uden at nulstille, eller None."""
+        return self._dirty_from
+
+    def take_dirty(self):
+        """Ældste time (epoch-sekund) ændret siden sidste kald, eller None."""
+        dirty, self._dirty_from = self._dirty_from, None
+        return dirty
+
+    def day_values(self, day: date):
+        """Timeværdier for et lokalt døgn (NaN for manglende timer)."""
+        return self.window(*day_bounds(day))
+
+    def day_sum(self, day: date, hours=None):
+        """Dagssum i kWh (evt. kun de første `hours` timer), None uden data."""
+        start, end = day_bounds(day)
+        if hours is not None:
+            end = min(end, start + hours * HOUR)
+        return _nansum_or_none(self._slice(start, end))
+
+    def day_sums(self, first_day: date, days: int):
+        """Dagssummer for `days` dage fra first_day (NaN uden data)."""
+        return self._rollup.day_totals(first_day, days)
+
+    def _reduce_days(self, first_day: date, days: int):
+        """(dagssummer, timer med data) for `days` dage fra first_day i ét reduce."""
+        bounds = [
+            int(dt_util.start_of_local_day(first_day + timedelta(days=i)).timestamp()) for i in range(days + 1)
+        ]
+        values = self.window(bounds[0], bounds[-1])
+        offsets = [(b - bounds[0]) // HOUR for b in bounds[:-1]]
+        present = ~np.isnan(values)
+        totals = np.add.reduceat(np.where(present, values, 0.0), offsets)
+        counts = np.add.reduceat(present, offsets)
+        return totals, counts
+
+    def month_sum(self, year: int, month: int) -> float:
+        """Månedssum i kWh for de timer der ligger i lageret."""
+        first = date(year, month, 1)
+        next_month = (first + timedelta(days=32)).replace(day=1)
+        return self._rollup.total(first, next_month) or 0.0
+
+    def series(self, first_day: date, end_day: date, resolution="day"):
+        """
+        Forbrug i kWh for dagene [first_day, end_day) som (starttider, værdier).
+
+        resolution er "hour", "day" eller "month"; starttider er epoch-sekunder
+        for timer og datoer for dage og måneder (første måned starter ved
+        first_day). Værdier er NaN hvor der ikke er data. Dage og måneder
+        kommer fra rollup'en, timer direkte fra arrayet.
+        """
+        if resolution == "hour":
+            start, _ = day_bounds(first_day)
+            end, _ = day_bounds(end_day)
+            return list(range(start, end, HOUR)), self.window(start, end)
+        if resolution == "month":
+            starts = [first_day]
+            month = (first_day.replace(day=1) + timedelta(days=32)).replace(day=1)
+            while month < end_day:
+                starts.append(month)
+                month = (month + timedelta(days=32)).replace(day=1)
+        else:
+            starts = [first_day + timedelta(days=i) for i in range((end_day - first_day).days)]
+        return starts, self._rollup.range_totals(starts + [end_day])
+
+    def is_complete(self, day: date) -> bool:
+        return not np.isnan(self.day_values(day)).any()
+
+    # ---------- Hentevindue ----------
+
+    def fetch_from(self, today: date) -> date:
+        """
+        Første dag der skal hentes.
+
+        Dage inden for backfill-vinduet hentes altid igen, ældre dage kun
+        hvis de mangler timer.
+        """
+        oldest = self.window_start(today)
+        if self._high_water is None:
+            return oldest
+
+        refetch = today - timedelta(days=self._backfill_days)
+        day = oldest
+        while day < refetch:
+            if not self.is_complete(day):
+                return day
+            day += timedelta(days=1)
+        return refetch
+
+    def window_start(self, today: date) -> date:
+        """Ældste dag opdateringen dækker: lookback-vinduet og hele måneden."""
+        return min(today - timedelta(days=self._lookback_days), today.replace(day=1))
+
+    def retain_from(self, today: date) -> date:
+        """Ældste dag der beholdes (opdateringens vindue eller historikken)."""
+        return min(self.window_start(today), today - timedelta(days=self._history_days))
+
+    # ---------- Skrivning ----------
+
+    def merge(self, points, track=True) -> int:
+        """
+        Flet (epoch-sekund, kWh)-par ind og returnér antal ændrede timer.
+
+        Med track=False markeres timerne ikke til take_dirty (indlæsning fra
+        cache og historik, som importeres samlet bagefter).
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if not len(points):
+            return 0
+        hours = (points[:, 0] // HOUR).astype(np.int64)
+        values = points[:, 1]
+        self._ensure(int(hours.min()), int(hours.max()))
+        idx = hours - self._base
+        old = self._values[idx]
+        diff = old != values  # NaN != x tæller som ændret
+        changed = int(np.count_nonzero(diff))
+        self._values[idx] = values
+        if changed:
+            first, last = int(hours[diff].min()) * HOUR, int(hours[diff].max()) * HOUR
+            if track:
+                self.mark_dirty(first)
+            first_day = local_date(first)
+            self._rollup.update(first_day, *self._reduce_days(first_day, (local_date(last) - first_day).days + 1))
+
+        latest = int(hours.max()) * HOUR
+        if self._high_water is None or latest > self._high_water:
+            self._high_water = latest
+        return changed
+
+    def mark_dirty(self, start_ts):
+        """Markér timer fra start_ts som ændrede (se take_dirty)."""
+        if self._dirty_from is None or start_ts < self._dirty_from:
+            self._dirty_from = start_ts
+
+    def prune(self, today: date):
+        """Smid timer ældre end lageret skal dække væk."""
+        if self._base is None:
+            return
+        oldest = self.retain_from(today)
+        self._rollup.prune(oldest)
+        cutoff, _ = day_bounds(oldest)
+        drop = cutoff // HOUR - self._base
+        if drop > 0:
+            self._values = self._values[drop:].copy()
+            self._base += drop
+
+    # ---------- Persistens ----------
+
+    def dump(self, start_ts=None, end_ts=None):
+        """
+        Pak timerne (evt. kun [start_ts, end_ts)) som én sammenhængende kolonne.
+
+        Returnerer starttidspunkt og en base64-kodet float64-array (little
+        endian) med NaN for manglende timer, eller None uden timer.
+        """
+        if self._high_water is None:
+            return None
+        end_ts = self._high_water + HOUR if end_ts is None else min(end_ts, self._high_water + HOUR)
+        first, values = self._range(start_ts, end_ts)
+        if not len(values):
+            return None
+        return {
+            "start": first * HOUR,
+            "values": base64.b64encode(values.astype("<f8").tobytes()).decode("ascii"),
+        }
+
+    def load(self, data):
+        """Indlæs timer pakket med dump()."""
+        if not data:
+            return
+        values = np.frombuffer(base64.b64decode(data["values"]), dtype="<f8").astype(np.float64)
+        present = ~np.isnan(values)
+        if not present.any():
+            return
+        hours = int(data["start"]) // HOUR + np.flatnonzero(present)
+        self.merge(np.column_stack((hours * HOUR, values[present])), track=False)
+
+
+def _nansum_or_none(values):
+    if not len(values) or np.isnan(values).all():
+        return None
+    return float(np.nansum(values))
@@ -1,29 +1,221 @@
 """Simple Elforbrug tariffs handler."""
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
 import logging
-from .pyeloverblik.eloverblik import Eloverblik
+
+import numpy as np
+
+from homeassistant.util import dt as dt_util
+
+from .api import API_ERRORS, NOT_MODIFIED
+from .const import TARIFF_REFRESH_INTERVAL
+from .store import HOUR, day_bounds
 
 _LOGGER = logging.getLogger(__name__)
 
+
+def parse_charges(json_response):
+    """
+    Udpak tariffer fra et getcharges-svar.
+
+    Dagstariffer (P1D) bliver til én pris, timetariffer (PT1H) til en liste
+    sorteret efter position. Navne gøres små og med "_" i stedet for mellemrum.
+    """
+    results = json_response.get("result") or []
+    if not results or "tariffs" not in (results[0].get("result") or {}):
+        return None
+
+    charges = {}
+    for tariff in results[0]["result"]["tariffs"]:
+        name = tariff["name"].lower().replace(" ", "_")
+        prices = sorted(tariff.get("prices") or [], key=lambda p: int(p["position"]))
+        if tariff.get("periodType") == "P1D":
+            charges[name] = prices[0]["price"] if prices else None
+        elif tariff.get("periodType") == "PT1H":
+            charges[name] = [p["price"] for p in prices]
+        else:
+            _LOGGER.debug("Ukendt periodType for tarif %s: %s", name, tariff.get("periodType"))
+    return charges
+
+
+def _valid_date(value, default):
+    if not value:
+        return default
+    return datetime.fromisoformat(value.replace("Z", "")).date()
+
+
+def _tariff_rows(json_response):
+    results = json_response.get("result") or []
+    if not results:
+        return []
+    return (results[0].get("result") or {}).get("tariffs") or []
+
+
+def _hour_slots(day: date):
+    """Time-på-døgnet (0-23) for hver time i et lokalt døgn; tager højde for sommertid."""
+    start, end = day_bounds(day)
+    if end - start == 24 * HOUR:
+        return _FULL_DAY
+    return np.array([
+        dt_util.as_local(dt_util.utc_from_timestamp(ts)).hour for ts in range(start, end, HOUR)
+    ])
+
+
+_FULL_DAY = np.arange(24)
+
+
+class TariffSchedule:
+    """
+    Tariffer som 24 timepriser (kr/kWh) pr. gyldighedsperiode.
+
+    Alle tariffer der gælder samtidig lægges sammen, så prisen for en given
+    time er et opslag: find perioden (få elementer) og tag timens plads.
+    """
+
+    def __init__(self, starts, prices):
+        self._starts = starts    # sorteret liste af periodernes første dag
+        self._prices = prices    # ndarray (perioder, 24); NaN hvor intet gælder
+
+    @classmethod
+    def from_charges(cls, json_response):
+        tariffs = []
+        for tariff in _tariff_rows(json_response):
+            prices = [p["price"] for p in sorted(tariff.get("prices") or [], key=lambda p: int(p["position"]))]
+            if not prices or tariff.get("periodType") not in ("P1D", "PT1H"):
+                continue
+            tariffs.append((
+                _valid_date(tariff.get("validFromDate"), date.min),
+                _valid_date(tariff.get("validToDate"), date.max),
+                np.resize(np.asarray(prices, dtype=np.float64), 24),
+            ))
+        if not tariffs:
+            return None
+
+        starts = sorted({d for valid_from, valid_to, _ in tariffs for d in (valid_from, valid_to)})
+        prices = np.full((len(starts), 24), np.nan)
+        for i, start in enumerate(starts):
+            active = [p for valid_from, valid_to, p in tariffs if valid_from <= start < valid_to]
+            if active:
+                prices[i] = np.sum(active, axis=0)
+        return cls(starts, prices)
+
+    def next_change(self, day: date):
+        """Første dag efter `day` hvor en gyldighedsperiode starter eller slutter."""
+        i = bisect_right(self._starts, day)
+        if i == len(self._starts) or self._starts[i] == date.max:
+            return None
+        return self._starts[i]
+
+    def day_prices(self, day: date):
+        """De 24 timepriser der gælder på en dag (NaN uden gyldig tarif)."""
+        i = bisect_right(self._starts, day) - 1
+        if i < 0:
+            return np.full(24, np.nan)
+        return self._prices[i]
+
+    def price_at(self, when: datetime):
+        """Samlet tarif for timen `when` (lokal tid)."""
+        local = dt_util.as_local(when)
+        price = self.day_prices(local.date())[local.hour]
+        return None if np.isnan(price) else float(price)
+
+    def hourly_prices(self, first_day: date, days: int):
+        """Timepriser for `days` lokale døgn, justeret til HourlyStore.window."""
+        return np.concatenate([
+            self.day_prices(day)[_hour_slots(day)]
+            for day in (first_day + timedelta(days=i) for i in range(days))
+        ])
+
+
 class HassTariff:
-    """Wrapper til at hente og gemme tariffer fra Eloverblik."""
+    """
+    Wrapper til at hente og gemme tariffer fra Eloverblik.
 
-    def __init__(self, refresh_token: str, metering_point: str):
-        self._client = Eloverblik(refresh_token)
+    Tariffer ændrer sig sjældent og på kendte datoer, så de hentes kun når
+    det seneste svar er mere end TARIFF_REFRESH_INTERVAL gammelt, eller når en
+    gyldighedsperiode starter/slutter. Kaldet sendes betinget (ETag /
+    Last-Modified), og svaret gemmes i en TariffCache.
+    """
+
+    def __init__(self, client, metering_point: str):
+        self._client = client
         self._metering_point = metering_point
         self._charges = None
+        self._schedule = None
+        self._response = None      # seneste rå getcharges-svar
+        self._fetched = None       # hvornår _response blev hentet (UTC)
+        self._validators = {}      # ETag / Last-Modified fra seneste svar
+        self._revision = 0         # tælles op hver gang nye tariffer anvendes
+        self.cache = None          # TariffCache, sættes i async_setup_entry
+
+    def _apply(self, json_response):
+        charges = parse_charges(json_response)
+        if charges is None:
+            return False
+        self._response = json_response
+        self._charges = charges
+        self._schedule = TariffSchedule.from_charges(json_response)
+        self._revision += 1
+        return True
+
+    def fingerprint(self):
+        """Ændres kun når der er kommet nye tariffer (ikke ved 304)."""
+        return self._revision
+
+    def next_refresh(self):
+        """Tidspunkt (UTC) hvor tarifferne skal hentes igen (None: hent nu)."""
+        if self._fetched is None or self._charges is None:
+            return None
+        due = self._fetched + TARIFF_REFRESH_INTERVAL
+        if self._schedule is not None:
+            change = self._schedule.next_change(dt_util.as_local(self._fetched).date())
+            if change is not None:
+                change_start = dt_util.utc_from_timestamp(day_bounds(change)[0])
+                due = min(due, change_start)
+        return due
 
-    def update_tariff(self):
-        """Hent tariffer fra Eloverblik API."""
+    async def async_update_tariff(self):
+        """Hent tariffer fra Eloverblik API hvis de gemte ikke længere er aktuelle."""
+        due = self.next_refresh()
+        if due is not None and dt_util.utcnow() < due:
+            return
         try:
-            charges = self._client.get_tariffs(self._metering_point)
-            if charges.status == 200:
-                self._charges = charges.charges or {}
+            validators = dict(self._validators) if self._charges is not None else {}
+            json_response = await self._client.async_get_charges(self._metering_point, validators)
+            if json_response is NOT_MODIFIED:
+                _LOGGER.debug("Tariffer uændrede for %s", self._metering_point)
+            elif self._apply(json_response):
+                self._validators = {k: v for k, v in validators.items() if v}
                 _LOGGER.debug("Tariffer hentet: %s", self._charges)
             else:
-                _LOGGER.warning("Kunne ikke hente tariffer: %s", charges.detailed_status)
+                _LOGGER.warning("Kunne ikke hente tariffer: svaret indeholdt ingen tariffer")
+                return
+            self._fetched = dt_util.utcnow()
+            if self.cache is not None:
+                self.cache.schedule_save()
+        except API_ERRORS as e:
+            _LOGGER.warning("Kunne ikke hente tariffer: %s", e)
         except Exception as e:
             _LOGGER.exception("Fejl ved hentning af tariffer: %s", e)
 
+    # ---------- Cache ----------
+
+    def snapshot(self):
+        """Data til TariffCache."""
+        return {
+            "response": self._response,
+            "fetched": self._fetched.isoformat() if self._fetched else None,
+            "validators": self._validators,
+        }
+
+    def restore(self, data):
+        """Indlæs data fra TariffCache."""
+        if not data.get("response") or not self._apply(data["response"]):
+            return
+        fetched = data.get("fetched")
+        self._fetched = dt_util.parse_datetime(fetched) if fetched else None
+        self._validators = data.get("validators") or {}
+
     def get_today_tariff(self):
         """
         Returnér den samlede pris for i dag:
@@ -52,4 +244,33 @@ class HassTariff:
                 out["Tariff i dag"] = val
             else:
                 out[key] = val
-        return out
\ No newline at end of file
+        return out
+
+    def get_today_prices(self):
+        """Samlede timepriser (kr/kWh) for i dag."""
+        if self._schedule is None:
+            return None
+        return [round(float(p), 4) for p in self._schedule.day_prices(dt_util.now().date())]
+
+    def get_costs(self, store, day: date):
+        """
+        Pris for forbruget (kr) beregnet i ét vektoriseret gennemløb.
+
+        Timeforbruget fra måneden til og med `day` ganges med timepriserne;
+        returnerer timepriser for `day` samt dags- og månedssum.
+        """
+        if self._schedule is None or day is None:
+            return None
+        first = day.replace(day=1)
+        days = (day - first).days + 1
+        start, _ = day_bounds(first)
+        _, end = day_bounds(day)
+        cost = store.window(start, end) * self._schedule.hourly_prices(first, days)
+
+        day_start, _ = day_bounds(day)
+        day_cost = cost[(day_start - start) // HOUR:]
+        return {
+            "hourly": [None if np.isnan(c) else round(float(c), 3) for c in day_cost],
+            "day": round(float(np.nansum(day_cost)), 3),
+            "month": round(float(np.nansum(cost)), 3),
+        }
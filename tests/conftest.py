@@ -0,0 +1,79 @@
+"""Fælles opsætning for tests: dansk tidszone, Eloverblik-stubben og en falsk recorder."""
+from contextlib import asynccontextmanager
+
+import aiohttp
+from aiohttp.test_utils import TestServer
+import pytest
+
+from homeassistant.util import dt as dt_util
+
+from benchmarks.stub import BASE_PATH, EloverblikStub
+from custom_components.simple_elforbrug import energy_statistics
+from custom_components.simple_elforbrug.api import EloverblikApiClient, TokenManager
+
+
+@pytest.fixture(autouse=True)
+def danish_time():
+    dt_util.set_default_time_zone(dt_util.get_time_zone("Europe/Copenhagen"))
+    yield
+    dt_util.set_default_time_zone(dt_util.UTC)
+
+
+@asynccontextmanager
+async def stub_client():
+    """(stub, TokenManager, EloverblikApiClient) mod en lokal Eloverblik-stub."""
+    stub = EloverblikStub()
+    server = TestServer(stub.app())
+    await server.start_server()
+    base_url = str(server.make_url(BASE_PATH))
+    try:
+        async with aiohttp.ClientSession() as session:
+            tokens = TokenManager(session, "refresh-token", base_url)
+            yield stub, tokens, EloverblikApiClient(session, tokens, base_url)
+    finally:
+        await server.close()
+
+
+@pytest.fixture
+def stub():
+    return stub_client
+
+
+class FakeRecorder:
+    """Gemmer importerede statistikker (én statistik); de første `fail` kald fejler."""
+
+    def __init__(self):
+        self.rows = {}     # epoch-sekund -> sum
+        self.batches = []  # antal timer pr. import
+        self.fail = 0
+
+    async def async_add_executor_job(self, func, *args):
+        return func(*args)
+
+    def add(self, _hass, metadata, statistics):
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("recorder")
+        self.batches.append(len(statistics))
+        for row in statistics:
+            self.rows[int(row["start"].timestamp())] = row["sum"]
+
+    def _result(self, statistic_id, starts):
+        return {statistic_id: [{"start": ts, "sum": self.rows[ts]} for ts in starts]}
+
+    def last(self, _hass, _count, statistic_id, *_args):
+        return self._result(statistic_id, sorted(self.rows)[-1:])
+
+    def during(self, _hass, start, end, statistic_ids, *_args):
+        start, end = start.timestamp(), end.timestamp()
+        return self._result(next(iter(statistic_ids)), [ts for ts in sorted(self.rows) if start <= ts < end])
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    recorder = FakeRecorder()
+    monkeypatch.setattr(energy_statistics, "get_instance", lambda hass: recorder)
+    monkeypatch.setattr(energy_statistics, "async_add_external_statistics", recorder.add)
+    monkeypatch.setattr(energy_statistics, "get_last_statistics", recorder.last)
+    monkeypatch.setattr(energy_statistics, "statistics_during_period", recorder.during)
+    return recorder
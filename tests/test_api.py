@@ -0,0 +1,102 @@
+"""EloverblikApiClient og TokenManager mod den lokale stub."""
+import asyncio
+from datetime import date
+
+import pytest
+
+from benchmarks import fixtures
+from custom_components.simple_elforbrug import api
+from custom_components.simple_elforbrug.api import (
+    EloverblikAuthError,
+    EloverblikThrottleError,
+)
+from custom_components.simple_elforbrug.store import day_bounds
+
+FROM, TO = date(2024, 1, 1), date(2024, 1, 3)
+
+
+def test_token_is_reused(stub):
+    async def scenario():
+        async with stub() as (server, tokens, client):
+            await asyncio.gather(*[
+                client.async_get_time_series_points(["571313000000000001"], FROM, TO) for _ in range(3)
+            ])
+            await client.async_get_charges("571313000000000001")
+            return server, tokens
+
+    server, tokens = asyncio.run(scenario())
+    assert tokens.exchanges == 1
+    assert server.requests["token"] == 1
+    assert server.requests["time_series"] == 3
+
+
+def test_rejected_token_is_renewed_once(stub):
+    async def scenario():
+        async with stub() as (server, tokens, client):
+            await tokens.async_get_token()
+            server.fail("time_series", 401)
+            points = await client.async_get_time_series_points(["571313000000000001"], FROM, TO)
+            return server, tokens, points
+
+    server, tokens, points = asyncio.run(scenario())
+    assert tokens.exchanges == 2
+    assert server.requests["time_series"] == 2
+    assert len(points["571313000000000001"]) == 48
+
+
+def test_refresh_token_rejected(stub):
+    async def scenario():
+        async with stub() as (server, tokens, client):
+            server.fail("token", 401, times=2)
+            with pytest.raises(EloverblikAuthError):
+                await client.async_get_charges("571313000000000001")
+            # Eloverblik svarede: afvisningen åbner ikke breakeren
+            return tokens.breaker("token").state
+
+    assert asyncio.run(scenario()) == "closed"
+
+
+def test_throttle_is_not_retried(stub):
+    async def scenario():
+        async with stub() as (server, tokens, client):
+            server.fail("time_series", 429, headers={"Retry-After": "120"})
+            with pytest.raises(EloverblikThrottleError) as err:
+                await client.async_get_time_series_points(["571313000000000001"], FROM, TO)
+            return server, err.value
+
+    server, err = asyncio.run(scenario())
+    assert err.status == 429
+    assert err.retry_after == 120
+    assert server.requests["time_series"] == 1
+
+
+@pytest.mark.parametrize("stream_min_size", [0, api.STREAM_MIN_SIZE])
+def test_streamed_points_are_split_per_meter(stub, monkeypatch, stream_min_size):
+    """Både streamet (stort svar) og decodet i ét stykke (lille svar)."""
+    monkeypatch.setattr(api, "STREAM_MIN_SIZE", stream_min_size)
+    metering_points = fixtures.metering_points(3)
+
+    async def scenario():
+        async with stub() as (_, _tokens, client):
+            return await client.async_get_time_series_points(metering_points, FROM, TO)
+
+    points = asyncio.run(scenario())
+    start, _ = day_bounds(FROM)
+    end, _ = day_bounds(TO)
+    assert sorted(points) == metering_points
+    for metering_point, values in points.items():
+        assert values.shape == (48, 2)
+        assert values[:, 0].min() == start
+        assert values[:, 0].max() == end - 3600
+    # Hvert målepunkt har sine egne (deterministiske) værdier
+    assert not (points[metering_points[0]][:, 1] == points[metering_points[1]][:, 1]).all()
+
+
+def test_per_month(stub):
+    async def scenario():
+        async with stub() as (_, _tokens, client):
+            return await client.async_get_per_month("571313000000000001", 2023)
+
+    months = asyncio.run(scenario())
+    assert len(months) == 12
+    assert all(150 <= value <= 600 for value in months)
@@ -0,0 +1,93 @@
+"""BatchingClient mod den lokale stub."""
+import asyncio
+from datetime import date
+import time
+
+from types import SimpleNamespace
+
+from benchmarks import fixtures
+from custom_components.simple_elforbrug import batch
+from custom_components.simple_elforbrug.batch import (
+    BatchingClient,
+    get_batching_client,
+    release_batching_client,
+)
+from custom_components.simple_elforbrug.const import CLIENT_AIOHTTP, CLIENT_PYELOVERBLIK, DATA_BATCHERS
+
+FROM, TO = date(2024, 1, 1), date(2024, 1, 3)
+
+
+def test_batching_sends_one_request(stub):
+    metering_points = fixtures.metering_points(3)
+
+    async def scenario():
+        async with stub() as (server, _tokens, client):
+            batcher = BatchingClient(client, window=0.01)
+            batcher.users = len(metering_points)
+            results = await asyncio.gather(*[
+                batcher.async_get_time_series_points([mp], FROM, TO) for mp in metering_points
+            ])
+            return server, results
+
+    server, results = asyncio.run(scenario())
+    assert server.requests["time_series"] == 1
+    for metering_point, result in zip(metering_points, results):
+        assert list(result) == [metering_point]
+        assert len(result[metering_point]) == 48
+
+
+def test_batching_cancelled_caller_does_not_cancel_others(stub):
+    metering_points = fixtures.metering_points(3)
+
+    async def scenario():
+        async with stub() as (server, _tokens, client):
+            batcher = BatchingClient(client, window=0.05)
+            batcher.users = len(metering_points)
+            tasks = [
+                asyncio.create_task(batcher.async_get_time_series_points([mp], FROM, TO))
+                for mp in metering_points
+            ]
+            await asyncio.sleep(0.01)
+            tasks[0].cancel()  # den første kalder starter hentningen
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            return server, results
+
+    server, results = asyncio.run(scenario())
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert [list(r) for r in results[1:]] == [[mp] for mp in metering_points[1:]]
+    assert server.requests["time_series"] == 1
+
+
+def test_single_user_skips_window(stub):
+    metering_point = fixtures.metering_points(1)[0]
+
+    async def scenario():
+        async with stub() as (server, _tokens, client):
+            batcher = BatchingClient(client, window=10)
+            batcher.users = 1
+            start = time.monotonic()
+            result = await batcher.async_get_time_series_points([metering_point], FROM, TO)
+            return server, result, time.monotonic() - start
+
+    server, result, elapsed = asyncio.run(scenario())
+    assert elapsed < 5
+    assert len(result[metering_point]) == 48
+    assert server.requests["time_series"] == 1
+
+
+def test_batching_client_is_shared_per_token_and_kind(monkeypatch):
+    monkeypatch.setattr(batch, "create_client", lambda hass, token, kind: SimpleNamespace(kind=kind))
+    hass = SimpleNamespace(data={})
+
+    first = get_batching_client(hass, "token", CLIENT_AIOHTTP)
+    assert get_batching_client(hass, "token", CLIENT_AIOHTTP) is first
+    other = get_batching_client(hass, "token", CLIENT_PYELOVERBLIK)
+    assert other is not first
+    assert (first.users, other.users) == (2, 1)
+
+    release_batching_client(hass, "token", CLIENT_AIOHTTP)
+    assert hass.data[DATA_BATCHERS][("token", CLIENT_AIOHTTP)] is first
+    release_batching_client(hass, "token", CLIENT_AIOHTTP)
+    release_batching_client(hass, "token", CLIENT_PYELOVERBLIK)
+    assert hass.data[DATA_BATCHERS] == {}
+    release_batching_client(hass, "token", CLIENT_AIOHTTP)  # allerede fjernet
@@ -0,0 +1,17 @@
+"""Konfigurationsskemaet."""
+import pytest
+import voluptuous as vol
+
+from custom_components.simple_elforbrug.const import CLIENT_AIOHTTP, CLIENT_PYELOVERBLIK, CONF_CLIENT, DATA_SCHEMA
+
+INPUT = {"refresh_token": "token", "metering_point": "571313000000000001", "unit_of_measurement": "kWh"}
+
+
+def test_client_defaults_to_aiohttp():
+    assert DATA_SCHEMA(INPUT)[CONF_CLIENT] == CLIENT_AIOHTTP
+
+
+def test_client_can_be_chosen():
+    assert DATA_SCHEMA({**INPUT, CONF_CLIENT: CLIENT_PYELOVERBLIK})[CONF_CLIENT] == CLIENT_PYELOVERBLIK
+    with pytest.raises(vol.Invalid):
+        DATA_SCHEMA({**INPUT, CONF_CLIENT: "curl"})
@@ -0,0 +1,62 @@
+"""StatisticsImporter mod en falsk recorder (se conftest)."""
+import asyncio
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.simple_elforbrug.energy_statistics import StatisticsImporter
+from custom_components.simple_elforbrug.store import HOUR, HourlyStore, day_bounds
+
+METERING_POINT = "571313000000000001"
+DAY = date(2024, 6, 19)
+
+
+def _day(day, value):
+    start, end = day_bounds(day)
+    hours = np.arange(start, end, HOUR)
+    return np.column_stack((hours, np.full(len(hours), value)))
+
+
+def test_import_resumes_and_reimports_corrections(recorder):
+    store = HourlyStore()
+    importer = StatisticsImporter(SimpleNamespace(), METERING_POINT)
+    store.merge(_day(DAY - timedelta(days=1), 1.0))
+
+    assert asyncio.run(importer.async_import(store)) == 24
+    last = day_bounds(DAY)[0] - HOUR
+    assert recorder.rows[last] == 24.0
+
+    # Kun nye timer importeres
+    store.merge(_day(DAY, 2.0))
+    assert asyncio.run(importer.async_import(store)) == 24
+    assert recorder.rows[last + 24 * HOUR] == 72.0
+
+    # En rettet time importeres igen med den løbende sum videre fra timen før
+    corrected = _day(DAY, 2.0)[:1]
+    corrected[0, 1] = 5.0
+    store.merge(corrected)
+    assert asyncio.run(importer.async_import(store)) == 24
+    assert recorder.rows[last + HOUR] == 29.0
+    assert recorder.rows[last + 24 * HOUR] == 75.0
+    assert asyncio.run(importer.async_import(store)) == 0
+
+
+def test_failed_import_keeps_hours_dirty(recorder):
+    store = HourlyStore()
+    importer = StatisticsImporter(SimpleNamespace(), METERING_POINT)
+    store.merge(_day(DAY - timedelta(days=1), 1.0))
+    asyncio.run(importer.async_import(store))
+
+    store.merge(_day(DAY - timedelta(days=1), 3.0))
+    recorder.fail = 1
+    with pytest.raises(RuntimeError):
+        asyncio.run(importer.async_import(store))
+
+    # Næste opdatering importerer de samme timer igen
+    assert asyncio.run(importer.async_import(store)) == 24
+    assert recorder.rows[day_bounds(DAY)[0] - HOUR] == 72.0
+    assert dt_util.utc_from_timestamp(min(recorder.rows)).hour == 22  # 00:00 dansk sommertid
@@ -0,0 +1,112 @@
+"""HistoryBackfill: hentning bagud og import af historikken i bidder."""
+import asyncio
+from datetime import timedelta
+import math
+from types import SimpleNamespace
+
+import numpy as np
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.simple_elforbrug import HassEloverblik, history as history_module
+from custom_components.simple_elforbrug.const import IMPORT_CHUNK_HOURS
+from custom_components.simple_elforbrug.energy_statistics import StatisticsImporter
+from custom_components.simple_elforbrug.history import HistoryBackfill
+from custom_components.simple_elforbrug.store import HOUR, day_bounds
+
+METERING_POINT = "571313000000000001"
+
+
+def _points(first, last):
+    """Timer fra og med dag `first` til (ikke med) dag `last` med forskellige værdier."""
+    hours = np.arange(day_bounds(first)[0], day_bounds(last)[0], HOUR)
+    return np.column_stack((hours, (hours // HOUR % 7 + 1) / 10))
+
+
+def _backfill(client=None):
+    energy = HassEloverblik(client, METERING_POINT, "kWh")
+    history = HistoryBackfill(energy)
+    history.statistics = StatisticsImporter(SimpleNamespace(), METERING_POINT)
+    return energy, history
+
+
+def _fetched(energy, history, today, days):
+    """Som efter hentningen: de seneste 10 dage importeret, `days` dage historik flettet ind."""
+    energy.store.merge(_points(today - timedelta(days=10), today))
+    asyncio.run(history.statistics.async_import(energy.store))
+    energy.store.merge(_points(today - timedelta(days=days), today - timedelta(days=10)), track=False)
+    history._finish()  # pylint: disable=protected-access
+
+
+def _assert_sums(recorder, energy):
+    values = energy.store.hours_from(energy.store.first_hour())
+    starts = sorted(recorder.rows)
+    assert starts[0] == energy.store.first_hour()
+    assert len(starts) == len(values)
+    np.testing.assert_allclose([recorder.rows[ts] for ts in starts], np.cumsum(values))
+
+
+def test_catch_up_imports_in_chunks(recorder):
+    today = dt_util.now().date()
+    energy, history = _backfill()
+    _fetched(energy, history, today, 100)
+    hours = len(energy.store.hours_from(energy.store.first_hour()))
+    recorder.batches.clear()
+
+    steps = 0
+    while not history.as_dict()["caught_up"]:
+        asyncio.run(history._async_catch_up())  # pylint: disable=protected-access
+        steps += 1
+    assert steps == math.ceil(hours / IMPORT_CHUNK_HOURS)
+    assert max(recorder.batches) <= IMPORT_CHUNK_HOURS
+    assert sum(recorder.batches) == hours
+    _assert_sums(recorder, energy)
+    # Detektorens sidste bid tages af koordinatoren
+    assert 0 < energy.detector.pending(energy.store) <= IMPORT_CHUNK_HOURS
+    assert history.as_dict()["import"] is None
+
+
+def test_catch_up_resumes_from_checkpoint(recorder):
+    today = dt_util.now().date()
+    energy, history = _backfill()
+    _fetched(energy, history, today, 100)
+    asyncio.run(history._async_catch_up())  # pylint: disable=protected-access
+    checkpoint = history.snapshot()
+    assert checkpoint["import"] == energy.store.first_hour() + IMPORT_CHUNK_HOURS * HOUR
+    assert not checkpoint["caught_up"]
+
+    # Genstart: lageret fra cachen (uden markering) og checkpointet
+    restarted = HassEloverblik(None, METERING_POINT, "kWh")
+    restarted.restore(energy.snapshot())
+    assert restarted.store.dirty is None
+    history = HistoryBackfill(restarted)
+    history.statistics = StatisticsImporter(SimpleNamespace(), METERING_POINT)
+    history.restore(checkpoint)
+    assert restarted.store.dirty == checkpoint["import"]
+
+    while not history.as_dict()["caught_up"]:
+        asyncio.run(history._async_catch_up())  # pylint: disable=protected-access
+    _assert_sums(recorder, restarted)
+
+
+def test_run_fetches_then_imports(recorder, monkeypatch):
+    monkeypatch.setattr(history_module, "HISTORY_START_DELAY", 0)
+    monkeypatch.setattr(history_module, "HISTORY_PAUSE", 0)
+    today = dt_util.now().date()
+    data = _points(today - timedelta(days=120), today)
+    calls = []
+
+    async def async_get_history(metering_point, from_date, to_date):
+        calls.append((from_date, to_date))
+        start, end = day_bounds(from_date)[0], day_bounds(to_date)[0]
+        return data[(data[:, 0] >= start) & (data[:, 0] < end)]
+
+    energy, history = _backfill(SimpleNamespace(async_get_history=async_get_history))
+    energy.store.merge(data[data[:, 0] >= day_bounds(today - timedelta(days=10))[0]])
+    asyncio.run(history.async_run())
+
+    state = history.as_dict()
+    assert state["done"] and state["caught_up"]
+    assert energy.store.first_day() == today - timedelta(days=120)
+    assert calls[0][1] == today - timedelta(days=10)
+    _assert_sums(recorder, energy)
@@ -0,0 +1,142 @@
+"""JsonEventParser og TimeSeriesStreamParser fodret i vilkårlige bidder."""
+from datetime import date, datetime
+import json
+
+import numpy as np
+import pytest
+
+from benchmarks import fixtures
+from custom_components.simple_elforbrug.parser import (
+    JsonEventParser,
+    TimeSeriesStreamParser,
+    monthly_values,
+    parse_time_series_stream,
+)
+
+DOCUMENT = (
+    '{"a": [1, -2.5e3, true, null], "b": {"c": "x\\"y\\u00e6", "d": []},'
+    ' "æøå": "blå", "e": [{"f": "1"}, {"f": "2"}], "g": 12345}'
+)
+EXPECTED = [
+    (("a", "item"), "1"),
+    (("a", "item"), "-2.5e3"),
+    (("a", "item"), "true"),
+    (("a", "item"), "null"),
+    (("b", "c"), 'x"yæ'),
+    (("æøå",), "blå"),
+    (("e", "item", "f"), "1"),
+    (("e", "item", "f"), "2"),
+    (("g",), "12345"),
+]
+
+
+def _expected_points(document):
+    """Punkterne i et GetTimeSeries-dokument, udregnet direkte fra dict'en."""
+    points = []
+    for result in document["result"]:
+        for time_series in result["MyEnergyData_MarketDocument"]["TimeSeries"]:
+            for period in time_series["Period"]:
+                start = datetime.strptime(period["timeInterval"]["start"], "%Y-%m-%dT%H:%M:%S%z").timestamp()
+                points += [
+                    (start + (int(p["position"]) - 1) * 3600, float(p["out_Quantity.quantity"]))
+                    for p in period["Point"]
+                ]
+    return points
+
+
+def _events(chunks):
+    events = []
+    parser = JsonEventParser(lambda path, value: events.append((tuple(path), value)))
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.feed(b"", final=True)
+    return events
+
+
+def test_whole_document():
+    assert _events([DOCUMENT.encode()]) == EXPECTED
+
+
+def test_every_split_point():
+    """Bidgrænser midt i strenge, tal, escapes og multibyte-tegn."""
+    body = DOCUMENT.encode()
+    for i in range(1, len(body)):
+        assert _events([body[:i], body[i:]]) == EXPECTED, i
+
+
+def test_byte_by_byte():
+    body = DOCUMENT.encode()
+    assert _events([body[i:i + 1] for i in range(len(body))]) == EXPECTED
+
+
+def test_text_chunks():
+    assert _events([DOCUMENT[:17], DOCUMENT[17:]]) == EXPECTED
+
+
+def test_number_at_end_needs_final():
+    events = []
+    parser = JsonEventParser(lambda path, value: events.append(value))
+    parser.feed(b"[12")
+    parser.feed(b"34")
+    assert events == []
+    parser.feed(b"", final=True)
+    assert events == ["1234"]
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 64, 4096])
+def test_time_series_matches_dict_parser(chunk):
+    """Streaming-parseren giver de samme punkter som dokumentet, også over sommertid."""
+    metering_points = fixtures.metering_points(2)
+    body = fixtures.time_series(metering_points, date(2024, 3, 30), date(2024, 4, 1)).encode()
+
+    parser = TimeSeriesStreamParser()
+    for i in range(0, len(body), chunk):
+        parser.feed(body[i:i + chunk])
+    parser.feed(b"", final=True)
+    points = parser.points()
+
+    expected = _expected_points(json.loads(body))
+    assert sorted(points) == metering_points
+    assert len(points[metering_points[0]]) == 47  # 24 + 23 timer
+    streamed = np.concatenate([points[mp] for mp in metering_points])
+    np.testing.assert_array_equal(streamed, np.array(expected))
+
+
+def test_load_matches_stream():
+    metering_points = fixtures.metering_points(2)
+    body = fixtures.time_series(metering_points, date(2024, 3, 30), date(2024, 4, 1))
+    streamed = parse_time_series_stream(body)
+    parser = TimeSeriesStreamParser()
+    parser.load(json.loads(body))
+    loaded = parser.points()
+    assert sorted(loaded) == metering_points
+    for metering_point in metering_points:
+        np.testing.assert_array_equal(loaded[metering_point], streamed[metering_point])
+    small = parse_time_series_stream(body, stream_min_size=len(body) + 1)
+    np.testing.assert_array_equal(small[metering_points[0]], streamed[metering_points[0]])
+
+
+def test_monthly_values_in_time_order():
+    body = fixtures.per_month(["571313000000000001"], 2023, 12)
+    points = parse_time_series_stream(body)["571313000000000001"]
+    values = monthly_values(points[::-1])
+    assert values == monthly_values(points)
+    assert len(values) == 12
+    assert monthly_values(None) == []
+
+
+def test_known_points_across_dst():
+    """Et lille dokument med kendte værdier: 31. marts 2024 har 23 timer i dansk tid."""
+    body = json.dumps({"result": [{"MyEnergyData_MarketDocument": {"TimeSeries": [{
+        "mRID": "571313000000000001",
+        "Period": [{
+            "timeInterval": {"start": "2024-03-30T23:00:00Z", "end": "2024-03-31T22:00:00Z"},
+            "Point": [
+                {"position": str(i), "out_Quantity.quantity": f"{i / 10:.3f}"} for i in range(1, 24)
+            ],
+        }],
+    }]}}]})
+    points = parse_time_series_stream(body)["571313000000000001"]
+    assert points.shape == (23, 2)
+    assert points[0].tolist() == [1711839600.0, 0.1]   # 31. marts kl. 00 dansk tid
+    assert points[-1].tolist() == [1711918800.0, 2.3]  # 31. marts kl. 23 dansk tid
@@ -0,0 +1,122 @@
+"""CircuitBreaker og TokenManager.async_call."""
+import asyncio
+from datetime import date
+
+import pytest
+
+from custom_components.simple_elforbrug.api import (
+    EloverblikApiError,
+    EloverblikThrottleError,
+    EloverblikUnavailableError,
+    TokenManager,
+)
+from custom_components.simple_elforbrug.resilience import CircuitBreaker
+
+
+def _expire(breaker):
+    """Lad pausen løbe ud uden at vente."""
+    breaker._opened -= breaker._reset + 1  # pylint: disable=protected-access
+
+
+def test_opens_after_threshold():
+    breaker = CircuitBreaker("test", threshold=3, reset=60)
+    for _ in range(2):
+        breaker.failure()
+        assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert 0 < breaker.retry_in() <= 60
+    assert breaker.trips == 1
+
+
+def test_half_open_allows_one_trial():
+    breaker = CircuitBreaker("test", threshold=1, reset=60, max_reset=100)
+    breaker.failure()
+    _expire(breaker)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # kun ét prøvekald ad gangen
+
+    breaker.failure()  # prøvekaldet fejlede: dobbelt pause, højst max_reset
+    assert breaker.state == "open"
+    assert 60 < breaker.retry_in() <= 100
+    _expire(breaker)
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_release_frees_the_trial():
+    breaker = CircuitBreaker("test", threshold=1, reset=60)
+    breaker.failure()
+    _expire(breaker)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def test_async_call_counts_only_transient_errors():
+    tokens = TokenManager(None, "refresh-token")
+
+    async def fail(err):
+        raise err
+
+    async def scenario():
+        for _ in range(5):
+            with pytest.raises(EloverblikApiError):
+                await tokens.async_call("charges", lambda: fail(EloverblikApiError(400)))
+        assert tokens.breaker("charges").state == "closed"
+        for _ in range(3):
+            with pytest.raises(EloverblikThrottleError):
+                await tokens.async_call("charges", lambda: fail(EloverblikThrottleError(429)))
+        with pytest.raises(EloverblikUnavailableError):
+            await tokens.async_call("charges", lambda: fail(AssertionError("ikke sendt")))
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_trial_does_not_block_the_breaker():
+    """Afbrydes prøvekaldet (fx ved unload), skal næste kald stadig kunne prøve, også for token-kaldet indeni."""
+    tokens = TokenManager(None, "refresh-token")
+    for endpoint in ("token", "time_series"):
+        breaker = tokens.breaker(endpoint)
+        breaker.failure(), breaker.failure(), breaker.failure()
+        _expire(breaker)
+
+    async def token_call():
+        await asyncio.sleep(10)
+
+    async def data_call():
+        return await tokens.async_call("token", token_call)
+
+    async def scenario():
+        task = asyncio.create_task(tokens.async_call("time_series", data_call))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert await tokens.async_call("time_series", lambda: asyncio.sleep(0, "ok")) == "ok"
+
+    asyncio.run(scenario())
+    assert tokens.breaker("time_series").state == "closed"
+    assert tokens.breaker("token").state == "half_open"
+    assert tokens.breaker("token").allow()
+
+
+def test_open_breaker_skips_the_request(stub):
+    async def scenario():
+        async with stub() as (server, tokens, client):
+            server.fail("time_series", 503, times=3)
+            for _ in range(3):
+                with pytest.raises(EloverblikThrottleError):
+                    await client.async_get_time_series_points(["571313000000000001"], date(2024, 1, 1), date(2024, 1, 3))
+            with pytest.raises(EloverblikUnavailableError):
+                await client.async_get_time_series_points(["571313000000000001"], date(2024, 1, 1), date(2024, 1, 3))
+            return server, tokens
+
+    server, tokens = asyncio.run(scenario())
+    assert tokens.breaker("time_series").state == "open"
+    assert server.requests["time_series"] == 3
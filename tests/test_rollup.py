@@ -0,0 +1,92 @@
+"""DayRollup mod summer regnet direkte over dagene."""
+from datetime import date, timedelta
+
+import numpy as np
+
+from custom_components.simple_elforbrug.rollup import DayRollup
+
+FIRST = date(2024, 1, 1)
+
+
+def _check(rollup, totals, hours, first=FIRST):
+    """Sammenlign alle intervaller med brute force over dict'erne totals/hours (dato -> værdi)."""
+    days = [first + timedelta(days=i) for i in range(-3, 50)]
+    for i, a in enumerate(days):
+        for b in days[i + 1:i + 12]:
+            covered = [d for d in totals if a <= d < b and hours.get(d)]
+            expected = sum(totals[d] for d in covered) if covered else None
+            value = rollup.total(a, b)
+            if expected is None:
+                assert value is None, (a, b)
+            else:
+                assert abs(value - expected) < 1e-9, (a, b)
+    for day in days:
+        assert rollup.hours(day) == hours.get(day, 0)
+
+
+def _update(rollup, totals, hours, first, values, counts):
+    rollup.update(first, np.array(values, dtype=float), np.array(counts))
+    for i, (value, count) in enumerate(zip(values, counts)):
+        day = first + timedelta(days=i)
+        totals[day] = 0.0 if np.isnan(value) else value
+        hours[day] = count
+
+
+def test_empty():
+    rollup = DayRollup()
+    assert len(rollup) == 0
+    assert rollup.total(FIRST, FIRST + timedelta(days=7)) is None
+    assert np.isnan(rollup.day_totals(FIRST, 3)).all()
+    assert rollup.hours(FIRST) == 0
+
+
+def test_update_append_prepend_and_gap():
+    rng = np.random.default_rng(1)
+    rollup, totals, hours = DayRollup(), {}, {}
+    _update(rollup, totals, hours, FIRST + timedelta(days=10), rng.uniform(1, 20, 5), [24] * 5)
+    _check(rollup, totals, hours)
+    # Nye dage efter et hul
+    _update(rollup, totals, hours, FIRST + timedelta(days=20), rng.uniform(1, 20, 3), [24, 23, 25])
+    _check(rollup, totals, hours)
+    # Historik foran (prefix-summerne forskydes)
+    _update(rollup, totals, hours, FIRST, rng.uniform(1, 20, 4), [24] * 4)
+    _check(rollup, totals, hours)
+    # Genberegning midt i, med en dag uden data
+    _update(rollup, totals, hours, FIRST + timedelta(days=11), [np.nan, 5.0], [0, 3])
+    _check(rollup, totals, hours)
+    assert len(rollup) == 23
+
+
+def test_zero_consumption_is_data():
+    rollup = DayRollup()
+    rollup.update(FIRST, np.array([0.0, np.nan]), np.array([24, 0]))
+    assert rollup.total(FIRST, FIRST + timedelta(days=1)) == 0.0
+    assert rollup.total(FIRST + timedelta(days=1), FIRST + timedelta(days=2)) is None
+
+
+def test_prune():
+    rng = np.random.default_rng(2)
+    rollup, totals, hours = DayRollup(), {}, {}
+    _update(rollup, totals, hours, FIRST, rng.uniform(1, 20, 30), [24] * 30)
+    rollup.prune(FIRST + timedelta(days=12))
+    for day in list(totals):
+        if day < FIRST + timedelta(days=12):
+            del totals[day], hours[day]
+    assert len(rollup) == 18
+    _check(rollup, totals, hours)
+    # Derefter opdateres der videre som normalt
+    _update(rollup, totals, hours, FIRST + timedelta(days=29), rng.uniform(1, 20, 3), [24] * 3)
+    _check(rollup, totals, hours)
+    # Før starten og ud over slutningen gør ingenting / tømmer
+    rollup.prune(FIRST)
+    assert len(rollup) == 20
+    rollup.prune(FIRST + timedelta(days=100))
+    assert len(rollup) == 0
+
+
+def test_day_totals():
+    rollup = DayRollup()
+    rollup.update(FIRST, np.array([1.0, 2.0, np.nan, 4.0]), np.array([24, 24, 0, 24]))
+    np.testing.assert_array_equal(
+        rollup.day_totals(FIRST - timedelta(days=1), 6), [np.nan, 1.0, 2.0, np.nan, 4.0, np.nan]
+    )
@@ -0,0 +1,135 @@
+"""RefreshScheduler: ankomstvindue og backoff."""
+from datetime import date, datetime, timedelta
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.simple_elforbrug.const import (
+    MIN_TIME_BETWEEN_UPDATES,
+    SCHEDULE_JITTER,
+    SCHEDULE_MAX_INTERVAL,
+    SCHEDULE_PEAK_INTERVAL,
+    SCHEDULE_THROTTLE_INTERVAL,
+)
+from custom_components.simple_elforbrug.scheduler import RefreshScheduler
+
+LOW, HIGH = 1 - SCHEDULE_JITTER, 1 + SCHEDULE_JITTER
+
+
+def _local(day, hour):
+    return datetime(day.year, day.month, day.day, hour, tzinfo=dt_util.DEFAULT_TIME_ZONE)
+
+
+def _learned(hour=3, days=5):
+    """En scheduler der har set en ny dag ankomme kl. `hour` de sidste `days` dage."""
+    scheduler = RefreshScheduler()
+    first = date(2024, 5, 1)
+    scheduler.record(0, first, _local(first, 0))
+    for i in range(1, days + 1):
+        scheduler.record(24, first + timedelta(days=i - 1), _local(first + timedelta(days=i), hour))
+    return scheduler, first + timedelta(days=days)
+
+
+def test_fixed_interval_before_anything_is_learned():
+    interval = RefreshScheduler().next_interval()
+    assert MIN_TIME_BETWEEN_UPDATES * LOW <= interval <= MIN_TIME_BETWEEN_UPDATES * HIGH
+
+
+def test_polls_often_in_the_arrival_window():
+    scheduler, today = _learned(hour=3)
+    tomorrow = today + timedelta(days=1)
+    interval = scheduler.next_interval(_local(tomorrow, 3))
+    assert SCHEDULE_PEAK_INTERVAL * LOW <= interval <= SCHEDULE_PEAK_INTERVAL * HIGH
+    # Dagen er kommet i dag: ikke tæt polling resten af vinduet
+    assert scheduler.next_interval(_local(today, 3)) > SCHEDULE_PEAK_INTERVAL * HIGH
+
+
+def _idle(scheduler, now, times=10):
+    for _ in range(times):
+        scheduler.record(0, None, now)
+
+
+def test_backs_off_outside_the_window_but_wakes_up_for_it():
+    scheduler, today = _learned(hour=3)
+    now = _local(today, 10)
+    intervals = []
+    for _ in range(3):
+        intervals.append(scheduler.next_interval(now))
+        scheduler.record(0, None, now)
+    assert intervals[1] > intervals[0] * LOW / HIGH * 1.5
+    assert intervals[2] > intervals[1] * LOW / HIGH * 1.5
+
+    now = _local(today, 22)
+    _idle(scheduler, now)
+    # Vinduet starter en time før ankomsttiden: kl. 2 næste dag
+    assert scheduler.next_interval(now) == timedelta(hours=4)
+
+
+def test_idle_backoff_is_capped():
+    scheduler, today = _learned(hour=3)
+    now = _local(today, 10)
+    _idle(scheduler, now, 2000)  # uger uden nye data (fx nedbrud hos Eloverblik)
+    interval = scheduler.next_interval(now)
+    assert interval <= SCHEDULE_MAX_INTERVAL * HIGH
+
+
+def test_throttle_backoff_is_capped_and_respects_retry_after():
+    scheduler = RefreshScheduler()
+    scheduler.record_throttled()
+    interval = scheduler.next_interval()
+    assert SCHEDULE_THROTTLE_INTERVAL <= interval <= SCHEDULE_THROTTLE_INTERVAL * HIGH
+    for _ in range(2000):
+        scheduler.record_throttled()
+    assert SCHEDULE_MAX_INTERVAL <= scheduler.next_interval() <= SCHEDULE_MAX_INTERVAL * HIGH
+
+    scheduler.record_throttled(retry_after=SCHEDULE_MAX_INTERVAL.total_seconds() * 2)
+    assert scheduler.next_interval() >= SCHEDULE_MAX_INTERVAL * 2
+
+    scheduler.record(24, None)
+    interval = scheduler.next_interval()
+    assert interval <= MIN_TIME_BETWEEN_UPDATES * HIGH
+
+
+def test_dump_and_load():
+    scheduler, today = _learned(hour=3)
+    restored = RefreshScheduler()
+    restored.load(scheduler.dump())
+    assert restored.dump() == scheduler.dump()
+    _idle(restored, _local(today, 22))
+    assert restored.next_interval(_local(today, 22)) == timedelta(hours=4)
+    restored.load({"weights": [1, 2]})  # forkert længde ignoreres
+    assert restored.dump()["weights"] == scheduler.dump()["weights"]
+
+
+def test_restart_keeps_seen_day_and_idle():
+    scheduler, today = _learned(hour=3)
+    _idle(scheduler, _local(today, 10), times=2)
+    restored = RefreshScheduler()
+    restored.load(scheduler.dump())
+    assert restored.dump() == scheduler.dump()
+    # Backoff fortsætter (to tomme opdateringer: 4 timer) i stedet for at starte forfra
+    assert restored.next_interval(_local(today, 10)) >= MIN_TIME_BETWEEN_UPDATES * 4 * LOW
+
+    # Første nye dag efter genstarten tæller som en ankomst
+    weights = restored.dump()["weights"]
+    restored.record(24, today, _local(today + timedelta(days=1), 5))
+    assert restored.dump()["weights"] != weights
+
+
+def test_old_cache_seeds_seen_day_from_store():
+    scheduler, today = _learned(hour=3)
+    old = {key: value for key, value in scheduler.dump().items() if key in ("weights", "arrived")}
+    restored = RefreshScheduler()
+    restored.load(old, today - timedelta(days=1))
+    assert restored.dump()["seen"] == (today - timedelta(days=1)).isoformat()
+    weights = restored.dump()["weights"]
+    restored.record(24, today, _local(today + timedelta(days=1), 5))
+    assert restored.dump()["weights"] != weights
+
+
+def test_idle_in_dump_is_capped():
+    scheduler, today = _learned(hour=3)
+    _idle(scheduler, _local(today, 22), times=50)
+    idle = scheduler.dump()["idle"]
+    _idle(scheduler, _local(today, 22))
+    assert scheduler.dump()["idle"] == idle
+    assert MIN_TIME_BETWEEN_UPDATES * 2 ** idle >= SCHEDULE_MAX_INTERVAL
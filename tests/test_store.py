@@ -0,0 +1,201 @@
+"""HourlyStore og den inkrementelle hentning i HassEloverblik."""
+import asyncio
+from datetime import date, timedelta
+
+import numpy as np
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.simple_elforbrug import HassEloverblik
+from custom_components.simple_elforbrug.store import HOUR, HourlyStore, day_bounds
+
+TODAY = date(2024, 6, 20)
+
+
+def _day(day, values=None):
+    """(epoch-sekund, kWh)-par for et lokalt døgn."""
+    start, end = day_bounds(day)
+    hours = np.arange(start, end, HOUR)
+    values = np.full(len(hours), 1.0) if values is None else np.asarray(values, dtype=float)
+    return np.column_stack((hours, values))
+
+
+def _days(first, count, value=1.0):
+    points = np.concatenate([_day(first + timedelta(days=i)) for i in range(count)])
+    points[:, 1] = value
+    return points
+
+
+def test_merge_counts_and_overwrites():
+    store = HourlyStore()
+    day = TODAY - timedelta(days=1)
+    assert store.merge(_day(day)) == 24
+    assert store.take_dirty() == day_bounds(day)[0]
+    assert store.merge(_day(day)) == 0  # samme værdier: intet ændret
+    points = _day(day)
+    points[5, 1] = 3.0
+    assert store.merge(points) == 1
+    assert store.day_sum(day) == 26.0
+    assert store.rollup.total(day, TODAY) == 26.0
+    assert store.last_day() == day
+    assert store.take_dirty() == points[5, 0]
+    assert store.take_dirty() is None
+
+
+def test_missing_hours_are_nan():
+    store = HourlyStore()
+    day = TODAY - timedelta(days=1)
+    points = np.delete(_day(day), [3, 4], axis=0)
+    store.merge(points)
+    values = store.day_values(day)
+    assert np.isnan(values[[3, 4]]).all()
+    assert not np.isnan(np.delete(values, [3, 4])).any()
+    assert not store.is_complete(day)
+    assert store.day_sum(day) == 22.0
+    assert store.day_sum(day - timedelta(days=1)) is None
+    assert np.isnan(store.window(*day_bounds(TODAY))).all()
+
+
+def test_dst_days_have_23_and_25_hours():
+    store = HourlyStore()
+    store.merge(_day(date(2024, 3, 31)))
+    store.merge(_day(date(2024, 10, 27)))
+    assert store.rollup.hours(date(2024, 3, 31)) == 23
+    assert store.rollup.hours(date(2024, 10, 27)) == 25
+
+
+def test_fetch_from():
+    store = HourlyStore(lookback_days=8, backfill_days=2)
+    window = store.window_start(TODAY)
+    assert window == date(2024, 6, 1)  # hele måneden er længere end lookback
+    assert store.fetch_from(TODAY) == window  # tomt lager
+
+    store.merge(_days(window, (TODAY - window).days))
+    assert store.fetch_from(TODAY) == TODAY - timedelta(days=2)  # kun backfill-vinduet
+
+    # Et hul midt i vinduet hentes igen derfra
+    gap = date(2024, 6, 10)
+    start, end = day_bounds(gap)
+    store.merge(np.column_stack((np.arange(start, end, HOUR), np.full(24, np.nan))))
+    assert store.fetch_from(TODAY) == gap
+
+
+def test_prune_boundary():
+    store = HourlyStore(lookback_days=8, backfill_days=2, history_days=30)
+    first = TODAY - timedelta(days=40)
+    store.merge(_days(first, 40))
+    store.prune(TODAY)
+    oldest = TODAY - timedelta(days=30)
+    assert store.retain_from(TODAY) == oldest
+    assert store.first_day() == oldest
+    assert store.first_hour() == day_bounds(oldest)[0]
+    assert store.day_sum(oldest - timedelta(days=1)) is None
+    assert store.day_sum(oldest) == 24.0
+    assert store.rollup.total(first, TODAY) == 30 * 24.0
+    assert store.last_day() == TODAY - timedelta(days=1)
+
+
+def test_dump_load_round_trip():
+    store = HourlyStore()
+    points = np.delete(_days(TODAY - timedelta(days=5), 5), [7, 30], axis=0)
+    points[:, 1] = np.linspace(0.1, 2.0, len(points))
+    store.merge(points)
+
+    restored = HourlyStore()
+    restored.load(store.dump())
+    assert restored.fingerprint() == store.fingerprint()
+    assert restored.high_water == store.high_water
+    assert restored.take_dirty() is None  # indlæsning fra cache markeres ikke
+    first = TODAY - timedelta(days=5)
+    np.testing.assert_array_equal(restored.day_sums(first, 5), store.day_sums(first, 5))
+    assert HourlyStore().dump() is None
+    empty = HourlyStore()
+    empty.load(None)
+    assert empty.high_water is None
+
+
+def test_ranged_dump_covers_store():
+    store = HourlyStore()
+    store.merge(_days(TODAY - timedelta(days=40), 40))
+    split, _ = day_bounds(TODAY - timedelta(days=10))
+    assert store.checksum(end_ts=split) != store.checksum(start_ts=split)
+    assert HourlyStore().checksum() == store.checksum(start_ts=store.high_water + HOUR)
+
+    restored = HourlyStore()
+    restored.load(store.dump(end_ts=split))
+    assert restored.last_day() == TODAY - timedelta(days=11)
+    restored.load(store.dump(start_ts=split))
+    assert restored.fingerprint() == store.fingerprint()
+    assert store.dump(start_ts=store.high_water + HOUR) is None
+
+
+class _Cache:
+    def __init__(self):
+        self.saves = 0
+
+    def schedule_save(self):
+        self.saves += 1
+
+
+def test_archive_split():
+    today = dt_util.now().date()
+    energy = HassEloverblik(None, "571313000000000001", "kWh")
+    energy.store.merge(_days(today - timedelta(days=400), 400))
+    energy.cache, energy.archive.cache = _Cache(), _Cache()
+    energy.save_cache()
+    assert (energy.cache.saves, energy.archive.cache.saves) == (1, 1)
+    archive, recent = energy.archive.snapshot(), energy.snapshot()
+    assert archive["end"] == energy.archive.end()
+    assert recent["hours"]["start"] == archive["end"]
+
+    # Opstart: kun de seneste uger; arkivet flettes ind bagefter
+    restored = HassEloverblik(None, "571313000000000001", "kWh")
+    restored.cache, restored.archive.cache = _Cache(), _Cache()
+    restored.restore(recent)
+    assert restored.store.day_sum(today - timedelta(days=1)) == len(_day(today - timedelta(days=1)))
+    assert restored.store.day_sum(today - timedelta(days=100)) is None
+    restored.archive.restore(archive)
+    assert restored.store.fingerprint() == energy.store.fingerprint()
+    restored.save_cache()
+    assert (restored.cache.saves, restored.archive.cache.saves) == (0, 0)
+
+    # En ny time skriver kun EnergyCache
+    restored.store.merge(_days(today - timedelta(days=1), 1, 2.0))
+    restored.save_cache()
+    assert (restored.cache.saves, restored.archive.cache.saves) == (1, 0)
+
+
+class _Client:
+    """Svarer med faste punkter og husker hvilke intervaller der blev bedt om."""
+
+    def __init__(self, points):
+        self.points = points
+        self.calls = []
+
+    async def async_get_time_series_points(self, metering_points, from_date, to_date, aggregation="Hour"):
+        self.calls.append((from_date, to_date))
+        start, _ = day_bounds(from_date)
+        end, _ = day_bounds(to_date)
+        points = self.points[(self.points[:, 0] >= start) & (self.points[:, 0] < end)]
+        return {metering_points[0]: points}
+
+
+def test_update_fetches_incrementally():
+    today = dt_util.now().date()
+    window = HourlyStore().window_start(today)
+    client = _Client(_days(window, (today - window).days))
+    energy = HassEloverblik(client, "571313000000000001", "kWh")
+
+    changed = asyncio.run(energy._async_update_hours())  # pylint: disable=protected-access
+    assert client.calls[-1] == (window, today)
+    assert changed == len(client.points)
+    assert energy.get_data_date() == (today - timedelta(days=1)).isoformat()
+
+    # Næste gang hentes kun backfill-vinduet, og uændrede timer tæller ikke
+    changed = asyncio.run(energy._async_update_hours())  # pylint: disable=protected-access
+    assert client.calls[-1] == (today - timedelta(days=2), today)
+    assert changed == 0
+
+    # Efterudfyldte værdier flettes ind
+    client.points[-1, 1] = 5.0
+    assert asyncio.run(energy._async_update_hours()) == 1  # pylint: disable=protected-access
@@ -0,0 +1,70 @@
+"""TariffSchedule og HassTariff.next_refresh."""
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+from custom_components.simple_elforbrug.const import TARIFF_REFRESH_INTERVAL
+from custom_components.simple_elforbrug.tariffs import HassTariff, TariffSchedule
+
+HOURLY = [float(i) for i in range(1, 25)]  # timen kl. h koster h + 1 kr/kWh
+
+
+def _charges():
+    """getcharges-svar: en timetarif uden slutdato og en dagstarif i marts 2024."""
+    def tariff(name, period_type, prices, valid_from, valid_to=None):
+        return {
+            "name": name,
+            "periodType": period_type,
+            "validFromDate": valid_from,
+            "validToDate": valid_to,
+            "prices": [{"position": str(i + 1), "price": p} for i, p in enumerate(prices)],
+        }
+
+    return {"result": [{"result": {"tariffs": [
+        tariff("Nettarif C time", "PT1H", HOURLY, "2024-01-01T00:00:00.000Z"),
+        tariff("Elafgift", "P1D", [0.5], "2024-03-01T00:00:00.000Z", "2024-04-01T00:00:00.000Z"),
+    ]}}]}
+
+
+def test_next_change():
+    schedule = TariffSchedule.from_charges(_charges())
+    assert schedule.next_change(date(2023, 12, 31)) == date(2024, 1, 1)
+    assert schedule.next_change(date(2024, 2, 15)) == date(2024, 3, 1)
+    assert schedule.next_change(date(2024, 3, 1)) == date(2024, 4, 1)
+    assert schedule.next_change(date(2024, 4, 15)) is None
+
+
+def test_day_prices_sum_active_tariffs():
+    schedule = TariffSchedule.from_charges(_charges())
+    assert np.isnan(schedule.day_prices(date(2023, 12, 31))).all()
+    np.testing.assert_array_equal(schedule.day_prices(date(2024, 2, 1)), HOURLY)
+    np.testing.assert_array_equal(schedule.day_prices(date(2024, 3, 15)), np.add(HOURLY, 0.5))
+    assert schedule.price_at(datetime(2024, 3, 15, 16, tzinfo=timezone.utc)) == 18.5  # kl. 17 dansk tid
+
+
+def test_hourly_prices_on_dst_days():
+    schedule = TariffSchedule.from_charges(_charges())
+    # 31. marts: kl. 02 findes ikke
+    spring = schedule.hourly_prices(date(2024, 3, 31), 1)
+    assert len(spring) == 23
+    assert spring[:3].tolist() == [1.5, 2.5, 4.5]
+    # 27. oktober: kl. 02 kommer to gange
+    autumn = schedule.hourly_prices(date(2024, 10, 27), 1)
+    assert len(autumn) == 25
+    assert autumn[:5].tolist() == [1.0, 2.0, 3.0, 3.0, 4.0]
+    assert autumn[-1] == 24.0
+    assert len(schedule.hourly_prices(date(2024, 3, 30), 2)) == 24 + 23
+
+
+def test_next_refresh():
+    tariff = HassTariff(None, "571313000000000001")
+    assert tariff.next_refresh() is None  # før første hentning
+
+    # Hentet lang tid før et periodeskift: næste hentning efter intervallet
+    fetched = datetime(2024, 2, 10, 12, tzinfo=timezone.utc)
+    tariff.restore({"response": _charges(), "fetched": fetched.isoformat()})
+    assert tariff.next_refresh() == fetched + TARIFF_REFRESH_INTERVAL
+
+    # Hentet aftenen før 1. marts: hent igen ved midnat dansk tid
+    tariff.restore({"response": _charges(), "fetched": "2024-02-29T20:00:00+00:00"})
+    assert tariff.next_refresh() == datetime(2024, 2, 29, 23, tzinfo=timezone.utc)